@@ -0,0 +1,253 @@
+""" Benchmark of the ql-mergedQA sanitizing of an exposure.
+
+Writes one synthetic ql-mergedQA-<camera>-<expid>.json per camera, with
+the per fiber arrays of a real one (500 fibers, some NaN and repeated
+values), and times reading all of them with:
+
+    legacy   json.load and the jsonify walk with list.index
+    jsonify  json.load and the single pass jsonify
+    decoder  load_json, sanitized while parsing
+
+It also times jsonify over the same outputs holding numpy arrays, as
+Quick Look has them in memory.
+
+Usage:
+    python bench_jsonify.py [cameras] [repeat]
+
+    cameras -- number of cameras (default: 30)
+"""
+
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy
+
+from qlf_models import jsonify, load_json
+
+ARMS = ('b', 'r', 'z')
+FIBERS = 500
+AMPS = 4
+
+TASKS = {
+    'CHECK_CCDs': ['NOISE_AMP', 'LITFRAC_AMP', 'BIAS_AMP'],
+    'CHECK_FIBERS': ['XWSIGMA_FIB', 'PEAKCOUNT_FIB', 'GOOD_FIBERS'],
+    'CHECK_SPECTRA': [
+        'SNR_MAG_TGT', 'MEDIAN_SNR', 'SKYCONT_FIBER', 'DELTAWAVE',
+        'RESID_RND'
+    ],
+}
+
+
+def legacy_jsonify(data):
+    """ Copy of qlf_models.jsonify before the single pass walk. """
+
+    if type(data) == numpy.ndarray:
+        data = data.tolist()
+    if isinstance(data, list):
+        for item in data:
+            data[data.index(item)] = legacy_jsonify(item)
+    if isinstance(data, dict):
+        for item in data:
+            data[item] = legacy_jsonify(data[item])
+    if isinstance(data, float):
+        if math.isnan(data) or math.isinf(data):
+            data = -9999
+    return data
+
+
+def fiber_array(random, scale=1.0):
+    """ Per fiber values, with NaN on dead fibers and repeated values
+    on masked ones. """
+
+    values = random.normal(scale, scale / 10, FIBERS)
+    values[random.randint(0, FIBERS, 5)] = numpy.nan
+    values[random.randint(0, FIBERS, 20)] = 0.0
+    return values
+
+
+def synthetic_merged_qa(random, camera, exposure_id):
+    """ ql-mergedQA output with numpy arrays. """
+
+    tasks = dict()
+
+    for task, metrics in TASKS.items():
+        values = dict()
+        params = dict()
+
+        for metric in metrics:
+            if metric.endswith('_AMP'):
+                values[metric] = random.normal(1, 0.1, AMPS)
+            elif metric == 'SNR_MAG_TGT':
+                values[metric] = [
+                    [fiber_array(random), fiber_array(random, 20)]
+                    for _ in range(4)
+                ]
+            else:
+                values[metric] = fiber_array(random)
+
+            values[metric.replace('_FIB', '').replace('_AMP', '')] = \
+                float(random.normal())
+            params[metric + '_NORMAL_RANGE'] = [-1.0, 1.0]
+            params[metric + '_WARN_RANGE'] = [-2.0, 2.0]
+
+        tasks[task] = dict(METRICS=values, PARAMS=params)
+
+    return dict(
+        EXPID=str(exposure_id).zfill(8),
+        CAMERA=camera,
+        FLAVOR='science',
+        PROGRAM='dark',
+        NIGHT='20190101',
+        GENERAL_INFO=dict(
+            RA=random.uniform(0, 360, FIBERS),
+            DEC=random.uniform(-90, 90, FIBERS),
+            OBJ_TYPE=random.choice(
+                ['ELG', 'LRG', 'QSO', 'STAR', 'SKY'], FIBERS
+            ).tolist(),
+            FIBER_MAG=fiber_array(random, 22),
+            EXPTIME=900.0
+        ),
+        TASKS=tasks
+    )
+
+
+def write_exposure(directory, cameras, exposure_id):
+    random = numpy.random.RandomState(exposure_id)
+    outputs = list()
+    paths = list()
+
+    for index in range(cameras):
+        camera = '{}{}'.format(ARMS[index % 3], index // 3 % 10)
+        output = synthetic_merged_qa(random, camera, exposure_id)
+        outputs.append(output)
+
+        path = os.path.join(directory, 'ql-mergedQA-{}-{}.json'.format(
+            camera, str(exposure_id).zfill(8)
+        ))
+
+        # NaN written as Python writes it, as in the real files
+        with open(path, 'w') as merged_file:
+            json.dump(numpy_to_lists(output), merged_file)
+
+        paths.append(path)
+
+    return outputs, paths
+
+
+def numpy_to_lists(data):
+    """ Copy of an output with lists instead of arrays, NaN kept. """
+
+    if isinstance(data, numpy.ndarray):
+        return data.tolist()
+    if isinstance(data, list):
+        return [numpy_to_lists(item) for item in data]
+    if isinstance(data, dict):
+        return {key: numpy_to_lists(value) for key, value in data.items()}
+    return data
+
+
+def copy_outputs(outputs):
+    return [
+        {key: numpy_to_arrays(value) for key, value in output.items()}
+        for output in outputs
+    ]
+
+
+def numpy_to_arrays(data):
+    """ Copy of an output, arrays copied too. """
+
+    if isinstance(data, numpy.ndarray):
+        return data.copy()
+    if isinstance(data, list):
+        return [numpy_to_arrays(item) for item in data]
+    if isinstance(data, dict):
+        return {key: numpy_to_arrays(value) for key, value in data.items()}
+    return data
+
+
+def read_json(path):
+    with open(path) as merged_file:
+        return json.load(merged_file)
+
+
+def measure(function, repeat):
+    best = None
+    result = None
+
+    for _ in range(repeat):
+        start = time.time()
+        result = function()
+        elapsed = time.time() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best, result
+
+
+def main(cameras=30, repeat=5):
+    directory = tempfile.mkdtemp(prefix='bench_jsonify-')
+
+    try:
+        outputs, paths = write_exposure(directory, cameras, 1)
+        size = sum(os.path.getsize(path) for path in paths)
+
+        legacy, legacy_result = measure(lambda: [
+            legacy_jsonify(read_json(path)) for path in paths
+        ], repeat)
+        walk, walk_result = measure(lambda: [
+            jsonify(read_json(path)) for path in paths
+        ], repeat)
+        decoder, decoder_result = measure(lambda: [
+            load_json(path) for path in paths
+        ], repeat)
+        parse, _ = measure(lambda: [
+            read_json(path) for path in paths
+        ], repeat)
+
+        arrays_legacy, _ = measure(lambda: [
+            legacy_jsonify(output) for output in copy_outputs(outputs)
+        ], repeat)
+        arrays, arrays_result = measure(lambda: [
+            jsonify(output) for output in copy_outputs(outputs)
+        ], repeat)
+        copies, _ = measure(lambda: copy_outputs(outputs), repeat)
+    finally:
+        shutil.rmtree(directory)
+
+    # the three readers must store the same values
+    stored = json.dumps(decoder_result, allow_nan=False)
+    assert stored == json.dumps(walk_result, allow_nan=False)
+    assert json.loads(json.dumps(arrays_result, allow_nan=False)) == \
+        json.loads(stored)
+
+    print('{} cameras, {:.1f} MB of mergedQA, best of {}'.format(
+        cameras, size / 2**20, repeat
+    ))
+    print('{:>16}: {:8.1f} ms'.format('json.load only', parse * 1000))
+
+    for name, elapsed in [('legacy', legacy), ('jsonify', walk),
+                          ('decoder', decoder)]:
+        print('{:>16}: {:8.1f} ms total  {:6.2f} ms/camera'.format(
+            name, elapsed * 1000, elapsed * 1000 / cameras
+        ))
+
+    for name, elapsed in [('legacy arrays', arrays_legacy),
+                          ('jsonify arrays', arrays)]:
+        # copying the outputs is not part of the sanitizing
+        elapsed -= copies
+        print('{:>16}: {:8.1f} ms total  {:6.2f} ms/camera'.format(
+            name, elapsed * 1000, elapsed * 1000 / cameras
+        ))
+
+    legacy_values = json.dumps(legacy_result, allow_nan=False)
+    if legacy_values != stored:
+        print('legacy jsonify stored different values (repeated items)')
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
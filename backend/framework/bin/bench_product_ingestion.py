@@ -0,0 +1,185 @@
+""" Benchmark of the Product ingestion of a synthetic exposure.
+
+Creates an exposure with one job per camera, whose outputs hold every
+metric of metrics.json, and times:
+
+    legacy    one Product.save() and one astropy Time per metric
+    per job   QLFModels.create_products(job_id) for each camera
+    exposure  QLFModels.create_products(job_ids) for all cameras at once
+
+Everything runs inside a transaction that is rolled back at the end,
+so the database is left untouched.
+
+Usage:
+    python bench_product_ingestion.py [cameras] [values] [repeat]
+
+    cameras -- number of cameras (default: 30)
+    values  -- floats per metric (default: 500, one per fiber)
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+from qlf_models import QLFModels
+
+from astropy.time import Time
+from dashboard.models import Exposure, Job, Process, Product
+from django.db import transaction
+from django.db.models import F
+
+qlf_root = os.environ.get('QLF_ROOT')
+
+ARMS = ('b', 'r', 'z')
+
+
+def load_metrics():
+    metrics_path = os.path.join(
+        qlf_root, "framework", "ql_mapping", "metrics.json"
+    )
+
+    with open(metrics_path) as f:
+        return json.load(f)
+
+
+def synthetic_output(metrics, values):
+    """ Job output with every metric path filled with random values. """
+
+    output = dict()
+
+    for key in metrics:
+        path_keys = metrics[key]['path'].split('->')
+        node = output
+
+        for path_key in path_keys[:-1]:
+            node = node.setdefault(path_key, dict())
+
+        node[path_keys[-1]] = [random.random() for _ in range(values)]
+
+    return output
+
+
+def create_exposure(models, cameras, values, metrics):
+    last = Exposure.objects.order_by('-exposure_id').first()
+    exposure_id = (last.exposure_id if last else 0) + 1
+
+    exposure = models.insert_exposure(
+        exposure_id=exposure_id,
+        night=datetime.utcnow().strftime('%Y%m%d'),
+        dateobs=datetime.utcnow(),
+        flavor='science'
+    )
+
+    process = Process(
+        exposure_id=exposure.exposure_id,
+        pipeline_name='bench'
+    )
+    process.save()
+
+    output = synthetic_output(metrics, values)
+    job_ids = list()
+
+    for index in range(cameras):
+        camera = '{}{}'.format(ARMS[index % 3], index // 3 % 10)
+        job = models.insert_job(
+            process_id=process.id,
+            camera=camera,
+            start=datetime.utcnow(),
+            logname='bench'
+        )
+        Job.objects.filter(id=job.id).update(output=output)
+        job_ids.append(job.id)
+
+    return job_ids
+
+
+def legacy_create_products(job_id, metrics):
+    """ Copy of QLFModels.create_products before the bulk insert. """
+
+    query = Job.objects.filter(id=job_id)
+    values = {}
+    for key in metrics:
+        output_path = 'output'
+        path_keys = metrics[key]['path']
+        for path_key in path_keys.split('->'):
+            output_path += "->'{}'".format(path_key)
+        values[key] = output_path
+
+    job = query.extra(
+        select=values
+    ).annotate(
+        dateobs=F("process__exposure__dateobs")
+    ).values(*list(values), "dateobs", 'id').last()
+
+    for key in metrics:
+        date_time = (job['dateobs']).strftime('%Y-%m-%d %H:%M:%S')
+        value = []
+        if isinstance(job[key], list):
+            value = job[key]
+        else:
+            value = [job[key]]
+        mjd = Time(date_time, format='iso', scale='utc').mjd
+        p = Product(
+            job_id=job_id,
+            value=value,
+            key=key,
+            mjd=mjd
+        )
+        p.save()
+
+
+def measure(job_ids, ingest, repeat):
+    best = None
+
+    for _ in range(repeat):
+        Product.objects.filter(job_id__in=job_ids).delete()
+
+        start = time.time()
+        ingest()
+        elapsed = time.time() - start
+
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main(cameras=30, values=500, repeat=3):
+    models = QLFModels()
+    metrics = load_metrics()
+
+    with transaction.atomic():
+        job_ids = create_exposure(models, cameras, values, metrics)
+
+        results = [
+            ('legacy', measure(job_ids, lambda: [
+                legacy_create_products(job_id, metrics)
+                for job_id in job_ids
+            ], repeat)),
+            ('per job', measure(job_ids, lambda: [
+                models.create_products(job_id) for job_id in job_ids
+            ], repeat)),
+            ('exposure', measure(
+                job_ids, lambda: models.create_products(job_ids), repeat
+            )),
+        ]
+
+        products = Product.objects.filter(job_id__in=job_ids).count()
+
+        transaction.set_rollback(True)
+
+    print('{} cameras, {} metrics, {} products, {} values each, '
+          'best of {}'.format(
+              cameras, len(metrics), products, values, repeat
+          ))
+
+    for name, elapsed in results:
+        print('{:>10}: {:8.1f} ms total  {:6.2f} ms/camera'.format(
+            name, elapsed * 1000, elapsed * 1000 / cameras
+        ))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,288 @@
+""" Query plans of the trend query (get_product_metrics_by_camera) on a
+synthetic year of Products.
+
+Creates one exposure per night slot with one job per camera and one
+product per metric key, then runs EXPLAIN ANALYZE of:
+
+    legacy       the query before migration 0018, dateobs range through
+                 the exposure, on an unpartitioned copy of the products
+                 with only the primary key and job indexes
+    partitioned  the query before migration 0019, mjd range on the
+                 monthly Product partitions with the (key, mjd, job) index
+    metric       get_product_metrics_by_camera, on the (camera, key, mjd)
+                 index of Metric, without joins
+
+for a week, a month and the whole year of one camera and key.
+
+Everything runs inside a transaction that is rolled back at the end,
+so the database is left untouched.
+
+Usage:
+    python bench_product_queries.py [nights] [exposures] [keys]
+
+    nights    -- nights of data (default: 365)
+    exposures -- exposures per night (default: 10)
+    keys      -- metric keys per job (default: 20)
+"""
+
+import re
+import sys
+from datetime import datetime, timedelta
+
+import django
+
+from qlf_models import MJD_EPOCH, QLFModels
+
+from dashboard.models import Camera, Exposure, Job, Metric, Process, Product
+from django.db import transaction
+from django.db.models import F
+
+ARMS = ('b', 'r', 'z')
+
+FIRST_NIGHT = datetime(2019, 1, 1)
+
+CAMERA = 'b0'
+
+
+def create_year(models, nights, exposures, keys):
+    """ Synthetic exposures, processes, jobs and products. """
+
+    tables = dict(
+        exposure=Exposure._meta.db_table,
+        process=Process._meta.db_table,
+        job=Job._meta.db_table,
+        camera=Camera._meta.db_table,
+        product=Product._meta.db_table,
+        metric=Metric._meta.db_table
+    )
+
+    cameras = [arm + str(spec) for arm in ARMS for spec in range(10)]
+
+    last = Exposure.objects.order_by('-exposure_id').first()
+    first_exposure = (last.exposure_id if last else 0) + 1
+
+    models.create_product_partitions([
+        (FIRST_NIGHT - MJD_EPOCH).days + night for night in range(nights)
+    ])
+
+    with django.db.connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO {camera} (camera, spectrograph, arm)
+            SELECT camera, right(camera, 1), left(camera, 1)
+            FROM unnest(%s::text[]) AS camera
+            ON CONFLICT (camera) DO NOTHING
+        """.format(**tables), [cameras])
+
+        # exposures every 30 minutes from 20h of each night
+        cursor.execute("""
+            INSERT INTO {exposure} (exposure_id, night, dateobs, flavor)
+            SELECT %s + night * %s + slot,
+                to_char(%s::timestamp + night * interval '1 day',
+                        'YYYYMMDD'),
+                %s::timestamp + night * interval '1 day'
+                    + interval '20 hours' + slot * interval '30 minutes',
+                'science'
+            FROM generate_series(0, %s - 1) AS night,
+                generate_series(0, %s - 1) AS slot
+        """.format(**tables), [
+            first_exposure, exposures, FIRST_NIGHT, FIRST_NIGHT,
+            nights, exposures
+        ])
+
+        cursor.execute("""
+            INSERT INTO {process} (pipeline_name, process_dir, version,
+                start, status, exposure_id, qa_tests)
+            SELECT 'bench', '', '', dateobs, 0, exposure_id, '{{}}'
+            FROM {exposure} WHERE exposure_id >= %s
+        """.format(**tables), [first_exposure])
+
+        cursor.execute("""
+            INSERT INTO {job} (name, start, status, camera_id, process_id)
+            SELECT 'bench', process.start, 0, camera, process.id
+            FROM {process} AS process, unnest(%s::text[]) AS camera
+            WHERE process.exposure_id >= %s
+        """.format(**tables), [cameras, first_exposure])
+
+        cursor.execute("""
+            INSERT INTO {product} (job_id, key, value, mjd)
+            SELECT job.id, 'METRIC_' || key, ARRAY[random()],
+                extract(epoch FROM exposure.dateobs) / 86400 + 40587
+            FROM {job} AS job
+            JOIN {process} AS process ON process.id = job.process_id
+            JOIN {exposure} AS exposure
+                ON exposure.exposure_id = process.exposure_id,
+            generate_series(1, %s) AS key
+            WHERE exposure.exposure_id >= %s
+        """.format(**tables), [keys, first_exposure])
+
+        products = cursor.rowcount
+
+        cursor.execute("""
+            INSERT INTO {metric} (job_id, camera_id, arm, spectrograph,
+                exposure_id, night, dateobs, mjd, flavor, program, key,
+                value)
+            SELECT job.id, camera.camera, camera.arm, camera.spectrograph,
+                exposure.exposure_id, exposure.night, exposure.dateobs,
+                product.mjd, exposure.flavor, exposure.program, product.key,
+                product.value
+            FROM {product} AS product
+            JOIN {job} AS job ON job.id = product.job_id
+            JOIN {camera} AS camera ON camera.camera = job.camera_id
+            JOIN {process} AS process ON process.id = job.process_id
+            JOIN {exposure} AS exposure
+                ON exposure.exposure_id = process.exposure_id
+            WHERE exposure.exposure_id >= %s
+        """.format(**tables), [first_exposure])
+
+        # the products as stored before migration 0018
+        cursor.execute("""
+            CREATE TEMP TABLE legacy_product ON COMMIT DROP AS
+            SELECT * FROM {product};
+            ALTER TABLE legacy_product ADD PRIMARY KEY (id);
+            CREATE INDEX ON legacy_product (job_id);
+            ANALYZE legacy_product;
+            ANALYZE {product};
+            ANALYZE {metric};
+            ANALYZE {job};
+            ANALYZE {process};
+            ANALYZE {exposure};
+        """.format(**tables))
+
+    return products
+
+
+def legacy_product_metrics(key, camera, begin_date, end_date):
+    """ Copy of QLFModels.get_product_metrics_by_camera before the
+    partitions, on legacy_product. """
+
+    vals = Product.objects.filter(job__camera=camera, key=key)
+    begin_date = datetime.strptime(begin_date, "%Y-%m-%d")
+    vals = vals.filter(job__process__exposure__dateobs__gte=begin_date)
+    end_date = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    vals = vals.filter(job__process__exposure__dateobs__lte=end_date)
+
+    return vals.extra(
+        select={
+            'datef': "to_char(dateobs, 'YYYY-MM-DD HH24:MI:SS')"
+        }
+    ).annotate(
+        camera=F("job__camera"),
+        exposure_id=F("job__process__exposure__exposure_id"),
+        dateobs=F("job__process__exposure__dateobs")
+    ).values(
+        "camera", "exposure_id", "dateobs", "value", "datef", "mjd"
+    ).distinct().order_by('dateobs')
+
+
+def partitioned_product_metrics(key, camera, begin_date, end_date):
+    """ Copy of QLFModels.get_product_metrics_by_camera before Metric. """
+
+    vals = Product.objects.filter(job__camera=camera, key=key)
+    begin_date = datetime.strptime(begin_date, "%Y-%m-%d")
+    vals = vals.filter(mjd__gte=(begin_date - MJD_EPOCH).days)
+    end_date = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    vals = vals.filter(mjd__lte=(end_date - MJD_EPOCH).days)
+
+    return vals.extra(
+        select={
+            'datef': "to_char(dateobs, 'YYYY-MM-DD HH24:MI:SS')"
+        }
+    ).annotate(
+        camera=F("job__camera"),
+        exposure_id=F("job__process__exposure__exposure_id"),
+        dateobs=F("job__process__exposure__dateobs")
+    ).values(
+        "camera", "exposure_id", "dateobs", "value", "datef", "mjd"
+    ).distinct().order_by('dateobs')
+
+
+def explain(queryset, table=None):
+    """ Execution time, rows and partitions read of a query. """
+
+    sql, params = queryset.query.sql_with_params()
+
+    if table:
+        sql = sql.replace(
+            '"{}"'.format(Product._meta.db_table), '"{}"'.format(table)
+        )
+
+    with django.db.connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, params)
+        plan = [row[0] for row in cursor.fetchall()]
+
+    execution = float(re.search(
+        r'Execution Time: ([\d.]+)', plan[-1]
+    ).group(1))
+
+    scanned = set(re.findall(
+        r'on ({}\w*)'.format(Product._meta.db_table), '\n'.join(plan)
+    ))
+
+    rows = int(re.search(r'actual time=\S+ rows=(\d+)', plan[0]).group(1))
+
+    # buffers of the whole plan, on its first Buffers line
+    buffers = sum(int(count) for count in re.findall(
+        r'(?:hit|read)=(\d+)',
+        next(line for line in plan if 'Buffers:' in line)
+    ))
+
+    return execution, rows, len(scanned), buffers, plan
+
+
+def main(nights=365, exposures=10, keys=20):
+    models = QLFModels()
+
+    with transaction.atomic():
+        products = create_year(models, nights, exposures, keys)
+
+        last_night = FIRST_NIGHT + timedelta(days=nights - 1)
+        middle = FIRST_NIGHT + timedelta(days=nights // 2)
+
+        ranges = [
+            ('week', middle, middle + timedelta(days=6)),
+            ('month', middle, middle + timedelta(days=29)),
+            ('year', FIRST_NIGHT, last_night),
+        ]
+
+        print('{} products, {} nights, {} exposures per night, {} keys, '
+              'camera {}'.format(products, nights, exposures, keys, CAMERA))
+        print('{:>6} {:>12} {:>10} {:>7} {:>11} {:>9}'.format(
+            'range', 'query', 'time (ms)', 'rows', 'partitions', 'buffers'
+        ))
+
+        plans = dict()
+
+        for name, begin, end in ranges:
+            begin = begin.strftime('%Y-%m-%d')
+            end = end.strftime('%Y-%m-%d')
+
+            legacy = legacy_product_metrics('METRIC_1', CAMERA, begin, end)
+            partitioned = partitioned_product_metrics(
+                'METRIC_1', CAMERA, begin, end
+            )
+            metric = models.get_product_metrics_by_camera(
+                'METRIC_1', CAMERA, begin_date=begin, end_date=end
+            )
+
+            for label, queryset, table in [
+                ('legacy', legacy, 'legacy_product'),
+                ('partitioned', partitioned, None),
+                ('metric', metric, None)
+            ]:
+                execution, rows, scanned, buffers, plan = explain(
+                    queryset, table
+                )
+                plans[(name, label)] = plan
+
+                print('{:>6} {:>12} {:>10.1f} {:>7} {:>11} {:>9}'.format(
+                    name, label, execution, rows, scanned, buffers
+                ))
+
+        transaction.set_rollback(True)
+
+    print('\nPlan of the year, metric:')
+    print('\n'.join(plans[('year', 'metric')]))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:4]])
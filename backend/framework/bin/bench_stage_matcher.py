@@ -0,0 +1,142 @@
+""" Micro-benchmark of the QL stage matchers.
+
+Replays recorded run-<camera>.log files through the legacy per-stage
+str.find loop (serialized by one lock, as QLFProcess used to do) and
+through the compiled StageEvents engine.
+
+Usage:
+    python bench_stage_matcher.py <flavor> <process_dir> [repeat]
+
+e.g.:
+    python bench_stage_matcher.py science \\
+        $DESI_SPECTRO_REDUX/exposures/20190101/00000003/00000001
+"""
+
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from threading import Lock, Thread
+
+from stage_events import StageEvents
+
+qlf_root = os.environ.get('QLF_ROOT')
+
+
+class LegacyStageControl(object):
+    """ Copy of the matcher formerly in QLFProcess.resume_log/stage_control,
+    without the log output. """
+
+    def __init__(self, step_list, num_cameras):
+        self.num_cameras = num_cameras
+        self.stages = list()
+
+        for stage in step_list:
+            self.stages.append({
+                'start': {"regex": stage.get('start'), "count": 0},
+                'end': {"regex": stage.get('end'), "count": 0},
+            })
+
+    def feed(self, camera, line, lock):
+        lock.acquire()
+
+        try:
+            if line.find('ERROR') > -1 or line.find('CRITICAL') > -1:
+                self.num_cameras = self.num_cameras - 1
+            if line.find('File does not exist') > -1:
+                self.num_cameras = self.num_cameras - 1
+            else:
+                for stage in self.stages:
+                    stage_start = stage.get('start')
+                    stage_end = stage.get('end')
+
+                    if line.find(stage_end.get('regex')) > -1:
+                        stage_end['count'] += 1
+
+                    if line.find(stage_start.get('regex')) > -1:
+                        stage_start['count'] += 1
+        finally:
+            lock.release()
+
+
+def load_logs(process_dir):
+    logs = dict()
+
+    for path in sorted(glob.glob(os.path.join(process_dir, 'run-*.log'))):
+        camera = os.path.basename(path)[4:-4]
+        with open(path, 'rb') as logfile:
+            logs[camera] = [
+                line.decode('utf-8').replace('\n', '')
+                for line in logfile
+            ]
+
+    return logs
+
+
+def replay(logs, feed):
+    """ Replays each camera log in its own thread, like start_jobs. """
+
+    threads = [
+        Thread(target=lambda cam=cam: [feed(cam, line) for line in logs[cam]])
+        for cam in logs
+    ]
+
+    start = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return time.perf_counter() - start
+
+
+def main(flavor, process_dir, repeat=5):
+    flavor_path = os.path.join(
+        qlf_root, "framework", "ql_mapping", "{}.json".format(flavor)
+    )
+
+    with open(flavor_path) as f:
+        step_list = json.load(f).get('step_list')
+
+    logs = load_logs(process_dir)
+    num_lines = sum(len(lines) for lines in logs.values())
+
+    if not num_lines:
+        print('No run-<camera>.log found in {}'.format(process_dir))
+        return
+
+    # keep the engine quiet while replaying
+    logging.getLogger('qlf.pipeline').setLevel(logging.CRITICAL)
+
+    results = {'legacy': list(), 'compiled': list()}
+
+    for _ in range(repeat):
+        legacy = LegacyStageControl(step_list, len(logs))
+        lock = Lock()
+        results['legacy'].append(replay(
+            logs, lambda cam, line: legacy.feed(cam, line, lock)
+        ))
+
+        compiled = StageEvents(step_list, len(logs))
+        results['compiled'].append(replay(logs, compiled.feed))
+
+    print('{} cameras, {} lines, {} stages, best of {}'.format(
+        len(logs), num_lines, len(step_list), repeat
+    ))
+
+    for name, timings in results.items():
+        best = min(timings)
+        print('{:>10}: {:8.3f} ms total  {:8.3f} us/line'.format(
+            name, best * 1e3, best / num_lines * 1e6
+        ))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    main(sys.argv[1], sys.argv[2], *[int(arg) for arg in sys.argv[3:4]])
@@ -0,0 +1,87 @@
+""" Benchmark of the camera startup overhead of the two execution modes.
+
+Runs 'desi_quicklook --help' once per camera, as a subprocess and as a
+worker forked from the warm pool, and reports the time until each one
+exits. The help exits right after the imports and the argument parsing,
+so the difference is the startup cost saved per camera.
+
+Usage:
+    python bench_warm_pool.py [cameras] [workers]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+
+from warm_pool import WarmPool
+
+
+async def run_subprocess(semaphore, cwd):
+    async with semaphore:
+        process = await asyncio.create_subprocess_exec(
+            'desi_quicklook', '--help', stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT, cwd=cwd
+        )
+        await process.stdout.read()
+        return await process.wait()
+
+
+async def run_warm(semaphore, pool, cwd):
+    async with semaphore:
+        stdout, wait, _ = await pool.start(['--help'], cwd)
+        await stdout.read()
+        return await wait()
+
+
+async def run_cameras(job, cameras, workers):
+    semaphore = asyncio.Semaphore(workers)
+    return await asyncio.gather(*[job(semaphore) for _ in range(cameras)])
+
+
+def measure(job, cameras, workers):
+    start = time.monotonic()
+    retcodes = asyncio.run(run_cameras(job, cameras, workers))
+    elapsed = time.monotonic() - start
+
+    # a failing camera exits early, its time would not be comparable
+    failed = [retcode for retcode in retcodes if retcode]
+    if failed:
+        sys.exit('{} of {} cameras exited with error, exit codes {}'.format(
+            len(failed), cameras, sorted(set(failed))
+        ))
+
+    return elapsed
+
+
+def main(cameras=30, workers=1):
+    cwd = tempfile.gettempdir()
+
+    subprocess_time = measure(
+        lambda semaphore: run_subprocess(semaphore, cwd), cameras, workers
+    )
+
+    pool = WarmPool()
+
+    start = time.monotonic()
+    pool.warm_up()
+    warm_up_time = time.monotonic() - start
+
+    warm_time = measure(
+        lambda semaphore: run_warm(semaphore, pool, cwd), cameras, workers
+    )
+
+    print('{} cameras, {} workers'.format(cameras, workers))
+    print('fork server warm up: {:8.1f} ms (once per daemon)'.format(
+        warm_up_time * 1000
+    ))
+
+    for mode, elapsed in (('subprocess', subprocess_time),
+                          ('warm', warm_time)):
+        print('{:>10}: {:8.1f} ms total  {:8.1f} ms/camera'.format(
+            mode, elapsed * 1000, elapsed * 1000 / cameras
+        ))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
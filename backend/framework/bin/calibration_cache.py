@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+calibration_data = os.environ.get('DESI_CCD_CALIBRATION_DATA')
+
+# 'on' serves the calibration files to the Quick Look workers from the
+# cache, only used with PIPELINE_EXECUTION=warm
+CALIBRATION_CACHE = os.environ.get('CALIBRATION_CACHE', 'off')
+
+# should be a tmpfs, so the unpacked arrays stay in memory
+CALIBRATION_CACHE_DIR = os.environ.get(
+    'CALIBRATION_CACHE_DIR', '/dev/shm/qlf_calibration'
+)
+
+CALIBRATION_SUFFIXES = ('.fits', '.fits.gz', '.fits.fz')
+
+MANIFEST = 'hdus.json'
+
+# fits.open arguments that a cached HDUList honours anyway, any other
+# argument changes how the file is read, so the file itself is opened
+CACHED_OPEN_KWARGS = ('memmap', 'lazy_load_hdus')
+
+
+class CalibrationCache(object):
+    """ Calibration files (PSF, fiberflat, bias, ...) unpacked once into
+    .npy arrays on a tmpfs.
+
+    Each file has an entry keyed by its path, mtime and size, so a new
+    version of a file gets a new entry. Workers open the arrays as
+    read-only memory maps, so every camera shares the same pages instead
+    of reading and decompressing its own copy. """
+
+    def __init__(self, calibration_dir=calibration_data,
+                 cache_dir=CALIBRATION_CACHE_DIR):
+        self.calibration_dir = os.path.realpath(calibration_dir)
+        self.cache_dir = cache_dir
+
+    def entry_key(self, path):
+        """ Cache key of a calibration file, None if it does not exist. """
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        version = '{}:{}:{}'.format(
+            os.path.realpath(path), stat.st_mtime_ns, stat.st_size
+        )
+
+        return hashlib.sha1(version.encode('utf-8')).hexdigest()
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def covers(self, path):
+        """ Whether a path is a calibration file. """
+
+        if not isinstance(path, str) or \
+                not path.endswith(CALIBRATION_SUFFIXES):
+            return False
+
+        return os.path.realpath(path).startswith(
+            self.calibration_dir + os.sep
+        )
+
+    def calibration_files(self):
+        for root, dirs, files in os.walk(self.calibration_dir):
+            for name in sorted(files):
+                if name.endswith(CALIBRATION_SUFFIXES):
+                    yield os.path.join(root, name)
+
+    def load(self, path):
+        """ Unpacks the HDUs of a calibration file into the cache.
+
+        Arguments:
+            path {str} -- calibration file path
+
+        Returns:
+            str -- entry key, None if the file can not be cached
+        """
+
+        import numpy as np
+        from astropy.io import fits
+
+        key = self.entry_key(path)
+
+        if key is None:
+            return None
+
+        if os.path.exists(os.path.join(self.entry_dir(key), MANIFEST)):
+            return key
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # written aside and renamed, workers never see a partial entry
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+
+        try:
+            hdus = list()
+
+            with fits.open(path) as hdulist:
+                for index, hdu in enumerate(hdulist):
+                    header = hdu.header.copy()
+                    # compressed images are binary tables in astropy
+                    is_table = isinstance(
+                        hdu, (fits.BinTableHDU, fits.TableHDU)
+                    ) and not isinstance(hdu, fits.CompImageHDU)
+
+                    # arrays are stored already scaled
+                    for keyword in ('BSCALE', 'BZERO', 'BLANK'):
+                        header.remove(keyword, ignore_missing=True)
+
+                    data = None
+
+                    if hdu.data is not None:
+                        data = '{}.npy'.format(index)
+                        array = np.asarray(hdu.data)
+                        if is_table:
+                            array = array.view(np.ndarray)
+
+                        np.save(
+                            os.path.join(tmp_dir, data),
+                            np.ascontiguousarray(array),
+                            allow_pickle=False
+                        )
+
+                    hdus.append(dict(
+                        kind='table' if is_table else 'image',
+                        header=header.tostring(),
+                        data=data
+                    ))
+
+            with open(os.path.join(tmp_dir, MANIFEST), 'w') as manifest:
+                json.dump(dict(path=path, hdus=hdus), manifest)
+
+            os.rename(tmp_dir, self.entry_dir(key))
+        except OSError as err:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            # another process loaded the same entry
+            if os.path.exists(os.path.join(self.entry_dir(key), MANIFEST)):
+                return key
+            logger.error('Calibration cache: {} ({})'.format(path, err))
+            return None
+        except Exception as err:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            logger.error('Calibration cache: {} ({})'.format(path, err))
+            return None
+
+        return key
+
+    def refresh(self):
+        """ Loads the calibration files not in the cache yet and removes
+        the entries of files changed or deleted since the last refresh.
+
+        Returns:
+            int -- number of cached files
+        """
+
+        start = time.time()
+        keys = set()
+
+        for path in self.calibration_files():
+            key = self.load(path)
+            if key:
+                keys.add(key)
+
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name not in keys and not name.startswith('.tmp-'):
+                    shutil.rmtree(
+                        self.entry_dir(name), ignore_errors=True
+                    )
+
+        logger.info('Calibration cache: {} files ready in {:.1f}s'.format(
+            len(keys), time.time() - start
+        ))
+
+        return len(keys)
+
+    def open(self, path):
+        """ HDUList of a cached calibration file, with the data memory
+        mapped read-only.
+
+        Arguments:
+            path {str} -- calibration file path
+
+        Returns:
+            astropy.io.fits.HDUList -- None if the file is not cached
+        """
+
+        import numpy as np
+        from astropy.io import fits
+
+        key = self.entry_key(path)
+
+        if key is None:
+            return None
+
+        entry = self.entry_dir(key)
+
+        try:
+            with open(os.path.join(entry, MANIFEST)) as manifest:
+                hdus = json.load(manifest).get('hdus')
+        except (OSError, ValueError):
+            return None
+
+        hdulist = fits.HDUList()
+
+        for index, hdu in enumerate(hdus):
+            header = fits.Header.fromstring(hdu.get('header'))
+            data = None
+
+            if hdu.get('data'):
+                data = np.load(
+                    os.path.join(entry, hdu.get('data')), mmap_mode='r'
+                )
+
+            if hdu.get('kind') == 'table':
+                hdulist.append(fits.BinTableHDU(data=data, header=header))
+            elif index == 0:
+                hdulist.append(fits.PrimaryHDU(data=data, header=header))
+            else:
+                hdulist.append(fits.ImageHDU(data=data, header=header))
+
+        return hdulist
+
+    def install(self):
+        """ Makes astropy.io.fits.open (and getdata, getheader, ...)
+        read calibration files from the cache in this process. """
+
+        from astropy.io import fits
+        from astropy.io.fits import convenience
+
+        fitsopen = fits.open
+
+        def cached_open(name, mode='readonly', *args, **kwargs):
+            if mode == 'readonly' and not args and \
+                    set(kwargs) <= set(CACHED_OPEN_KWARGS) and \
+                    self.covers(name):
+                hdulist = self.open(name)
+                if hdulist is not None:
+                    return hdulist
+
+            return fitsopen(name, mode, *args, **kwargs)
+
+        fits.open = cached_open
+        convenience.fitsopen = cached_open
+
+
+def get_calibration_cache():
+    """ Calibration cache, None when disabled or without
+    DESI_CCD_CALIBRATION_DATA. """
+
+    if CALIBRATION_CACHE != 'on' or not calibration_data:
+        return None
+
+    return CalibrationCache()
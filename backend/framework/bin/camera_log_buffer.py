@@ -0,0 +1,127 @@
+import os
+import logging
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+REDIS_HOST = os.environ.get('REDIS_NAME', 'redis')
+REDIS_PORT = int(os.environ.get('REDIS_PORT', 6379))
+
+# lines kept per camera, older lines are only found in run-<camera>.log
+CAMERA_LOG_BUFFER_SIZE = int(os.environ.get('CAMERA_LOG_BUFFER_SIZE', 5000))
+
+# seconds before the buffer of a finished camera expires
+CAMERA_LOG_BUFFER_TTL = int(os.environ.get('CAMERA_LOG_BUFFER_TTL', 86400))
+
+
+def buffer_enabled():
+    """ The buffer lives in the same Redis used by the channel layer. """
+
+    return bool(os.environ.get('QLF_REDIS', False))
+
+
+class CameraLogBuffer(object):
+    """ Bounded per-camera ring buffer of QL output kept in Redis.
+
+    Each camera has a list with its last CAMERA_LOG_BUFFER_SIZE lines and
+    a counter with the total number of lines published, so every line has
+    a sequence number (starting at 1) and readers can ask only for what
+    they have not seen yet.
+    """
+
+    def __init__(self, host=REDIS_HOST, port=REDIS_PORT,
+                 size=CAMERA_LOG_BUFFER_SIZE):
+        import redis
+
+        self.redis = redis.StrictRedis(host=host, port=port)
+        self.size = size
+
+    def keys(self, logname):
+        """ Redis keys of a camera log.
+
+        Arguments:
+            logname {str} -- job logname, unique per process and camera
+        """
+
+        base = 'qlf:camera_log:{}'.format(logname)
+        return base + ':lines', base + ':seq'
+
+    def publish(self, logname, lines):
+        """ Appends lines to the ring buffer of a camera.
+
+        Arguments:
+            logname {str} -- job logname
+            lines {list} -- decoded log lines
+
+        Returns:
+            int -- sequence number of the last line published
+        """
+
+        if not lines:
+            return None
+
+        lines_key, seq_key = self.keys(logname)
+
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.rpush(lines_key, *lines)
+        pipe.ltrim(lines_key, -self.size, -1)
+        pipe.incrby(seq_key, len(lines))
+        pipe.expire(lines_key, CAMERA_LOG_BUFFER_TTL)
+        pipe.expire(seq_key, CAMERA_LOG_BUFFER_TTL)
+
+        return pipe.execute()[2]
+
+    def read(self, logname, since=0):
+        """ Reads the buffered lines after a sequence number.
+
+        Arguments:
+            logname {str} -- job logname
+
+        Keyword Arguments:
+            since {int} -- last sequence number already read (default: {0})
+
+        Returns:
+            tuple -- (lines, first sequence number of the lines,
+                      last sequence number published)
+        """
+
+        lines_key, seq_key = self.keys(logname)
+
+        def read_lines(pipe):
+            last_seq = int(pipe.get(seq_key) or 0)
+            if since >= last_seq:
+                return [], last_seq + 1, last_seq
+
+            first_seq = last_seq - pipe.llen(lines_key) + 1
+            start = max(since + 1 - first_seq, 0)
+
+            pipe.multi()
+            pipe.lrange(lines_key, start, -1)
+            lines = pipe.execute()[0]
+
+            return lines, first_seq + start, last_seq
+
+        # the range is computed from the counter, so it is watched to
+        # retry when lines are published between the reads
+        lines, first_seq, last_seq = self.redis.transaction(
+            read_lines, seq_key, value_from_callable=True)
+
+        lines = [line.decode('utf-8') for line in lines]
+
+        return lines, first_seq, last_seq
+
+
+def get_camera_log_buffer():
+    """ Buffer instance, or None when Redis is not configured or
+    not reachable. """
+
+    if not buffer_enabled():
+        return None
+
+    try:
+        log_buffer = CameraLogBuffer()
+        log_buffer.redis.ping()
+    except Exception as err:
+        logger.error('Camera log buffer disabled: {}'.format(err))
+        return None
+
+    return log_buffer
@@ -0,0 +1,333 @@
+import os
+import re
+import queue
+import logging
+from threading import Event, Lock, Thread
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+logger = logging.getLogger(name='qlf.interface')
+
+NIGHT_PATTERN = re.compile(r"^\d{8}$")
+# exposure directories are the exposure IDs zero padded to 8 digits
+EXPOSURE_PATTERN = re.compile(r"^\d{8}$")
+RAW_PATTERN = re.compile(r"^desi-(\d+)\.fits\.fz$")
+
+# 'inotify' or 'poll', inotify does not see changes made by other
+# hosts on network filesystems
+DISCOVERY_MODE = os.environ.get('DISCOVERY_MODE', 'inotify')
+DISCOVERY_POLL_INTERVAL = float(
+    os.environ.get('DISCOVERY_POLL_INTERVAL', 1.5)
+)
+
+
+class NightIndex(object):
+    """ In-memory index of the nights and exposures with raw data,
+    updated incrementally. """
+
+    def __init__(self):
+        self.nights = dict()
+        self.latest_night = None
+        self.last = None
+        self.lock = Lock()
+
+    def add_night(self, night):
+        with self.lock:
+            if night in self.nights:
+                return False
+
+            self.nights[night] = set()
+
+            if self.latest_night is None or night > self.latest_night:
+                self.latest_night = night
+
+            return True
+
+    def add_exposure(self, night, exposure_id):
+        """ Adds an exposure with raw data.
+
+        Returns:
+            bool -- True if the exposure was not indexed yet
+        """
+
+        self.add_night(night)
+
+        with self.lock:
+            exposures = self.nights[night]
+
+            if exposure_id in exposures:
+                return False
+
+            exposures.add(exposure_id)
+
+            if self.last is None or (night, exposure_id) > self.last:
+                self.last = (night, exposure_id)
+
+            return True
+
+    def last_exposure(self):
+        """ (night, exposure ID) of the most recent exposure, or None. """
+
+        return self.last
+
+
+class ExposureDiscovery(Thread):
+    """ Watches DESI_SPECTRO_DATA for new desi-*.fits.fz files.
+
+    Uses inotify when available, and otherwise polls only the directories
+    whose mtime changed, so the cost does not grow with the archive.
+    Exposures found after the initial scan are handed out by wait().
+    """
+
+    def __init__(self, spectro_data, mode=DISCOVERY_MODE,
+                 poll_interval=DISCOVERY_POLL_INTERVAL):
+        super().__init__(daemon=True)
+
+        self.spectro_data = spectro_data
+        self.mode = mode if INotify is not None else 'poll'
+        self.poll_interval = poll_interval
+
+        self.index = NightIndex()
+        self.events = queue.Queue()
+        self.exit = Event()
+        self.ready = Event()
+
+        self.watching = False
+        self.watches = dict()
+        self.watch_kind = dict()
+        self.mtimes = dict()
+
+        # exposure directories already listed, and the ones among them
+        # still waiting for raw data
+        self.seen_dirs = set()
+        self.pending = set()
+
+    def night_path(self, night):
+        return os.path.join(self.spectro_data, night)
+
+    def found_raw(self, night, exposure_id):
+        if self.index.add_exposure(night, exposure_id) and self.ready.is_set():
+            logger.debug('Exposure {} found'.format(exposure_id))
+            self.events.put((night, exposure_id))
+
+    def scan_exposure_dir(self, night, path):
+        """ Indexes the raw files of an exposure directory.
+
+        Returns:
+            bool -- True if raw data was found
+        """
+
+        found = False
+
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            return False
+
+        for entry in entries:
+            match = RAW_PATTERN.match(entry.name)
+            if match:
+                self.found_raw(night, int(match.group(1)))
+                found = True
+
+        return found
+
+    def scan_night(self, night):
+        """ Indexes the exposure directories of a night not seen yet. """
+
+        self.index.add_night(night)
+
+        try:
+            entries = list(os.scandir(self.night_path(night)))
+        except OSError:
+            return
+
+        for entry in entries:
+            if not entry.is_dir() or not EXPOSURE_PATTERN.match(entry.name):
+                continue
+
+            if entry.path in self.seen_dirs:
+                continue
+
+            self.seen_dirs.add(entry.path)
+            self.watch_exposure_dir(night, entry.path)
+
+            if not self.scan_exposure_dir(night, entry.path):
+                self.pending.add(entry.path)
+
+    def scan_root(self):
+        """ Indexes new nights, returns the ones not seen before. """
+
+        new_nights = list()
+
+        for entry in os.scandir(self.spectro_data):
+            if entry.is_dir() and NIGHT_PATTERN.match(entry.name):
+                if self.index.add_night(entry.name):
+                    new_nights.append(entry.name)
+
+        return sorted(new_nights)
+
+    def initial_scan(self):
+        """ Lists the nights once and indexes the most recent night
+        with exposures. """
+
+        self.scan_root()
+
+        for night in sorted(self.index.nights, reverse=True):
+            self.scan_night(night)
+            if self.index.nights[night]:
+                break
+
+    def watch_exposure_dir(self, night, path):
+        if not self.watching:
+            return
+
+        wd = self.inotify.add_watch(
+            path, flags.CLOSE_WRITE | flags.MOVED_TO
+        )
+        self.watches[wd] = path
+        self.watch_kind[wd] = ('exposure', night)
+
+    def watch_night(self, night):
+        """ Moves the night watches to a new night. """
+
+        for wd, (kind, watched_night) in list(self.watch_kind.items()):
+            if kind != 'root' and watched_night != night:
+                try:
+                    self.inotify.rm_watch(wd)
+                except OSError:
+                    pass
+                self.watches.pop(wd, None)
+                self.watch_kind.pop(wd, None)
+
+        wd = self.inotify.add_watch(
+            self.night_path(night), flags.CREATE | flags.MOVED_TO
+        )
+        self.watches[wd] = self.night_path(night)
+        self.watch_kind[wd] = ('night', night)
+
+        self.pending = set(
+            path for path in self.pending
+            if os.path.dirname(path) == self.night_path(night)
+        )
+
+        # directories listed before the watches were in place
+        for path in list(self.pending):
+            self.watch_exposure_dir(night, path)
+            if self.scan_exposure_dir(night, path):
+                self.pending.discard(path)
+
+        self.scan_night(night)
+
+    def run_inotify(self):
+        self.inotify = INotify()
+        self.watching = True
+
+        wd = self.inotify.add_watch(
+            self.spectro_data, flags.CREATE | flags.MOVED_TO
+        )
+        self.watches[wd] = self.spectro_data
+        self.watch_kind[wd] = ('root', None)
+
+        self.ready.set()
+
+        if self.index.latest_night:
+            self.watch_night(self.index.latest_night)
+
+        while not self.exit.is_set():
+            for event in self.inotify.read(timeout=1000):
+                kind, night = self.watch_kind.get(event.wd, (None, None))
+                is_dir = event.mask & flags.ISDIR
+
+                if kind == 'root' and is_dir and \
+                        NIGHT_PATTERN.match(event.name):
+                    self.index.add_night(event.name)
+                    if event.name == self.index.latest_night:
+                        self.watch_night(event.name)
+                elif kind == 'night' and is_dir:
+                    self.scan_night(night)
+                elif kind == 'exposure':
+                    match = RAW_PATTERN.match(event.name)
+                    if match:
+                        self.pending.discard(self.watches[event.wd])
+                        self.found_raw(night, int(match.group(1)))
+
+    def changed(self, path):
+        """ Whether the mtime of a directory changed since the last poll. """
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return False
+
+        if self.mtimes.get(path) == mtime:
+            return False
+
+        self.mtimes[path] = mtime
+        return True
+
+    def run_poll(self):
+        self.ready.set()
+
+        while not self.exit.wait(self.poll_interval):
+            if self.changed(self.spectro_data):
+                self.scan_root()
+
+            night = self.index.latest_night
+
+            if night is None:
+                continue
+
+            if self.changed(self.night_path(night)):
+                self.scan_night(night)
+
+            for path in list(self.pending):
+                if self.changed(path) and \
+                        self.scan_exposure_dir(night, path):
+                    self.pending.discard(path)
+
+            # exposure directories of previous nights are not polled
+            self.pending = set(
+                path for path in self.pending
+                if os.path.dirname(path) == self.night_path(night)
+            )
+
+    def run(self):
+        try:
+            self.initial_scan()
+
+            if self.mode == 'inotify':
+                self.run_inotify()
+            else:
+                self.run_poll()
+        except Exception:
+            logger.exception('Exposure discovery stopped.')
+            self.ready.set()
+
+    def wait(self, timeout=None):
+        """ Waits for exposures found after the initial scan.
+
+        Keyword Arguments:
+            timeout {float} -- seconds to wait for the first exposure
+                (default: {None})
+
+        Returns:
+            list -- (night, exposure ID) tuples, in discovery order
+        """
+
+        try:
+            found = [self.events.get(timeout=timeout)]
+        except queue.Empty:
+            return list()
+
+        while True:
+            try:
+                found.append(self.events.get_nowait())
+            except queue.Empty:
+                return found
+
+    def stop(self):
+        self.exit.set()
@@ -1,8 +1,7 @@
 import datetime
-import time
+import functools
 import gc
 from multiprocessing import Event, Process, Value
-from concurrent import futures
 from threading import Thread
 import os
 import errno
@@ -11,9 +10,16 @@ from socket import error as socket_error
 from clients import get_qlf_interface
 from log import get_logger
 from qlf_models import QLFModels
-from qlf_pipeline import run_process
+from pipeline_scheduler import PipelineScheduler
+from warm_pool import get_warm_pool
+from calibration_cache import get_calibration_cache
+from util import extract_exposure_data
 
 allowed_delay = float(os.environ.get("PIPELINE_DELAY"))
+
+# queued exposures that switch the scheduler to catch-up mode
+catchup_backlog = int(os.environ.get("PIPELINE_CATCHUP_BACKLOG", 3))
+
 qlf_root = os.environ.get('QLF_ROOT')
 
 logger = get_logger(
@@ -36,7 +42,7 @@ class ExposureMonitoring(Process):
     def __init__(self):
         super().__init__()
 
-        self.pool = futures.ThreadPoolExecutor(max_workers=1)
+        self.scheduler = PipelineScheduler()
         self.process = None
 
         self.exit = Event()
@@ -46,90 +52,226 @@ class ExposureMonitoring(Process):
         self.ics = get_qlf_interface()
         self.process_id = Value('i', 0)
 
+        self.calibration_night = None
+        self.calibration_thread = None
+
     def run(self):
         """ """
+        QLFModels().requeue_running_exposures()
+
+        # imports the Quick Look pipeline before the first exposure
+        if get_warm_pool():
+            get_warm_pool().warm_up()
+            self.refresh_calibration(None)
+
+        self.discover_exposure(self.ics.last_exposure())
+
         while not self.exit.is_set():
-            time.sleep(1.5)
+            # returns as soon as a new exposure is found
+            new_exposures = self.ics.new_exposures(timeout=1.5)
 
-            if not self.process or not self.process.running():
+            if not self.scheduler.reducing():
                 self.running.clear()
 
-            last_exposure = self.ics.last_exposure()
-            try:
-                exposure = last_exposure['exposure']
-                fibermap = last_exposure['fibermap']
-            except:
-                logger.debug('No exposure available')
-                continue
+            for last_exposure in new_exposures:
+                self.discover_exposure(last_exposure)
 
-            fibermap = last_exposure.get('fibermap', None)
+            while self.dispatch_exposure():
+                pass
 
-            ics_last_expid = self.ics_last_exposure.get('exposure_id', None)
+        logger.debug("Bye!")
 
-            if exposure.get('exposure_id') == ics_last_expid:
-                logger.debug('Exposure {} has already been processed'.format(
-                    ics_last_expid))
-                continue
+    def discover_exposure(self, last_exposure):
+        """ Records a new exposure in the database and puts it in the
+        processing queue.
+
+        Arguments:
+            last_exposure {dict} -- exposure and fibermap data
+        """
+
+        try:
+            exposure = last_exposure['exposure']
+            fibermap = last_exposure['fibermap']
+        except:
+            logger.debug('No exposure available')
+            return
+
+        fibermap = last_exposure.get('fibermap', None)
+
+        ics_last_expid = self.ics_last_exposure.get('exposure_id', None)
 
-            self.ics_last_exposure = exposure
+        if exposure.get('exposure_id') == ics_last_expid:
+            logger.debug('Exposure {} has already been processed'.format(
+                ics_last_expid))
+            return
 
-            logger.debug('Exposure {} obtained'.format(
+        self.ics_last_exposure = exposure
+
+        logger.debug('Exposure {} obtained'.format(
+            exposure.get('exposure_id')))
+
+        self.refresh_calibration(exposure.get('night'))
+
+        # records exposure in database
+        exposure_obj = QLFModels().insert_exposure(**exposure)
+        if exposure_obj:
+            fibermap['exposure'] = exposure_obj
+            QLFModels().insert_fibermap(**fibermap)
+
+        if isinstance(exposure.get('time'), str):
+            exposure['time'] = datetime.datetime.strptime(
+                exposure.get('time'), "%Y-%m-%dT%H:%M:%S.%f"
+            )
+
+        # the queue is filled as exposures arrive, so the delay only
+        # keeps old exposures found at startup from being processed
+        delay = datetime.datetime.utcnow() - exposure.get('time')
+        delay = delay.total_seconds()
+
+        if delay > allowed_delay:
+            logger.debug((
+                'The delay in the acquisition of the exposure '
+                'went from {} seconds'.format(str(allowed_delay))
+            ))
+            return
+
+        if QLFModels().enqueue_exposure(
+            exposure.get('exposure_id'),
+            exposure.get('night'),
+            exposure.get('flavor')
+        ):
+            logger.debug('Exposure {} queued'.format(
                 exposure.get('exposure_id')))
 
-            # records exposure in database
-            exposure_obj = QLFModels().insert_exposure(**exposure)
-            if exposure_obj:
-                fibermap['exposure'] = exposure_obj
-                QLFModels().insert_fibermap(**fibermap)
+    def refresh_calibration(self, night):
+        """ Updates the calibration cache at startup and once per night,
+        in a background thread. Workers read the calibration files
+        themselves until their entries are ready. """
 
-            if self.process and self.process.running():
-                logger.debug('Process {} is running.'.format(
-                    str(self.process_id.value)
-                ))
-                continue
+        if night == self.calibration_night or not get_warm_pool():
+            return
+
+        calibration_cache = get_calibration_cache()
+
+        if not calibration_cache:
+            return
+
+        # retried with the next exposure
+        if self.calibration_thread and self.calibration_thread.is_alive():
+            return
+
+        self.calibration_thread = Thread(
+            target=calibration_cache.refresh, daemon=True
+        )
+        self.calibration_thread.start()
+
+        self.calibration_night = night
 
-            if isinstance(exposure.get('time'), str):
-                exposure['time'] = datetime.datetime.strptime(
-                    exposure.get('time'), "%Y-%m-%dT%H:%M:%S.%f"
-                )
+    def add_exposures(self, exposures):
+        """ Puts exposures already recorded in the database in the
+        processing queue.
 
-            delay = datetime.datetime.utcnow() - exposure.get('time')
-            delay = delay.total_seconds()
+        Arguments:
+            exposures {list} -- exposure IDs
+        """
 
-            if delay > allowed_delay:
-                logger.debug((
-                    'The delay in the acquisition of the exposure '
-                    'went from {} seconds'.format(str(allowed_delay))
-                ))
+        for exposure_id in exposures:
+            exposure = QLFModels().get_exposure(exposure_id)
+
+            if not exposure:
+                logger.error('Exposure {} not found'.format(exposure_id))
                 continue
-               
-            logger.info('Exposure {} ({} {}) available.'.format(
-                exposure.get('exposure_id'),
-                exposure.get('program').capitalize(),
-                exposure.get('flavor')
+
+            QLFModels().enqueue_exposure(
+                exposure.exposure_id, exposure.night, exposure.flavor,
+                reprocess=True
+            )
+
+    def dispatch_exposure(self):
+        """ Starts the next queued exposure if the scheduler admits it.
+
+        Returns:
+            bool -- True if an exposure was started
+        """
+
+        backlog = QLFModels().count_queued_exposures()
+
+        if not backlog:
+            return False
+
+        catch_up = backlog >= catchup_backlog
+        hold = self.scheduler.admit(catch_up=catch_up)
+
+        if hold:
+            logger.debug('{} exposures queued, waiting: {}.'.format(
+                backlog, hold
             ))
+            return False
 
-            del self.process
-            gc.collect()
-            self.process = self.pool.submit(run_process, exposure, self.process_id)
-            self.process.add_done_callback(future_callback)
+        entry = QLFModels().dequeue_exposure()
 
-            self.running.set()
+        if not entry:
+            return False
 
-        logger.debug("Bye!")
+        try:
+            exposure = extract_exposure_data(entry.exposure_id, entry.night)
+        except Exception:
+            logger.exception('Failed to get exposure {}'.format(
+                entry.exposure_id))
+            QLFModels().finish_queued_exposure(entry.exposure_id, failed=True)
+            return True
+
+        logger.info('Exposure {} ({} {}) available.'.format(
+            exposure.get('exposure_id'),
+            exposure.get('program').capitalize(),
+            exposure.get('flavor')
+        ))
+
+        if catch_up:
+            logger.info('Catch-up mode: {} exposures queued.'.format(
+                backlog))
+
+        del self.process
+        gc.collect()
+        self.process = self.scheduler.submit(exposure, self.process_id)
+        self.process.add_done_callback(
+            functools.partial(queue_callback, entry.exposure_id)
+        )
+
+        self.running.set()
+
+        return True
 
     def shutdown(self):
         """ Turn off monitoring """
 
         self.exit.set()
         self.running.clear()
-        self.pool.shutdown()
+        self.scheduler.shutdown()
 
         del self.process
         gc.collect()
         self.process = None
 
 
+def queue_callback(exposure_id, process):
+    """ Marks the queued exposure as processed, once its QA is ingested.
+    An exposure left running by a stopped daemon is queued again at the
+    next start.
+
+    Arguments:
+        exposure_id {int} -- exposure ID
+        process {concurrent.futures object} -- background process
+    """
+
+    # exception() raises CancelledError for a cancelled process
+    failed = process.cancelled() or process.exception() is not None
+
+    QLFModels().finish_queued_exposure(exposure_id, failed=failed)
+
+    future_callback(process)
+
+
 def future_callback(process):
     """ Catch pipeline processing return.
     
@@ -137,6 +279,10 @@ def future_callback(process):
         process {concurrent.futures object} -- background process
     """
 
+    if process.cancelled():
+        daemon_logger.info('QL pipeline: processing cancelled.')
+        return
+
     try:
         process.result()
     except socket_error as serr:
@@ -0,0 +1,382 @@
+""" Offline import of ql-mergedQA-*.json trees into the database.
+
+Scans DESI_SPECTRO_REDUX/exposures/<night>/<expid>/ with a pool of
+worker processes. Each worker loads the exposures, processes, jobs,
+products and fiber metrics of its exposures, and the nightly metrics
+of their nights, in one transaction per chunk. Exposures and cameras
+already in the database are skipped, so the import can be run again
+over the same tree.
+
+Usage:
+    python import_merged_qa.py [--nights NIGHT ...] [--workers N]
+                               [--chunk-size N]
+"""
+
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import django
+
+from qlf_models import QLFModels, load_json
+from qa_columns import write_columns
+
+from dashboard.models import Camera, Exposure, Job, Process
+from django.db import transaction
+
+desi_spectro_data = os.environ.get('DESI_SPECTRO_DATA')
+desi_spectro_redux = os.environ.get('DESI_SPECTRO_REDUX')
+
+logger = logging.getLogger(name='qlf.import')
+
+NIGHT_PATTERN = re.compile(r"^\d{8}$")
+MERGED_QA_PATTERN = re.compile(r"^ql-mergedQA-([brz]\d)-(\d+)\.json$")
+
+
+def scan_exposures(nights=None):
+    """ Exposure directories with merged QA files.
+
+    Keyword Arguments:
+        nights {list} -- nights to be scanned, all if None
+            (default: {None})
+
+    Returns:
+        list -- (night, exposure ID, directory) tuples
+    """
+
+    exposures_dir = os.path.join(desi_spectro_redux, 'exposures')
+    exposures = list()
+
+    for night in sorted(os.listdir(exposures_dir)):
+        if not NIGHT_PATTERN.match(night):
+            continue
+
+        if nights and night not in nights:
+            continue
+
+        for entry in sorted(os.scandir(os.path.join(exposures_dir, night)),
+                            key=lambda entry: entry.name):
+            if entry.is_dir() and entry.name.isdigit():
+                exposures.append((night, int(entry.name), entry.path))
+
+    return exposures
+
+
+def raw_header(night, exposure_id):
+    """ Header with DATE-OBS of the raw exposure, None if not found. """
+
+    from astropy.io import fits
+
+    zfill = str(exposure_id).zfill(8)
+    raw_path = os.path.join(
+        desi_spectro_data or '', night, zfill, 'desi-{}.fits.fz'.format(zfill)
+    )
+
+    if not os.path.isfile(raw_path):
+        return None
+
+    try:
+        with fits.open(raw_path) as hdulist:
+            for hdu in hdulist[:2]:
+                if 'DATE-OBS' in hdu.header:
+                    return hdu.header
+    except Exception as err:
+        logger.error('{}: {}'.format(raw_path, err))
+
+    return None
+
+
+def read_exposure(night, exposure_id, path):
+    """ Exposure row and job rows of an exposure directory.
+
+    Returns:
+        tuple -- (exposure row, list of job rows), the job rows end with
+            the merged QA
+    """
+
+    jobs = list()
+    merged = None
+
+    for name in sorted(os.listdir(path)):
+        match = MERGED_QA_PATTERN.match(name)
+
+        if not match or int(match.group(2)) != exposure_id:
+            continue
+
+        merged_path = os.path.join(path, name)
+
+        try:
+            # NaN and infinity are replaced by -9999 while it is parsed
+            merged = load_json(merged_path)
+        except (OSError, ValueError) as err:
+            logger.error('{}: {}'.format(merged_path, err))
+            continue
+
+        finished = datetime.utcfromtimestamp(os.path.getmtime(merged_path))
+
+        jobs.append((
+            exposure_id,
+            match.group(1),
+            finished.isoformat(),
+            merged
+        ))
+
+    if not jobs:
+        return None, jobs
+
+    info = merged.get('GENERAL_INFO', dict())
+    header = raw_header(night, exposure_id) or dict()
+
+    if header.get('DATE-OBS'):
+        dateobs = header.get('DATE-OBS')
+    else:
+        logger.info('Exposure {}: no raw data, night used as '
+                    'dateobs'.format(exposure_id))
+        dateobs = datetime.strptime(night, '%Y%m%d').isoformat()
+
+    exposure = (
+        exposure_id,
+        night,
+        dateobs,
+        merged.get('FLAVOR') or header.get('FLAVOR') or 'Object',
+        info.get('PROGRAM') or header.get('PROGRAM'),
+        info.get('EXPTIME') or header.get('EXPTIME'),
+        header.get('TELRA'),
+        header.get('TELDEC'),
+        header.get('TILEID'),
+        header.get('AIRMASS'),
+    )
+
+    return exposure, jobs
+
+
+def copy_rows(cursor, table, rows):
+    """ Loads rows into a table with COPY ... CSV. """
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+
+    buffer.seek(0)
+    cursor.copy_expert(
+        "COPY {} FROM STDIN WITH (FORMAT csv)".format(table), buffer
+    )
+
+
+def import_chunk(exposures):
+    """ Imports a chunk of exposure directories in one transaction.
+
+    Arguments:
+        exposures {list} -- (night, exposure ID, directory) tuples
+
+    Returns:
+        tuple -- (exposures, jobs, products) created
+    """
+
+    try:
+        return load_chunk(exposures)
+    except Exception:
+        # nothing of the chunk is stored, a new run imports it
+        logger.exception('Exposures {} - {} failed.'.format(
+            exposures[0][1], exposures[-1][1]
+        ))
+        return 0, 0, 0
+
+
+def load_chunk(exposures):
+    """ Reads the merged QA files of a chunk and loads them with COPY. """
+
+    exposure_rows = list()
+    job_rows = list()
+    outputs = dict()
+
+    for night, exposure_id, path in exposures:
+        exposure, jobs = read_exposure(night, exposure_id, path)
+        if exposure:
+            exposure_rows.append(exposure)
+            for exposure_id, camera, finished, merged in jobs:
+                job_rows.append((
+                    exposure_id, camera, finished,
+                    json.dumps(merged, allow_nan=False)
+                ))
+                outputs[(exposure_id, camera)] = merged
+
+    if not job_rows:
+        return 0, 0, 0
+
+    tables = dict(
+        exposure=Exposure._meta.db_table,
+        camera=Camera._meta.db_table,
+        process=Process._meta.db_table,
+        job=Job._meta.db_table
+    )
+
+    # instantiated out of the transaction, it closes the connection
+    models = QLFModels()
+
+    with transaction.atomic():
+        with django.db.connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TEMP TABLE import_exposure (
+                    exposure_id integer, night varchar(45),
+                    dateobs timestamp with time zone, flavor varchar(45),
+                    program varchar(45), exptime double precision,
+                    telra double precision, teldec double precision,
+                    tile integer, airmass double precision
+                ) ON COMMIT DROP;
+                CREATE TEMP TABLE import_job (
+                    exposure_id integer, camera varchar(2),
+                    finished timestamp with time zone, output jsonb
+                ) ON COMMIT DROP;
+            """)
+
+            copy_rows(cursor, 'import_exposure', exposure_rows)
+            copy_rows(cursor, 'import_job', job_rows)
+
+            cursor.execute("""
+                INSERT INTO {exposure} (exposure_id, night, dateobs, flavor,
+                    program, exptime, telra, teldec, tile, airmass)
+                SELECT * FROM import_exposure
+                ON CONFLICT (exposure_id) DO NOTHING
+            """.format(**tables))
+            created_exposures = cursor.rowcount
+
+            cursor.execute("""
+                INSERT INTO {camera} (camera, spectrograph, arm)
+                SELECT DISTINCT camera, right(camera, 1), left(camera, 1)
+                FROM import_job
+                ON CONFLICT (camera) DO NOTHING
+            """.format(**tables))
+
+            # one process per exposure without one yet, the cameras of
+            # exposures already processed go to their last process
+            cursor.execute("""
+                INSERT INTO {process} (pipeline_name, process_dir, version,
+                    start, "end", status, exposure_id, qa_tests)
+                SELECT 'Quick Look',
+                    'exposures/' || exposure.night || '/' ||
+                        lpad(exposure.exposure_id::text, 8, '0'),
+                    '', min(job.finished), max(job.finished), 0,
+                    exposure.exposure_id, '{{}}'
+                FROM import_exposure AS exposure
+                JOIN import_job AS job USING (exposure_id)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {process} AS process
+                    WHERE process.exposure_id = exposure.exposure_id
+                )
+                GROUP BY exposure.exposure_id, exposure.night
+            """.format(**tables))
+
+            cursor.execute("""
+                WITH created AS (
+                    INSERT INTO {job} (name, start, "end", status, version,
+                        camera_id, process_id, output)
+                    SELECT 'Quick Look', job.finished, job.finished, 0, '1.0',
+                        job.camera, process.id, job.output
+                    FROM import_job AS job
+                    JOIN LATERAL (
+                        SELECT max(id) AS id FROM {process}
+                        WHERE exposure_id = job.exposure_id
+                    ) AS process ON true
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM {job} AS existing
+                        JOIN {process} AS existing_process
+                            ON existing_process.id = existing.process_id
+                        WHERE existing_process.exposure_id = job.exposure_id
+                            AND existing.camera_id = job.camera
+                    )
+                    RETURNING id, process_id, camera_id
+                )
+                SELECT created.id, created.process_id, created.camera_id,
+                    process.exposure_id
+                FROM created
+                JOIN {process} AS process ON process.id = created.process_id
+            """.format(**tables))
+            jobs = cursor.fetchall()
+
+        job_ids = [job_id for job_id, _, _, _ in jobs]
+        products = models.create_products(job_ids) if job_ids else 0
+
+        for job_id, _, camera, exposure_id in jobs:
+            models.create_fiber_metrics(
+                job_id, outputs[(exposure_id, camera)]
+            )
+
+        if jobs:
+            models.update_nightly_metrics(
+                set(exposure[1] for exposure in exposure_rows)
+            )
+
+    for _, process_id, camera, exposure_id in jobs:
+        write_columns(process_id, camera, outputs[(exposure_id, camera)])
+
+    for process_id in set(process_id for _, process_id, _, _ in jobs):
+        models.invalidate_renders(process_id)
+
+    return created_exposures, len(job_ids), products
+
+
+def close_connection():
+    """ Worker initializer, the connection of the parent is not shared """
+
+    django.db.connection.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Import ql-mergedQA-*.json trees into the database.'
+    )
+    parser.add_argument(
+        '--nights', nargs='*',
+        help='nights to be imported, all by default'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=multiprocessing.cpu_count(),
+        help='worker processes'
+    )
+    parser.add_argument(
+        '--chunk-size', type=int, default=20,
+        help='exposures loaded per transaction'
+    )
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    exposures = scan_exposures(args.nights)
+
+    chunks = [
+        exposures[index:index + args.chunk_size]
+        for index in range(0, len(exposures), args.chunk_size)
+    ]
+
+    logger.info('{} exposure directories, {} chunks.'.format(
+        len(exposures), len(chunks)
+    ))
+
+    close_connection()
+
+    totals = [0, 0, 0]
+
+    with multiprocessing.Pool(args.workers, close_connection) as pool:
+        for created in pool.imap_unordered(import_chunk, chunks):
+            totals = [total + count for total, count in zip(totals, created)]
+
+    logger.info('{} exposures, {} jobs and {} products created in '
+                '{:.1f}s.'.format(*totals, time.time() - start))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(processName)s %(message)s'
+    )
+    main(sys.argv[1:])
@@ -0,0 +1,71 @@
+""" Stores the per fiber metrics of the jobs ingested before the
+FiberMetric table.
+
+Jobs that already have fiber metrics are skipped, so an interrupted run
+continues where it stopped.
+
+Usage:
+    python migrate_fiber_metrics.py [--batch-size N] [--all]
+"""
+
+import argparse
+import logging
+import sys
+
+from qlf_models import QLFModels
+
+from dashboard.models import Job
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Store the per fiber metrics of the job outputs.'
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=100,
+        help='job outputs read per query'
+    )
+    parser.add_argument(
+        '--all', action='store_true',
+        help='also replace the fiber metrics already stored'
+    )
+    args = parser.parse_args(argv)
+
+    models = QLFModels()
+    jobs = Job.objects.filter(output__isnull=False)
+
+    if not args.all:
+        jobs = jobs.filter(fiber_metrics__isnull=True)
+
+    last_job = 0
+    stored = 0
+
+    while True:
+        batch = list(jobs.filter(id__gt=last_job).order_by('id').values_list(
+            'id', 'output'
+        )[:args.batch_size])
+
+        if not batch:
+            break
+
+        for job_id, output in batch:
+            stored += models.create_fiber_metrics(job_id, output)
+
+        last_job = batch[-1][0]
+
+        logger.info('Jobs {} - {}: {} fiber metrics.'.format(
+            batch[0][0], last_job, stored
+        ))
+
+    # fiber metric series of every process changed
+    models.invalidate_renders()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(message)s'
+    )
+    main(sys.argv[1:])
@@ -0,0 +1,57 @@
+""" Derives the products of every job from its output, e.g. after a
+change in ql_mapping/metrics.json.
+
+An interrupted migration resumes from its checkpoints when the command
+is run again with the same metrics.json and mode. A completed full
+migration starts again; a completed incremental one only with
+--restart.
+
+Usage:
+    python migrate_jobs_outputs.py [--workers N] [--batch-size N]
+                                   [--incremental] [--restart]
+"""
+
+import argparse
+import logging
+import sys
+
+from qlf_models import QLFModels, load_metrics
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        description='Migrate the job outputs to products.'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=4,
+        help='worker processes, each one migrates its own job id range'
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=500,
+        help='jobs stored per transaction'
+    )
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='only add the metrics that have no products yet'
+    )
+    parser.add_argument(
+        '--restart', action='store_true',
+        help='ignore the checkpoints of a previous run'
+    )
+    args = parser.parse_args(argv)
+
+    QLFModels().migrate_outputs(
+        load_metrics(),
+        workers=args.workers,
+        batch_size=args.batch_size,
+        incremental=args.incremental,
+        restart=args.restart
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(processName)s %(message)s'
+    )
+    main(sys.argv[1:])
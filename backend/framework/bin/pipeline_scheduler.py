@@ -0,0 +1,173 @@
+import os
+import logging
+import functools
+from concurrent import futures
+from threading import Lock
+
+import psutil
+
+from qlf_pipeline import reduce_exposure
+from prerender import get_prerenderer
+
+# QA ingestions allowed to run while the next exposure is being reduced
+max_ingestions = int(os.environ.get('PIPELINE_MAX_INGESTIONS', 2))
+
+# exposures reduced in parallel while draining a backlog (catch-up mode)
+max_catchup_reductions = int(
+    os.environ.get('PIPELINE_CATCHUP_REDUCTIONS', 3)
+)
+
+# admission control for starting the reduction of a new exposure
+max_cpu_percent = float(os.environ.get('PIPELINE_MAX_CPU_PERCENT', 90))
+min_free_memory = float(os.environ.get('PIPELINE_MIN_FREE_MEMORY', 2048))
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+
+class PipelineScheduler(object):
+    """ Runs exposures as a two-stage pipeline: the camera reductions of
+    one exposure at a time, and the QA ingestion and evaluation of up to
+    PIPELINE_MAX_INGESTIONS exposures in parallel with it.
+
+    The reduction of exposure N+1 starts while exposure N is still being
+    ingested, as long as there are CPU and memory to spare. In catch-up
+    mode up to PIPELINE_CATCHUP_REDUCTIONS exposures are reduced at once.
+    """
+
+    def __init__(self):
+        self.reductions = futures.ThreadPoolExecutor(
+            max_workers=max(max_catchup_reductions, 1)
+        )
+        self.ingestions = futures.ThreadPoolExecutor(
+            max_workers=max_ingestions
+        )
+
+        self.reducing_set = set()
+        self.ingesting = set()
+        self.lock = Lock()
+
+        # first sample, admit measures the CPU usage since the last call
+        # instead of blocking the monitor loop
+        psutil.cpu_percent(interval=None)
+
+    def reducing_count(self):
+        with self.lock:
+            return len(self.reducing_set)
+
+    def reducing(self):
+        """ Whether an exposure is in the reduction stage. """
+
+        return self.reducing_count() > 0
+
+    def ingesting_count(self):
+        with self.lock:
+            return len(self.ingesting)
+
+    def admit(self, catch_up=False):
+        """ Checks if the reduction of a new exposure can start now.
+
+        Keyword Arguments:
+            catch_up {bool} -- draining a backlog, allows more than one
+                reduction at a time (default: {False})
+
+        Returns:
+            str -- reason to hold the exposure, None if admitted
+        """
+
+        max_reductions = max_catchup_reductions if catch_up else 1
+        reducing = self.reducing_count()
+
+        if reducing >= max_reductions:
+            return '{} reductions are running'.format(reducing)
+
+        if self.ingesting_count() >= max_ingestions:
+            return '{} ingestions are running'.format(max_ingestions)
+
+        # nothing else is competing for the node
+        if not reducing and not self.ingesting_count():
+            return None
+
+        cpu_percent = psutil.cpu_percent(interval=None)
+        if cpu_percent > max_cpu_percent:
+            return 'CPU usage at {}%'.format(cpu_percent)
+
+        free_memory = psutil.virtual_memory().available / 2**20
+        if free_memory < min_free_memory:
+            return 'only {:.0f} MB of memory available'.format(free_memory)
+
+        return None
+
+    def submit(self, exposure, return_process_id=None):
+        """ Starts the reduction stage of an exposure.
+
+        Arguments:
+            exposure {dict} -- exposure info (see qlf_pipeline.run_process)
+
+        Keyword Arguments:
+            return_process_id {object 'multiprocessing.sharedctypes.Value'}
+                -- process ID object allocated from shared memory.
+                (default: {None})
+
+        Returns:
+            concurrent.futures.Future -- both stages, done when the QA of
+                the exposure is ingested or a stage fails, its result is
+                the process ID
+        """
+
+        processed = futures.Future()
+
+        reduction = self.reductions.submit(
+            self.reduce, exposure, return_process_id, processed
+        )
+
+        with self.lock:
+            self.reducing_set.add(reduction)
+
+        reduction.add_done_callback(self.reduction_done)
+
+        return processed
+
+    def reduce(self, exposure, return_process_id, processed):
+        try:
+            qlf_process = reduce_exposure(exposure, return_process_id)
+            process_id = qlf_process.data.get('process_id')
+
+            ingestion = self.ingestions.submit(
+                qlf_process.ingest_parallel_qas
+            )
+        except Exception as err:
+            processed.set_exception(err)
+            raise
+
+        with self.lock:
+            self.ingesting.add(ingestion)
+
+        ingestion.add_done_callback(
+            functools.partial(self.ingestion_done, processed, process_id)
+        )
+
+        return process_id
+
+    def reduction_done(self, reduction):
+        with self.lock:
+            self.reducing_set.discard(reduction)
+
+    def ingestion_done(self, processed, process_id, ingestion):
+        with self.lock:
+            self.ingesting.discard(ingestion)
+
+        # the error is logged by the callbacks of processed
+        try:
+            ingestion.result()
+        except Exception as err:
+            processed.set_exception(err)
+        else:
+            processed.set_result(process_id)
+
+    def shutdown(self, wait=True):
+        self.reductions.shutdown(wait=wait)
+        self.ingestions.shutdown(wait=wait)
+
+        prerenderer = get_prerenderer()
+        if prerenderer and wait:
+            prerenderer.shutdown()
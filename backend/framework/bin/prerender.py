@@ -0,0 +1,177 @@
+import os
+import logging
+import multiprocessing
+import time
+from threading import Condition, Lock, Thread
+
+from render_cache import get_render_cache
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+# 'off' leaves every view to be rendered on its first request
+PRERENDER = os.environ.get('PRERENDER', 'on')
+
+# output modes rendered, comma separated: html, json, components
+PRERENDER_OUTPUTS = os.environ.get('PRERENDER_OUTPUTS', 'html').split(',')
+
+# rendering is CPU bound, views are rendered in worker processes
+PRERENDER_WORKERS = int(os.environ.get('PRERENDER_WORKERS', 4))
+
+
+def render_view(process_id, view):
+    """ Renders a view into the render cache.
+
+    Returns:
+        bool -- True if rendered, the QA of a view may not be in the
+            outputs of the flavor
+    """
+
+    function, args = view
+
+    try:
+        function(process_id, *args)
+    except Exception as err:
+        logger.debug('{}{} of process {} not rendered: {}'.format(
+            function.__name__, args, process_id, err
+        ))
+        return False
+
+    return True
+
+
+def render_view_star(args):
+    return render_view(*args)
+
+
+class PreRenderer(object):
+    """ Renders the QA views of each process after its ingestion, so the
+    first request of each one is served from the render cache.
+
+    Processes are rendered one at a time by a single thread, in a pool of
+    PRERENDER_WORKERS processes kept between exposures. Only the newest
+    process waits for its turn, a process not started yet when a newer
+    one finishes is dropped. """
+
+    def __init__(self, workers=PRERENDER_WORKERS):
+        self.workers = workers
+        self.pool = None
+
+        # (process id, cameras) of the next process to be rendered
+        self.pending = None
+        self.condition = Condition()
+        self.thread = None
+
+    def submit(self, process_id, cameras):
+        """ Queues the views of a process, replacing the process still
+        waiting to be rendered.
+
+        Arguments:
+            process_id {int} -- process ID
+            cameras {list} -- camera names
+        """
+
+        with self.condition:
+            if self.pending is not None:
+                logger.info('Pre-render of process {} superseded by '
+                            'process {}.'.format(self.pending[0], process_id))
+
+            self.pending = (process_id, cameras)
+
+            if self.thread is None:
+                self.thread = Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+
+                process_id, cameras = self.pending
+                self.pending = None
+
+            # stopped by shutdown
+            if process_id is None:
+                return
+
+            try:
+                self.render(process_id, cameras)
+            except Exception:
+                logger.exception('Pre-render of process {} failed.'.format(
+                    process_id
+                ))
+
+    def render(self, process_id, cameras):
+        """ Renders the views of a process into the render cache.
+
+        Arguments:
+            process_id {int} -- process ID
+            cameras {list} -- camera names
+
+        Returns:
+            int -- number of views rendered
+        """
+
+        from dashboard.bokeh.render import process_views
+
+        start = time.time()
+        views = process_views(cameras, PRERENDER_OUTPUTS)
+
+        if self.pool is None:
+            # forked from the fork server, not from this process and its
+            # threads, each worker opens its own connection
+            context = multiprocessing.get_context('forkserver')
+            self.pool = context.Pool(self.workers)
+
+        rendered = sum(self.pool.imap_unordered(
+            render_view_star, [(process_id, view) for view in views]
+        ))
+
+        logger.info(
+            '{} of {} views of process {} rendered in {:.1f}s.'.format(
+                rendered, len(views), process_id, time.time() - start
+            )
+        )
+
+        return rendered
+
+    def shutdown(self):
+        """ Drops the process waiting to be rendered and stops the
+        workers after the current one. """
+
+        with self.condition:
+            if self.thread is None:
+                return
+
+            self.pending = (None, None)
+            self.condition.notify()
+
+        self.thread.join()
+        self.thread = None
+
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+prerenderer = None
+prerenderer_lock = Lock()
+
+
+def get_prerenderer():
+    """ Pre-renderer shared by the exposures of this process, None when
+    disabled or without the render cache. """
+
+    global prerenderer
+
+    if PRERENDER != 'on' or not get_render_cache():
+        return None
+
+    with prerenderer_lock:
+        if prerenderer is None:
+            prerenderer = PreRenderer()
+
+    return prerenderer
@@ -0,0 +1,289 @@
+import io
+import os
+import json
+import mmap
+import shutil
+import struct
+import logging
+import tempfile
+import zipfile
+from functools import lru_cache
+
+import numpy
+from numpy.lib import format as npy_format
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+desi_spectro_redux = os.environ.get('DESI_SPECTRO_REDUX')
+
+# 'off' keeps the QA of the jobs only in the database
+QA_COLUMNS = os.environ.get('QA_COLUMNS', 'on')
+
+QA_COLUMNS_DIR = os.environ.get(
+    'QA_COLUMNS_DIR', os.path.join(desi_spectro_redux or '', 'qa_columns')
+)
+
+# shorter lists (ranges, references, per amplifier values) stay in the
+# JSON part with their original precision
+COLUMN_MIN_SIZE = 16
+
+# the output without its columns
+OUTPUT_MEMBER = 'output.json'
+
+# ZIP local file header, the name and extra field lengths are at 26
+LOCAL_HEADER_SIZE = 30
+
+
+def process_columns_dir(process_id):
+    """ Sidecars of a process, in directories of 1000 processes. """
+
+    return os.path.join(
+        QA_COLUMNS_DIR, str(process_id // 1000).zfill(6), str(process_id)
+    )
+
+
+def columns_path(process_id, camera):
+    return os.path.join(
+        process_columns_dir(process_id), '{}.npz'.format(camera)
+    )
+
+
+def leaves(value):
+    """ Values of a list of numbers, or of lists of numbers. """
+
+    for element in value:
+        if isinstance(element, list):
+            yield from leaves(element)
+        else:
+            yield element
+
+
+def numeric_array(value):
+    """ Array of a list of numbers (or of lists of numbers), float64 or
+    int32 for integers (fiber IDs are used as indices), None for other
+    values. The array gives back the same list, lists mixing integers
+    and floats stay in the JSON part. """
+
+    if not isinstance(value, list):
+        return None
+
+    leaf = value
+    while isinstance(leaf, list) and leaf:
+        leaf = leaf[0]
+
+    if not isinstance(leaf, (int, float)) or isinstance(leaf, bool):
+        return None
+
+    try:
+        array = numpy.asarray(value)
+    except ValueError:
+        # ragged
+        return None
+
+    if array.size < COLUMN_MIN_SIZE:
+        return None
+
+    if array.dtype.kind == 'f':
+        if not numpy.isfinite(array).all():
+            return None
+        # integers would come back as floats
+        if any(type(element) is int for element in leaves(value)):
+            return None
+        return array.astype(numpy.float64)
+
+    if array.dtype.kind == 'i' and \
+            numpy.abs(array).max() <= numpy.iinfo(numpy.int32).max:
+        return array.astype(numpy.int32)
+
+    # strings, None or booleans among the numbers
+    return None
+
+
+@lru_cache(maxsize=None)
+def npy_header(dtype, shape):
+    """ .npy header of an array, the same for every array of a dtype and
+    shape, numpy takes longer to format it than to write the data. """
+
+    header = io.BytesIO()
+    npy_format.write_array_header_1_0(header, dict(
+        descr=npy_format.dtype_to_descr(dtype),
+        fortran_order=False,
+        shape=shape
+    ))
+
+    return header.getvalue()
+
+
+def split_output(output, keys=(), columns=None):
+    """ Splits a job output into its numeric lists and the rest of it.
+
+    Arguments:
+        output {dict} -- job output (ql-mergedQA)
+
+    Returns:
+        tuple -- (output without the columns, dict of arrays by path),
+            paths as in metrics.json, e.g. "GENERAL_INFO->RA"
+    """
+
+    if columns is None:
+        columns = dict()
+
+    rest = dict()
+
+    for key, value in output.items():
+        path = keys + (key,)
+
+        if isinstance(value, dict):
+            rest[key] = split_output(value, path, columns)[0]
+            continue
+
+        array = numeric_array(value)
+
+        if array is None:
+            rest[key] = value
+        else:
+            columns['->'.join(path)] = array
+
+    return rest, columns
+
+
+def write_columns(process_id, camera, output):
+    """ Writes the QA sidecar of a job: an uncompressed .npz with one
+    array per numeric list, by JSON path, and the rest of the output in
+    output.json.
+
+    Arguments:
+        process_id {int} -- process ID
+        camera {str} -- camera name
+        output {dict} -- job output (ql-mergedQA)
+
+    Returns:
+        bool -- True if the sidecar was written
+    """
+
+    if QA_COLUMNS != 'on' or not output:
+        return False
+
+    path = columns_path(process_id, camera)
+    tmp_path = None
+
+    try:
+        rest, columns = split_output(output)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # written aside and renamed, readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix='.tmp-'
+        )
+
+        with os.fdopen(fd, 'wb') as columns_file, zipfile.ZipFile(
+            columns_file, 'w', zipfile.ZIP_STORED
+        ) as archive:
+            archive.writestr(OUTPUT_MEMBER, json.dumps(rest))
+
+            for column, array in columns.items():
+                archive.writestr(
+                    '{}.npy'.format(column),
+                    npy_header(array.dtype, array.shape) + array.tobytes()
+                )
+
+        os.rename(tmp_path, path)
+    except Exception as err:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        logger.error('QA columns of process {} camera {}: {}'.format(
+            process_id, camera, err
+        ))
+        return False
+
+    return True
+
+
+def member_array(columns_file, mapped, info):
+    """ Array of a stored .npy member, as a view of the mapped file. """
+
+    columns_file.seek(info.header_offset + 26)
+    name_length, extra_length = struct.unpack('<HH', columns_file.read(4))
+    columns_file.seek(
+        info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length
+    )
+
+    version = npy_format.read_magic(columns_file)
+
+    if version == (1, 0):
+        header = npy_format.read_array_header_1_0(columns_file)
+    else:
+        header = npy_format.read_array_header_2_0(columns_file)
+
+    shape, fortran_order, dtype = header
+
+    return numpy.ndarray(
+        shape, dtype, buffer=mapped, offset=columns_file.tell(),
+        order='F' if fortran_order else 'C'
+    )
+
+
+def read_columns(process_id, camera, paths):
+    """ Job output from its QA sidecar. The lists of the requested paths
+    are read-only arrays over a memory map of the file, nothing is read
+    until they are used. The other lists stored as columns are left out
+    of the output.
+
+    Arguments:
+        process_id {int} -- process ID
+        camera {str} -- camera name
+        paths {list} -- JSON paths, e.g. ["GENERAL_INFO->RA"]
+
+    Returns:
+        dict -- job output without the lists not requested, None
+            without a sidecar
+    """
+
+    path = columns_path(process_id, camera)
+
+    try:
+        with open(path, 'rb') as columns_file:
+            with zipfile.ZipFile(columns_file) as archive:
+                infos = archive.infolist()
+                output = json.loads(
+                    archive.read(OUTPUT_MEMBER).decode('utf-8')
+                )
+
+            mapped = mmap.mmap(
+                columns_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+            for info in infos:
+                if not info.filename.endswith('.npy'):
+                    continue
+
+                column = info.filename[:-len('.npy')]
+                if column not in paths:
+                    continue
+
+                array = member_array(columns_file, mapped, info)
+
+                # written before the columns kept float64, the output
+                # is read from the database instead
+                if array.dtype == numpy.float32:
+                    return None
+
+                node = output
+                path_keys = column.split('->')
+                for path_key in path_keys[:-1]:
+                    node = node.setdefault(path_key, dict())
+                node[path_keys[-1]] = array
+    except FileNotFoundError:
+        return None
+    except Exception as err:
+        logger.error('QA columns of process {} camera {}: {}'.format(
+            process_id, camera, err
+        ))
+        return None
+
+    return output
+
+
+def delete_columns(process_id):
+    shutil.rmtree(process_columns_dir(process_id), ignore_errors=True)
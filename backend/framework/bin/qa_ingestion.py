@@ -0,0 +1,116 @@
+import os
+import json
+import logging
+from concurrent import futures
+from datetime import datetime
+from threading import Lock
+
+import django
+
+from qlf_models import QLFModels
+
+desi_spectro_redux = os.environ.get('DESI_SPECTRO_REDUX')
+
+# cameras ingested at the same time, each worker keeps its own
+# database connection between cameras
+ingestion_workers = int(os.environ.get('PIPELINE_INGESTION_WORKERS', 4))
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+
+def reset_connection():
+    """ Drops the connection of the current thread if it can no longer
+    be used, otherwise it is reused by the next camera. """
+
+    connection = django.db.connection
+
+    if connection.connection is not None and not connection.is_usable():
+        connection.close()
+
+
+class QAIngestion(object):
+    """ Ingests the QA of each camera (ql-mergedQA-*.json and Products)
+    as soon as the camera finishes, on at most PIPELINE_INGESTION_WORKERS
+    threads, and announces each ingested camera to the monitor. """
+
+    def __init__(self, max_workers=ingestion_workers):
+        self.executor = futures.ThreadPoolExecutor(max_workers=max_workers)
+        self.models = QLFModels()
+
+    def submit(self, data, camera):
+        """ Queues the ingestion of a finished camera.
+
+        Arguments:
+            data {dict} -- process data (see QLFProcess)
+            camera {dict} -- camera with execution results
+
+        Returns:
+            concurrent.futures.Future -- True if the QA was stored
+        """
+
+        return self.executor.submit(self.ingest, data, camera)
+
+    def ingest(self, data, camera):
+        reset_connection()
+
+        output_path = os.path.join(
+            desi_spectro_redux,
+            data.get('output_dir')
+        )
+
+        ingested = self.models.update_job(
+            camera.get('job_id'),
+            data.get('exposure_id'),
+            camera.get('name'),
+            camera.get('end'),
+            camera.get('status'),
+            output_path
+        )
+
+        if ingested:
+            self.notify_ready(data, camera)
+
+        return ingested
+
+    def notify_ready(self, data, camera):
+        """ Sends a camera_ready event to the monitor group. """
+
+        if not os.environ.get('QLF_REDIS', False):
+            return
+
+        try:
+            from channels import Group
+
+            Group("monitor").send({
+                "text": json.dumps({
+                    "camera_ready": {
+                        "process_id": data.get('process_id'),
+                        "exposure_id": data.get('exposure_id'),
+                        "camera": camera.get('name'),
+                        "date": datetime.now().strftime(
+                            "%Y-%m-%d %H:%M:%S UTC"
+                        )
+                    }
+                })
+            })
+        except Exception as err:
+            logger.error('Camera ready event: {}'.format(err))
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+qa_ingestion = None
+qa_ingestion_lock = Lock()
+
+
+def get_qa_ingestion():
+    """ QA ingestion workers shared by the exposures of this process. """
+
+    global qa_ingestion
+
+    with qa_ingestion_lock:
+        if qa_ingestion is None:
+            qa_ingestion = QAIngestion()
+
+    return qa_ingestion
@@ -5,8 +5,8 @@ from util import (
 )
 import os
 import datetime
-import re
 from log import get_logger
+from exposure_discovery import ExposureDiscovery
 
 qlf_root = os.environ.get('QLF_ROOT')
 
@@ -18,47 +18,62 @@ log = get_logger(
 
 class QLFInterface(object):
 
+    def __init__(self):
+        self.discovery = None
+
+    def discovery_service(self):
+        """ Starts the exposure discovery on first use, so it runs in the
+        process that reads the exposures. """
+
+        if self.discovery is None:
+            self.discovery = ExposureDiscovery(
+                os.environ.get('DESI_SPECTRO_DATA')
+            )
+            self.discovery.start()
+            self.discovery.ready.wait()
+
+        return self.discovery
+
+    def exposure_data(self, exposure_id, night):
+        return dict(exposure=extract_exposure_data(exposure_id, night),
+                    fibermap=extract_fibermap_data(exposure_id, night))
+
     def last_exposure(self):
 
         spectro_data = os.environ.get('DESI_SPECTRO_DATA')
 
-        night = re.findall(
-            r"(\d{8})",
-            ''.join(sorted(os.listdir(spectro_data), reverse=True)))[:1]
-        night = ''.join(night)
+        last = self.discovery_service().index.last_exposure()
 
-        if not night:
-            log.error("Empty nights directory: {}".format(spectro_data))
+        if not last:
+            log.error("Not found exposures: {}".format(spectro_data))
             return dict()
-        
-        night_path = os.path.join(spectro_data, night)
 
-        exposure = re.findall(
-            r"(\d{8})",
-            ''.join(sorted(os.listdir(night_path), reverse=True)))[:1]
-        exposure = ''.join(exposure)
+        night, exposure_id = last
 
-        if not exposure:
-            log.error("Empty exposures directory: {}".format(night_path))
+        try:
+            return self.exposure_data(exposure_id, night)
+        except Exception as err:
+            log.error("Failed to read exposure {}: {}".format(
+                exposure_id, err))
             return dict()
 
-        exposure_path = os.path.join(night_path, exposure)
+    def new_exposures(self, timeout=None):
+        """ Waits for exposures arriving after the discovery started.
 
-        try:
-            file_list = ''.join(sorted(os.listdir(exposure_path), reverse=True))
-        except:
-            log.error("File not found {}".format(exposure_path))
-            return None
-
-        exp_dir = re.findall(
-            r"desi-(\d+).fits.fz",
-            file_list
-        )[:1]
-        exp_dir = ''.join(exp_dir)
-
-        if not exp_dir:
-            log.error("Not found exposures: {}".format(exposure_path))
-            return dict()
+        Keyword Arguments:
+            timeout {float} -- seconds to wait (default: {None})
+
+        Returns:
+            list -- exposure and fibermap data of each new exposure
+        """
+
+        exposures = list()
+
+        for night, exposure_id in self.discovery_service().wait(timeout):
+            try:
+                exposures.append(self.exposure_data(exposure_id, night))
+            except Exception as err:
+                log.error("Failed to read exposure {}: {}".format(
+                    exposure_id, err))
 
-        return dict(exposure=extract_exposure_data(int(exp_dir), night),
-                    fibermap=extract_fibermap_data(int(exp_dir), night))
+        return exposures
@@ -1,7 +1,9 @@
 import glob
+import hashlib
 import json
 import logging
 import math
+import multiprocessing
 import os
 import sys
 from datetime import datetime, timedelta
@@ -22,13 +24,53 @@ os.environ['DJANGO_SETTINGS_MODULE'] = 'qlf.settings'
 django.setup()
 
 from dashboard.models import (
-    Camera, Configuration, Exposure, Job, Process, Fibermap, Product
+    Camera, Configuration, Exposure, ExposureQueue, FiberMetric, Job,
+    Metric, NightlyMetric, Process, Fibermap, Product, ProductMigration
 )
-from django.db.models import F
+from django.db import transaction
+from django.db.models import F, Max, Min
 from astropy.time import Time
+from qa_columns import (
+    delete_columns, read_columns, split_output, write_columns
+)
+from render_cache import get_render_cache
 
 logger = logging.getLogger()
 
+# queue priority by flavor, lower values are processed first
+FLAVOR_PRIORITY = dict(
+    item.split(':') for item in os.environ.get(
+        'PIPELINE_FLAVOR_PRIORITY', 'science:0,arc:1,flat:1'
+    ).split(',')
+)
+UNKNOWN_FLAVOR_PRIORITY = 9
+
+# stored in place of NaN and infinity, which jsonb does not accept
+INVALID_VALUE = -9999
+
+# day 0 of the modified Julian date
+MJD_EPOCH = datetime(1858, 11, 17)
+
+# Product partitions known to exist (committed), by table name
+product_partitions = set()
+
+# fibers of a petal, the last axis of the per fiber metrics
+FIBERS = 500
+
+# values walked by jsonify, other types are stored as they are
+JSONIFY_TYPES = (dict, list, tuple, float, numpy.ndarray, numpy.generic)
+
+
+def load_metrics():
+    """ Metrics stored as products, from ql_mapping/metrics.json. """
+
+    metrics_path = os.path.join(
+        qlf_root, "framework", "ql_mapping",
+        "metrics.json")
+
+    with open(metrics_path) as f:
+        return json.load(f)
+
 
 class QLFModels(object):
     """ Class responsible by manage the database models from
@@ -147,6 +189,11 @@ class QLFModels(object):
 
         return job
 
+    def update_job_start(self, job_id, start):
+        """ Sets the time the job actually started running. """
+
+        Job.objects.filter(id=job_id).update(start=start)
+
     def update_process(self, process_id, end, process_dir, status, qa_tests):
         """ Updates process with execution results. """
 
@@ -157,8 +204,44 @@ class QLFModels(object):
             qa_tests=qa_tests
         )
 
+        self.update_process_nights(process_id)
+        self.invalidate_renders(process_id)
+
         return process
 
+    def update_process_nights(self, process_id):
+        """ Updates the NightlyMetric rows of the night and cameras of a
+        process. """
+
+        night = Process.objects.filter(id=process_id).values_list(
+            'exposure__night', flat=True
+        ).first()
+        cameras = Job.objects.filter(process_id=process_id).values_list(
+            'camera_id', flat=True
+        )
+
+        if not night:
+            return
+
+        try:
+            self.update_nightly_metrics([night], list(cameras))
+        except Exception as err:
+            logger.error('Nightly metrics of night {}: {}'.format(night, err))
+
+    def invalidate_renders(self, process_id=None):
+        """ Rendered plots of a process, and of every process (e.g. time
+        series), are rendered again on the next request.
+
+        Keyword Arguments:
+            process_id {int} -- process ID, only the plots of every
+                process if None (default: {None})
+        """
+
+        render_cache = get_render_cache()
+
+        if render_cache:
+            render_cache.invalidate(process_id)
+
     def abort_current_process(self):
         try:
             process = Process.objects.latest('pk')
@@ -172,10 +255,11 @@ class QLFModels(object):
             logger.debug(error)
 
     def update_job(self, job_id, exposure_id, camera, end, status, output_path):
-        """ Updates job with execution results. """
+        """ Updates job with execution results.
 
-        # Close the DB connections
-        django.db.connection.close()
+        Returns:
+            bool -- True if the job output and products were stored
+        """
 
         merged_path = os.path.join(
             output_path, 'ql-mergedQA-%s-%s.json' % (
@@ -187,9 +271,7 @@ class QLFModels(object):
         ql_merged = {}
 
         if os.path.isfile(merged_path):
-            with open(merged_path, 'r') as merged_file:
-                ql_merged = jsonify(json.load(merged_file))
-                merged_file.close()
+            ql_merged = load_json(merged_path)
 
         try:
             Job.objects.filter(id=job_id).update(
@@ -199,57 +281,482 @@ class QLFModels(object):
             )
 
             self.create_products(job_id)
+            self.create_fiber_metrics(job_id, ql_merged)
 
             logger.info('Job {} updated.'.format(job_id))
+
+            process_id = Job.objects.filter(
+                id=job_id
+            ).values_list('process_id', flat=True).get()
+            write_columns(process_id, camera, ql_merged)
+            self.invalidate_renders(process_id)
         except Exception as err:
             logger.error('Job {} failed.'.format(job_id))
             logger.error(err)
+            return False
 
-    def create_products(self, job_id):
-        metrics_path = os.path.join(
-            qlf_root, "framework", "ql_mapping",
-            "metrics.json")
-
-        with open(metrics_path) as f:
-            metrics = json.load(f)
-
-        query = Job.objects.filter(id=job_id)
-        values = {}
-        for key in metrics:
-            output_path = 'output'
-            path_keys = metrics[key]['path']
-            for path_key in path_keys.split('->'):
-                output_path += "->'{}'".format(path_key)
-            values[key] = output_path
-
-        job = query.extra(
-            select=values
-        ).annotate(
-            dateobs=F("process__exposure__dateobs")
-        ).values(*list(values), "dateobs", 'id').last()
+        return True
 
-        for key in metrics:
-            date_time = (job['dateobs']).strftime('%Y-%m-%d %H:%M:%S')
-            value = []
-            if isinstance(job[key], list):
-                value = job[key]
-            else:
-                value = [job[key]]
-            mjd = Time(date_time, format='iso', scale='utc').mjd
-            p = Product(
-                job_id=job_id,
-                value=value,
-                key=key,
-                mjd=mjd
+    def create_products(self, job_ids, metrics=None, replace=False):
+        """ Stores the metrics listed in metrics.json as Products, and as
+        Metrics with the camera and exposure of their job, with a single
+        INSERT ... SELECT, so the metric values are copied from the job
+        outputs inside the database.
+
+        Arguments:
+            job_ids {int or list} -- job ID, or the job IDs of a whole
+                exposure
+
+        Keyword Arguments:
+            metrics {dict} -- metrics to store, instead of the ones in
+                metrics.json (default: {None})
+            replace {bool} -- delete the products of these metrics
+                stored before for the jobs (default: {False})
+
+        Returns:
+            int -- number of products created
+        """
+
+        if not isinstance(job_ids, (list, tuple, set)):
+            job_ids = [job_ids]
+
+        if metrics is None:
+            metrics = load_metrics()
+
+        jobs = list(Job.objects.filter(id__in=job_ids).values_list(
+            'id', 'process__exposure__dateobs'
+        ))
+
+        if not jobs or not metrics:
+            return 0
+
+        # the jobs of an exposure share the same dateobs
+        dates = sorted(set(dateobs for job_id, dateobs in jobs))
+        mjds = dict(zip(dates, Time([
+            dateobs.strftime('%Y-%m-%d %H:%M:%S') for dateobs in dates
+        ], format='iso', scale='utc').mjd.tolist()))
+
+        job_mjds = dict(
+            (job_id, mjds[dateobs]) for job_id, dateobs in jobs
+        )
+
+        # scalars become one element arrays, missing metrics {NULL}, the
+        # products inserted are copied to Metric in the same statement
+        sql = """
+            WITH product AS (
+                INSERT INTO {product} (job_id, key, value, mjd)
+                SELECT job.id, metric.key,
+                    CASE jsonb_typeof(metric_value.value)
+                        WHEN 'array' THEN ARRAY(
+                            SELECT (element #>> '{{}}')::float
+                            FROM jsonb_array_elements(metric_value.value)
+                                WITH ORDINALITY AS elements(element, position)
+                            ORDER BY position
+                        )
+                        ELSE ARRAY[(metric_value.value #>> '{{}}')::float]
+                    END,
+                    job.mjd
+                FROM (
+                    -- OFFSET 0 keeps the output detoasted once per job
+                    SELECT job.id, job.output || '{{}}'::jsonb AS output,
+                        job_mjd.mjd
+                    FROM {job} AS job
+                    JOIN unnest(%s::integer[], %s::float[])
+                        AS job_mjd(job_id, mjd) ON job_mjd.job_id = job.id
+                    OFFSET 0
+                ) AS job
+                CROSS JOIN (
+                    SELECT key, string_to_array(path, '->') AS path
+                    FROM unnest(%s::text[], %s::text[]) AS metric(key, path)
+                ) AS metric
+                CROSS JOIN LATERAL (
+                    SELECT job.output #> metric.path AS value
+                ) AS metric_value
+                RETURNING job_id, key, value, mjd
             )
-            p.save()
+            INSERT INTO {metric} (job_id, camera_id, arm, spectrograph,
+                exposure_id, night, dateobs, mjd, flavor, program, key,
+                value)
+            SELECT job.id, camera.camera, camera.arm, camera.spectrograph,
+                exposure.exposure_id, exposure.night, exposure.dateobs,
+                product.mjd, exposure.flavor, exposure.program, product.key,
+                product.value
+            FROM product
+            JOIN {job} AS job ON job.id = product.job_id
+            JOIN {camera} AS camera ON camera.camera = job.camera_id
+            JOIN {process} AS process ON process.id = job.process_id
+            JOIN {exposure} AS exposure
+                ON exposure.exposure_id = process.exposure_id
+        """.format(
+            product=Product._meta.db_table,
+            metric=Metric._meta.db_table,
+            job=Job._meta.db_table,
+            camera=Camera._meta.db_table,
+            process=Process._meta.db_table,
+            exposure=Exposure._meta.db_table
+        )
+
+        with transaction.atomic():
+            self.create_product_partitions(job_mjds.values())
+
+            if replace:
+                Product.objects.filter(
+                    job_id__in=list(job_mjds), key__in=list(metrics)
+                ).delete()
+                Metric.objects.filter(
+                    job_id__in=list(job_mjds), key__in=list(metrics)
+                ).delete()
+
+            with django.db.connection.cursor() as cursor:
+                cursor.execute(sql, [
+                    list(job_mjds),
+                    list(job_mjds.values()),
+                    list(metrics),
+                    [metrics[key]['path'] for key in metrics]
+                ])
+                return cursor.rowcount
+
+    def create_product_partitions(self, mjds):
+        """ Creates the monthly Product partitions of the given MJDs that
+        do not exist yet, rows out of every partition would go to the
+        default partition.
+
+        Arguments:
+            mjds {list} -- MJDs of the products about to be stored
+        """
+
+        partitions = set(product_partition(mjd) for mjd in mjds)
+        partitions = [
+            partition for partition in partitions
+            if partition[0] not in product_partitions
+        ]
+
+        if not partitions:
+            return
+
+        with django.db.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relkind FROM pg_class WHERE relname = %s",
+                [Product._meta.db_table]
+            )
+
+            # not partitioned, e.g. before migration 0018
+            if cursor.fetchone()[0] != 'p':
+                product_partitions.update(name for name, _, _ in partitions)
+                return
+
+            for name, start, end in sorted(partitions):
+                cursor.execute("SELECT to_regclass(%s)", [name])
+
+                if cursor.fetchone()[0] is None:
+                    # concurrent ingestions of the same month wait here
+                    cursor.execute(
+                        "SELECT pg_advisory_xact_lock(hashtext(%s))", [name]
+                    )
+                    cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS {name}
+                        PARTITION OF {product}
+                        FOR VALUES FROM ({start}) TO ({end})
+                    """.format(
+                        name=name,
+                        product=Product._meta.db_table,
+                        start=start,
+                        end=end
+                    ))
+                    logger.info('Partition {} created.'.format(name))
+
+                # only once committed, a rolled back CREATE would send
+                # the month to the default partition
+                transaction.on_commit(
+                    lambda name=name: product_partitions.add(name)
+                )
+
+    def update_nightly_metrics(self, nights=None, cameras=None):
+        """ Computes again the NightlyMetric rows of the given nights
+        from their Metric rows.
+
+        Keyword Arguments:
+            nights {list} -- nights, all if None (default: {None})
+            cameras {list} -- cameras, all if None (default: {None})
+
+        Returns:
+            int -- number of rows stored
+        """
+
+        # percentiles of each element, the values are arrays (e.g. one
+        # element per amplifier). INVALID_VALUE elements (NaN in the QA)
+        # are left out, an element without valid values is NULL, so the
+        # positions of the arrays are kept
+        sql = """
+            INSERT INTO {nightly_metric} (camera_id, key, night, mjd, count,
+                min, max, mean, median, p5, p95)
+            SELECT camera_id, key, night,
+                to_date(night, 'YYYYMMDD') - date '1858-11-17',
+                max(count),
+                array_agg(min ORDER BY position),
+                array_agg(max ORDER BY position),
+                array_agg(mean ORDER BY position),
+                array_agg(percentiles[2] ORDER BY position),
+                array_agg(percentiles[1] ORDER BY position),
+                array_agg(percentiles[3] ORDER BY position)
+            FROM (
+                SELECT camera_id, key, night, position,
+                    count(*) FILTER (WHERE valid) AS count,
+                    min(element) FILTER (WHERE valid),
+                    max(element) FILTER (WHERE valid),
+                    avg(element) FILTER (WHERE valid) AS mean,
+                    percentile_cont(ARRAY[0.05, 0.5, 0.95])
+                        WITHIN GROUP (ORDER BY element)
+                        FILTER (WHERE valid) AS percentiles
+                FROM {metric}
+                CROSS JOIN LATERAL unnest(value)
+                    WITH ORDINALITY AS elements(element, position)
+                CROSS JOIN LATERAL (
+                    SELECT element <> %s AS valid
+                ) AS validity
+                WHERE (%s::text[] IS NULL OR night = ANY(%s::text[]))
+                    AND (%s::text[] IS NULL OR camera_id = ANY(%s::text[]))
+                GROUP BY camera_id, key, night, position
+            ) AS elements
+            GROUP BY camera_id, key, night
+        """.format(
+            nightly_metric=NightlyMetric._meta.db_table,
+            metric=Metric._meta.db_table
+        )
+
+        if nights is not None:
+            nights = sorted(set(nights))
+        if cameras is not None:
+            cameras = sorted(set(cameras))
+
+        stored = NightlyMetric.objects.all()
+        if nights is not None:
+            stored = stored.filter(night__in=nights)
+        if cameras is not None:
+            stored = stored.filter(camera__in=cameras)
+
+        with transaction.atomic():
+            with django.db.connection.cursor() as cursor:
+                # updates wait for each other, reads do not
+                cursor.execute(
+                    "LOCK TABLE {} IN SHARE ROW EXCLUSIVE MODE".format(
+                        NightlyMetric._meta.db_table
+                    )
+                )
+
+                stored.delete()
+
+                cursor.execute(sql, [
+                    INVALID_VALUE, nights, nights, cameras, cameras
+                ])
+                return cursor.rowcount
+
+    def create_fiber_metrics(self, job_id, output):
+        """ Stores the per fiber metrics of a job output as FiberMetric
+        rows, replacing the ones already stored for the job.
+
+        Arguments:
+            job_id {int} -- job ID
+            output {dict} -- job output (ql-mergedQA)
+
+        Returns:
+            int -- number of metrics stored
+        """
+
+        metrics = fiber_metrics(output)
+
+        sql = """
+            INSERT INTO {fiber_metric} (job_id, camera_id, key, dateobs,
+                value)
+            SELECT job.id, job.camera_id, metric.key, exposure.dateobs,
+                metric.value
+            FROM {job} AS job
+            JOIN {process} AS process ON process.id = job.process_id
+            JOIN {exposure} AS exposure
+                ON exposure.exposure_id = process.exposure_id
+            CROSS JOIN (VALUES {values}) AS metric(key, value)
+            WHERE job.id = %s
+        """.format(
+            fiber_metric=FiberMetric._meta.db_table,
+            job=Job._meta.db_table,
+            process=Process._meta.db_table,
+            exposure=Exposure._meta.db_table,
+            values=', '.join(['(%s, %s::real[])'] * len(metrics))
+        )
+
+        params = list()
+        for key, value in metrics.items():
+            params.extend([key, value.tolist()])
+
+        with transaction.atomic():
+            FiberMetric.objects.filter(job_id=job_id).delete()
+
+            if not metrics:
+                return 0
+
+            with django.db.connection.cursor() as cursor:
+                cursor.execute(sql, params + [job_id])
+                return cursor.rowcount
+
+    def enqueue_exposure(self, exposure_id, night, flavor, reprocess=False):
+        """ Adds an exposure to the processing queue. An exposure already
+        waiting or running is kept as is, a processed one is only queued
+        again when reprocessing is requested.
+
+        Arguments:
+            exposure_id {int} -- exposure ID
+            night {str} -- night
+            flavor {str} -- exposure flavor
+
+        Keyword Arguments:
+            reprocess {bool} -- queue a processed exposure again
+                (default: {False})
+
+        Returns:
+            bool -- True if the exposure was queued
+        """
+
+        priority = int(FLAVOR_PRIORITY.get(flavor, UNKNOWN_FLAVOR_PRIORITY))
+
+        with transaction.atomic():
+            entry, created = ExposureQueue.objects.select_for_update(
+            ).get_or_create(
+                exposure_id=exposure_id,
+                defaults=dict(night=night, flavor=flavor, priority=priority)
+            )
+
+            if created:
+                return True
+
+            if entry.status in (ExposureQueue.STATUS_QUEUED,
+                                ExposureQueue.STATUS_RUNNING):
+                return False
+
+            if not reprocess:
+                return False
+
+            entry.status = ExposureQueue.STATUS_QUEUED
+            entry.priority = priority
+            entry.queued = datetime.now()
+            entry.started = None
+            entry.finished = None
+            entry.save()
+
+        return True
+
+    def dequeue_exposure(self):
+        """ Takes the next exposure of the processing queue, by priority
+        and then by exposure ID.
+
+        Returns:
+            ExposureQueue -- queue entry, None if the queue is empty
+        """
+
+        with transaction.atomic():
+            entry = ExposureQueue.objects.select_for_update(
+                skip_locked=True
+            ).filter(
+                status=ExposureQueue.STATUS_QUEUED
+            ).order_by('priority', 'exposure_id').first()
+
+            if entry:
+                entry.status = ExposureQueue.STATUS_RUNNING
+                entry.started = datetime.now()
+                entry.save()
+
+        return entry
+
+    def finish_queued_exposure(self, exposure_id, failed=False):
+        """ Marks a queued exposure as processed. """
+
+        status = ExposureQueue.STATUS_FAILED if failed \
+            else ExposureQueue.STATUS_DONE
+
+        ExposureQueue.objects.filter(exposure_id=exposure_id).update(
+            status=status,
+            finished=datetime.now()
+        )
+
+    def requeue_running_exposures(self):
+        """ Puts back in the queue the exposures left running by a
+        previous monitoring session. """
+
+        return ExposureQueue.objects.filter(
+            status=ExposureQueue.STATUS_RUNNING
+        ).update(status=ExposureQueue.STATUS_QUEUED, started=None)
+
+    def count_queued_exposures(self):
+        """ Number of exposures waiting to be processed. """
+
+        return ExposureQueue.objects.filter(
+            status=ExposureQueue.STATUS_QUEUED
+        ).count()
+
+    def get_job_durations(self, cameras, flavor, exptime_range, history):
+        """ Durations of the successful jobs of the last processes with the
+        same flavor and exposure time range. Jobs without a duration, e.g.
+        imported by import_merged_qa, are left out, and so are processes
+        made only of them.
+
+        Arguments:
+            cameras {list} -- camera names
+            flavor {str} -- exposure flavor
+            exptime_range {tuple} -- (lower, upper) exposure time,
+                upper may be None
+            history {int} -- number of processes
+
+        Returns:
+            dict -- camera name: list of durations in seconds
+        """
+
+        lower, upper = exptime_range
+
+        processes = Process.objects.filter(
+            exposure__flavor=flavor,
+            exposure__exptime__gte=lower,
+            end__isnull=False,
+            process_jobs__start__lt=F('process_jobs__end')
+        ).distinct()
+
+        if upper is not None:
+            processes = processes.filter(exposure__exptime__lt=upper)
+
+        processes = processes.order_by('-pk').values('pk')[:history]
+
+        jobs = Job.objects.filter(
+            process__in=processes,
+            camera__in=cameras,
+            status=Job.STATUS_OK,
+            end__isnull=False,
+            start__lt=F('end')
+        ).values_list('camera', 'start', 'end')
+
+        durations = dict((camera, list()) for camera in cameras)
+
+        for camera, start, end in jobs:
+            durations[camera].append((end - start).total_seconds())
+
+        return durations
 
     def get_last_configuration(self):
         return Configuration.objects.latest('pk')
 
 
-    def get_output(self, process_id, cam):
-        """ Gets QA """
+    def get_output(self, process_id, cam, columns=None):
+        """ Gets QA
+
+        Keyword Arguments:
+            columns {list} -- JSON paths (e.g. "GENERAL_INFO->RA") of lists
+                wanted as read-only numpy arrays, the QA is read from the
+                QA columns of the job when they exist and the long lists
+                not requested are left out. The whole QA is read from the
+                database if None (default: {None})
+        """
+        if columns is not None:
+            qa = read_columns(process_id, cam, columns)
+            if qa is not None:
+                return qa
+
         try:
             obj = Job.objects.filter(process_id=process_id).get(camera=cam)
             qa = obj.output
@@ -258,6 +765,57 @@ class QLFModels(object):
 
         return qa
 
+    def get_outputs(self, process_id, cameras, paths):
+        """ Gets parts of the QA of several cameras of a process in a
+        single query, the database extracts the JSON paths from the
+        outputs and only those are transferred.
+
+        Arguments:
+            process_id {int} -- process ID
+            cameras {list} -- camera names, all the cameras of the
+                process if None
+            paths {list} -- JSON paths, e.g.
+                "TASKS->CHECK_CCDs->METRICS->XWSIGMA_FIB"
+
+        Returns:
+            dict -- QA by camera, as in the job output but only with the
+                requested paths. Cameras without output are left out
+        """
+
+        sql = """
+            SELECT job.camera_id, path.path,
+                job.output #> string_to_array(path.path, '->')
+            FROM (
+                -- OFFSET 0 keeps the output detoasted once per job
+                SELECT camera_id, output || '{{}}'::jsonb AS output
+                FROM {job}
+                WHERE process_id = %s AND output IS NOT NULL
+                    AND (%s::text[] IS NULL OR camera_id = ANY(%s::text[]))
+                OFFSET 0
+            ) AS job
+            CROSS JOIN unnest(%s::text[]) AS path(path)
+        """.format(job=Job._meta.db_table)
+
+        with django.db.connection.cursor() as cursor:
+            cursor.execute(sql, [process_id, cameras, cameras, list(paths)])
+            rows = cursor.fetchall()
+
+        outputs = dict()
+
+        for camera, path, value in rows:
+            qa = outputs.setdefault(camera, dict())
+
+            # missing paths are left out, as in the output
+            if value is None:
+                continue
+
+            path_keys = path.split('->')
+            for path_key in path_keys[:-1]:
+                qa = qa.setdefault(path_key, dict())
+            qa[path_keys[-1]] = value
+
+        return outputs
+
     def get_process_by_process_id(self, process_id):
         """ Gets Process using process_id"""
         try:
@@ -292,6 +850,16 @@ class QLFModels(object):
         return Exposure.objects.values_list('flavor', flat=True).distinct()
 
 
+    def get_exposure(self, exposure_id):
+        """ Gets exposure by exposure_id """
+
+        try:
+            exposure = Exposure.objects.get(exposure_id=exposure_id)
+        except Exposure.DoesNotExist:
+            exposure = None
+
+        return exposure
+
     def get_last_exposure(self):
         """ Gets last processed exposures """
 
@@ -423,71 +991,317 @@ class QLFModels(object):
 
         return outputs
 
-    def migrate_outputs(self, metrics):
-        Product.objects.all().delete()
-        query=Job.objects.all()
-        values = {}
-        for key in metrics:
-            output_path = 'output'
-            path_keys = metrics[key]['path']
-            for path_key in path_keys.split('->'):
-                output_path += "->'{}'".format(path_key)
-            values[key] = output_path
-
-        query = query.extra(
-            select=values
-        ).annotate(
-            dateobs=F("process__exposure__dateobs")
-        ).values(*list(values), "dateobs", 'id')
-
-        step=500
-        start=0
-        end=step
-        jobs = query[start:end]
-
-        while len(jobs) is not 0:
-            print('Ingesting: {} - {}'.format(start, end))
-            for job in jobs:
-                for key in metrics:
-                    date_time=(job['dateobs']).strftime('%Y-%m-%d %H:%M:%S')
-                    value = []
-                    if isinstance(job[key], list):
-                        value = job[key]
-                    else:
-                        value = [job[key]]
-                    mjd=Time(date_time, format='iso', scale='utc').mjd
-                    p = Product(
-                        job_id=job['id'],
-                        value=value,
-                        key=key,
-                        mjd=mjd
+    def migrate_outputs(self, metrics, workers=1, batch_size=500,
+                        incremental=False, restart=False):
+        """ Derives the products of every job from its output, e.g. after
+        a change in metrics.json.
+
+        The jobs are split in id ranges, one per worker process, and read
+        in batches by job id. Every batch is stored together with its
+        checkpoint, so an interrupted migration resumes from where it
+        stopped when called again with the same metrics and mode. A full
+        migration that was completed starts again.
+
+        Arguments:
+            metrics {dict} -- metrics.json content
+
+        Keyword Arguments:
+            workers {int} -- worker processes (default: {1})
+            batch_size {int} -- jobs per batch (default: {500})
+            incremental {bool} -- only add the metrics without products
+                yet, keeping the existing products (default: {False})
+            restart {bool} -- discard the checkpoints of a previous run
+                with the same metrics and mode (default: {False})
+
+        Returns:
+            int -- number of job ranges migrated
+        """
+
+        run = hashlib.sha1(json.dumps(
+            [metrics, incremental], sort_keys=True
+        ).encode('utf-8')).hexdigest()
+
+        if restart:
+            ProductMigration.objects.filter(run=run).delete()
+
+        checkpoints = self.plan_migration(run, metrics, workers, incremental)
+        pending = [
+            checkpoint for checkpoint in checkpoints
+            if checkpoint.finished is None
+        ]
+
+        # outputs may have changed since, a full run derives them again
+        if checkpoints and not pending and not incremental:
+            logger.info('Migration {} was completed, starting '
+                        'again.'.format(run[:8]))
+            ProductMigration.objects.filter(run=run).delete()
+            checkpoints = self.plan_migration(
+                run, metrics, workers, incremental
+            )
+            pending = checkpoints
+
+        if not pending:
+            if checkpoints:
+                logger.info('Migration {} was completed, use --restart to '
+                            'run it again.'.format(run[:8]))
+            else:
+                logger.info('Migration {} has nothing to do.'.format(run[:8]))
+            return 0
+
+        keys = pending[0].keys
+        metrics = dict((key, metrics[key]) for key in keys if key in metrics)
+
+        logger.info('Migration {}: {} metrics, {} ranges to go.'.format(
+            run[:8], len(metrics), len(pending)
+        ))
+
+        # the workers must not share the connection of this process
+        django.db.connection.close()
+
+        procs = list()
+
+        for checkpoint in pending:
+            proc = multiprocessing.Process(
+                target=self.migrate_range,
+                args=(checkpoint.id, metrics, batch_size, not incremental)
+            )
+            proc.start()
+            procs.append(proc)
+
+        for proc in procs:
+            proc.join()
+
+        failed = [proc for proc in procs if proc.exitcode != 0]
+
+        # products of every process changed
+        self.update_nightly_metrics()
+        self.invalidate_renders()
+
+        if failed:
+            logger.error('Migration {}: {} ranges failed, run it again '
+                         'to resume.'.format(run[:8], len(failed)))
+
+        return len(pending) - len(failed)
+
+    def plan_migration(self, run, metrics, workers, incremental):
+        """ Checkpoints of a migration run, created on its first call.
+
+        Returns:
+            list -- ProductMigration checkpoints ordered by job id
+        """
+
+        with transaction.atomic():
+            checkpoints = list(
+                ProductMigration.objects.select_for_update().filter(
+                    run=run
+                ).order_by('first_job')
+            )
+
+            if checkpoints:
+                return checkpoints
+
+            keys = list(metrics)
+
+            if incremental:
+                existing = set(Product.objects.values_list(
+                    'key', flat=True
+                ).distinct())
+                keys = [key for key in keys if key not in existing]
+
+            bounds = Job.objects.aggregate(first=Min('id'), last=Max('id'))
+
+            if not keys or bounds['first'] is None:
+                return checkpoints
+
+            workers = max(workers, 1)
+            step = int(math.ceil(
+                (bounds['last'] - bounds['first'] + 1) / workers
+            ))
+
+            for first_job in range(bounds['first'], bounds['last'] + 1, step):
+                checkpoints.append(ProductMigration.objects.create(
+                    run=run,
+                    keys=keys,
+                    first_job=first_job,
+                    last_job=min(first_job + step - 1, bounds['last']),
+                    next_job=first_job
+                ))
+
+        return checkpoints
+
+    def migrate_range(self, checkpoint_id, metrics, batch_size, replace):
+        """ Migrates the jobs of a checkpoint range, in batches by job id.
+
+        Arguments:
+            checkpoint_id {int} -- ProductMigration id
+            metrics {dict} -- metrics to be stored
+            batch_size {int} -- jobs per batch
+            replace {bool} -- replace the products of the metrics, and
+                delete the products of the other keys (e.g. renamed or
+                removed from metrics.json)
+        """
+
+        checkpoint = ProductMigration.objects.get(id=checkpoint_id)
+
+        while True:
+            job_ids = list(Job.objects.filter(
+                id__gte=checkpoint.next_job,
+                id__lte=checkpoint.last_job
+            ).order_by('id').values_list('id', flat=True)[:batch_size])
+
+            with transaction.atomic():
+                if job_ids and replace:
+                    Product.objects.filter(job_id__in=job_ids).exclude(
+                        key__in=list(metrics)
+                    ).delete()
+                    Metric.objects.filter(job_id__in=job_ids).exclude(
+                        key__in=list(metrics)
+                    ).delete()
+
+                if job_ids:
+                    products = self.create_products(
+                        job_ids, metrics, replace=replace
                     )
-                    p.save()
-            start = start + step
-            end = end + step
-            jobs = query[start:end]
+                    checkpoint.next_job = job_ids[-1] + 1
+                else:
+                    checkpoint.finished = datetime.now()
+
+                checkpoint.save()
+
+            if not job_ids:
+                break
 
+            logger.info('Jobs {} - {}: {} products.'.format(
+                job_ids[0], job_ids[-1], products
+            ))
 
     def get_product_metrics_by_camera(self, key, camera, begin_date=None, end_date=None):
-        vals = Product.objects.filter(job__camera=camera, key=key)
+        """ Values of a metric of a camera over time, read through the
+        (camera, key, mjd) index of Metric, without joins.
+
+        Arguments:
+            key {str} -- metric key, e.g. "SKYRBAND"
+            camera {str} -- selected camera
+
+        Keyword Arguments:
+            begin_date {str} -- obtains entries beginning this date
+                (default: {None})
+            end_date {str} -- obtains entries until this date
+                (default: {None})
+        """
+
+        return self.get_product_metrics_by_cameras(
+            key, [camera], begin_date=begin_date, end_date=end_date
+        )
+
+    def get_product_metrics_by_cameras(self, key, cameras, begin_date=None,
+                                       end_date=None):
+        """ Values of a metric of several cameras over time, in a single
+        query, ordered by camera and mjd.
+
+        Arguments:
+            key {str} -- metric key, e.g. "SKYRBAND"
+            cameras {list} -- selected cameras
+
+        Keyword Arguments:
+            begin_date {str} -- obtains entries beginning this date
+                (default: {None})
+            end_date {str} -- obtains entries until this date
+                (default: {None})
+        """
+
+        vals = Metric.objects.filter(camera__in=cameras, key=key)
+
+        # the mjd is the one of the dateobs of the exposure
         if begin_date:
             begin_date = datetime.strptime(begin_date, "%Y-%m-%d")
-            vals = vals.filter(job__process__exposure__dateobs__gte=begin_date)
-            
+            vals = vals.filter(mjd__gte=(begin_date - MJD_EPOCH).days)
+
+        if end_date:
+            end_date = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+            vals = vals.filter(mjd__lte=(end_date - MJD_EPOCH).days)
+
+        return vals.values(
+            "camera", "exposure_id", "dateobs", "value", "mjd"
+        ).order_by('camera', 'mjd')
+
+    def get_nightly_metrics_by_camera(self, key, camera, begin_date=None,
+                                      end_date=None):
+        """ Nightly statistics of a metric of a camera, one row per
+        night, from NightlyMetric.
+
+        Arguments:
+            key {str} -- metric key, e.g. "SKYRBAND"
+            camera {str} -- selected camera
+
+        Keyword Arguments:
+            begin_date {str} -- obtains nights beginning this date
+                (default: {None})
+            end_date {str} -- obtains nights until this date
+                (default: {None})
+        """
+
+        vals = NightlyMetric.objects.filter(camera=camera, key=key)
+
+        # nights are YYYYMMDD, in the order of the dates
+        if begin_date:
+            vals = vals.filter(night__gte=begin_date.replace('-', ''))
+
+        if end_date:
+            vals = vals.filter(night__lte=end_date.replace('-', ''))
+
+        return vals.values(
+            "camera", "night", "mjd", "count", "min", "max", "mean",
+            "median", "p5", "p95"
+        ).order_by('night')
+
+    def get_fiber_metric_by_camera(self, key, camera, fiber, row=None,
+                                   begin_date=None, end_date=None):
+        """ Values of a fiber in a per fiber metric over time, e.g. the
+        SNR_RESID of fiber 123, read through the (camera, key, dateobs)
+        index of FiberMetric.
+
+        Arguments:
+            key {str} -- metric key, e.g. "SNR_RESID"
+            camera {str} -- selected camera
+            fiber {int} -- fiber of the petal, from 0
+
+        Keyword Arguments:
+            row {int} -- row of 2D metrics, e.g. 0 for the x sigma of
+                XWSIGMA_FIB (default: {None})
+            begin_date {str} -- obtains entries beginning this date
+                (default: {None})
+            end_date {str} -- obtains entries until this date
+                (default: {None})
+        """
+
+        vals = FiberMetric.objects.filter(camera=camera, key=key)
+
+        if begin_date:
+            begin_date = datetime.strptime(begin_date, "%Y-%m-%d")
+            vals = vals.filter(dateobs__gte=begin_date)
+
         if end_date:
             end_date = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
-            vals = vals.filter(job__process__exposure__dateobs__lte=end_date)
+            vals = vals.filter(dateobs__lte=end_date)
 
-        output = vals.extra(
+        # PostgreSQL arrays start at 1
+        if row is None:
+            value, params = "value[%s]", [fiber + 1]
+        else:
+            value, params = "value[%s][%s]", [row + 1, fiber + 1]
+
+        return vals.extra(
             select={
-                'datef':"to_char(dateobs, 'YYYY-MM-DD HH24:MI:SS')"
-            }
+                'value': value,
+                'datef': "to_char(dateobs, 'YYYY-MM-DD HH24:MI:SS')"
+            },
+            select_params=params
         ).annotate(
-            camera=F("job__camera"),
-            exposure_id=F("job__process__exposure__exposure_id"),
-            dateobs=F("job__process__exposure__dateobs")
-        ).values("camera", "exposure_id", "dateobs", "value", "datef", "mjd").distinct().order_by('dateobs')
-        return output
+            exposure_id=F("job__process__exposure__exposure_id")
+        ).values(
+            "camera", "exposure_id", "dateobs", "value", "datef"
+        ).order_by('dateobs')
 
     def delete_all_processes(self):
         """ Delete all processes """
@@ -507,25 +1321,167 @@ class QLFModels(object):
     def delete_process(self, process_id):
         """ Delete by process_id """
 
+        night = Process.objects.filter(id=process_id).values_list(
+            'exposure__night', flat=True
+        ).first()
+        cameras = list(Job.objects.filter(process_id=process_id).values_list(
+            'camera_id', flat=True
+        ))
+
         Process.objects.filter(id=process_id).delete()
 
+        if night:
+            self.update_nightly_metrics([night], cameras)
+        delete_columns(process_id)
+        self.invalidate_renders(process_id)
+
     def delete_exposure(self, exposure_id):
         """ Delete by exposure id """
 
         Exposure.objects.filter(exposure_id=exposure_id).delete()
 
 
+def jsonify_array(array):
+    """ List of a numpy array, NaN and infinity replaced at once. """
+
+    if array.dtype.kind == 'f':
+        return numpy.where(
+            numpy.isfinite(array), array, INVALID_VALUE
+        ).tolist()
+
+    if array.dtype.kind == 'O':
+        return jsonify(array.tolist())
+
+    return array.tolist()
+
+
 def jsonify(data):
-    """ Make a dictionary with numpy arrays JSON serializable """
-    if type(data) == numpy.ndarray:
-        data = data.tolist()
-    if isinstance(data, list):
-        for item in data:
-            data[data.index(item)] = jsonify(item)
-    if isinstance(data, dict):
-        for item in data:
-            data[item] = jsonify(data[item])
+    """ Make a dictionary with numpy arrays JSON serializable, NaN and
+    infinity are replaced by INVALID_VALUE.
+
+    Dictionaries and lists are updated in place, walking each one once.
+    """
+
+    if isinstance(data, numpy.ndarray):
+        return jsonify_array(data)
+
+    if isinstance(data, numpy.generic):
+        data = data.item()
+
     if isinstance(data, float):
-        if math.isnan(data) or math.isinf(data):
-            data = -9999
+        return data if math.isfinite(data) else INVALID_VALUE
+
+    if isinstance(data, tuple):
+        data = list(data)
+
+    if isinstance(data, list):
+        # lists of plain numbers are checked by sum in C, any NaN or
+        # infinity makes it non finite
+        try:
+            total = sum(data)
+            if type(total) in (int, float) and math.isfinite(total):
+                return data
+        except (TypeError, OverflowError):
+            pass
+        items = enumerate(data)
+    elif isinstance(data, dict):
+        items = data.items()
+    else:
+        return data
+
+    for key, value in items:
+        if type(value) is float:
+            if not math.isfinite(value):
+                data[key] = INVALID_VALUE
+        elif isinstance(value, JSONIFY_TYPES):
+            data[key] = jsonify(value)
+
     return data
+
+
+def product_partition(mjd):
+    """ Monthly Product partition of a MJD.
+
+    Returns:
+        tuple -- (table name, first MJD of the month, first MJD of the
+            next month)
+    """
+
+    date = MJD_EPOCH + timedelta(days=mjd)
+    start = datetime(date.year, date.month, 1)
+    end = (start + timedelta(days=32)).replace(day=1)
+
+    return (
+        '{}_{}'.format(Product._meta.db_table, start.strftime('%Y%m')),
+        (start - MJD_EPOCH).days,
+        (end - MJD_EPOCH).days
+    )
+
+
+def fiber_metrics(output):
+    """ Per fiber metrics of a job output, the numeric lists under
+    METRICS whose last axis has a value per fiber.
+
+    Arguments:
+        output {dict} -- job output (ql-mergedQA)
+
+    Returns:
+        dict -- arrays by metric key, e.g. "SNR_RESID", a metric found
+            under several tasks is stored once per task, by task and
+            metric key, e.g. "CHECK_SPECTRA->SNR_RESID"
+    """
+
+    # metric key: [(task, array)]
+    found = dict()
+
+    for path, array in split_output(output or dict())[1].items():
+        path_keys = path.split('->')
+
+        if 'METRICS' in path_keys[:-1] and array.shape[-1] == FIBERS and \
+                array.ndim <= 2:
+            task = path_keys[path_keys.index('METRICS') - 1] \
+                if path_keys.index('METRICS') else None
+            found.setdefault(path_keys[-1], list()).append((task, array))
+
+    metrics = dict()
+
+    for key, arrays in found.items():
+        if len(arrays) == 1:
+            metrics[key] = arrays[0][1]
+            continue
+
+        logger.warning('Fiber metric {} found under tasks {}'.format(
+            key, ', '.join(str(task) for task, array in arrays)
+        ))
+
+        for task, array in arrays:
+            metrics['{}->{}'.format(task, key)] = array
+
+    return metrics
+
+
+def parse_constant(constant):
+    """ JSON decoder hook for NaN, Infinity and -Infinity. """
+
+    return INVALID_VALUE
+
+
+def parse_float(literal):
+    """ JSON decoder hook for the float literals, the ones overflowing a
+    float (e.g. 1e999) are parsed as infinity. """
+
+    value = float(literal)
+
+    return value if math.isfinite(value) else INVALID_VALUE
+
+
+def load_json(path):
+    """ Reads a JSON file written by Quick Look (e.g. ql-mergedQA), NaN
+    and infinity, including overflowing literals, are replaced by
+    INVALID_VALUE while it is parsed. """
+
+    with open(path) as json_file:
+        return json.load(
+            json_file, parse_constant=parse_constant,
+            parse_float=parse_float
+        )
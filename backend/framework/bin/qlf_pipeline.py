@@ -1,28 +1,44 @@
+import asyncio
 import glob
 import io
 import os
 import gc
 import shutil
-import subprocess
 import time
 import json
-from datetime import datetime
-from multiprocessing import Lock, Manager, Process
-from threading import Thread
+from datetime import datetime, timedelta
 from concurrent import futures
+from threading import Thread
 from util import check_hdu
 
 import logging
 
 from qlf_models import QLFModels
 from scalar_metrics import LoadMetrics
+from stage_events import StageEvents
+from camera_log_buffer import get_camera_log_buffer
+from runtime_predictor import RuntimePredictor, makespan
+from warm_pool import get_warm_pool
+from qa_ingestion import get_qa_ingestion, reset_connection
+from prerender import get_prerenderer
 
 desi_spectro_redux = os.environ.get('DESI_SPECTRO_REDUX')
 max_workers = int(os.environ.get('PIPELINE_MAX_WORKERS'))
 qlf_root = os.environ.get('QLF_ROOT')
 
+# bytes read at once from the stdout of each desi_quicklook
+READ_CHUNK_SIZE = 64 * 1024
+
+# seconds between flushes of run-<camera>.log when the camera output is
+# also published to the in-memory log buffer
+LOG_FLUSH_INTERVAL = 5
+
 logger = logging.getLogger(name='qlf.pipeline')
 
+# runs the Django calls of the event loop, its thread keeps the database
+# connection between processes
+db_executor = futures.ThreadPoolExecutor(max_workers=1)
+
 if not max_workers > 0:
     max_workers = None
 
@@ -45,12 +61,15 @@ class QLFProcess(object):
             flavor = json.load(f)
 
         self.stages = flavor.get('step_list')
-
-        for stage in self.stages:
-            stage['start'] = {"regex": stage.get('start'), "count": 0}
-            stage['end'] = {"regex": stage.get('end'), "count": 0}
+        self.stage_events = StageEvents(self.stages, self.num_cameras)
 
         self.models = QLFModels()
+        self.log_buffer = get_camera_log_buffer()
+        self.warm_pool = get_warm_pool()
+
+        # camera name: QA ingestion of the camera
+        self.ingestion = get_qa_ingestion()
+        self.ingested = dict()
 
         output_dir = os.path.join(
             'exposures',
@@ -104,12 +123,6 @@ class QLFProcess(object):
     def start_jobs(self):
         """ Distributes the cameras for parallel processing. """
 
-        procs = list()
-        return_cameras = Manager().list()
-        resumelog_lock = Lock()
-
-        pool = futures.ThreadPoolExecutor(max_workers=max_workers)
-
         for camera in self.data.get('cameras'):
             camera['start'] = datetime.now().replace(microsecond=0)
 
@@ -129,23 +142,128 @@ class QLFProcess(object):
 
             camera['job_id'] = job.id
 
-            procs.append(pool.submit(
-                self.start_parallel_job,
-                self.data,
-                camera,
-                return_cameras,
-                resumelog_lock,
-            ))
+        cameras = self.schedule_cameras(self.data.get('cameras'))
+        start = datetime.now()
+
+        # run_process is usually called from a worker thread, which has
+        # no event loop of its own
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
 
-        for proc in futures.as_completed(procs):
-            proc.result()
+        try:
+            return_cameras = loop.run_until_complete(
+                self.supervise_jobs(cameras)
+            )
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
 
-        procs.clear()
         gc.collect()
 
+        self.log_schedule(return_cameras, datetime.now() - start)
+
         self.data['cameras'] = return_cameras
 
-    def start_parallel_job(self, data, camera, return_cameras, lock):
+    def schedule_cameras(self, cameras):
+        """ Orders the cameras longest predicted runtime first, so the
+        slowest ones do not start last when workers are fewer than
+        cameras.
+
+        Arguments:
+            cameras {list} -- cameras to be processed
+
+        Returns:
+            list -- cameras in dispatch order
+        """
+
+        try:
+            predictions = RuntimePredictor(self.models).predict(
+                [camera.get('name') for camera in cameras],
+                self.data.get('flavor'),
+                self.data.get('exptime')
+            )
+        except Exception as err:
+            logger.error('Runtime prediction failed: {}'.format(err))
+            return cameras
+
+        for camera in cameras:
+            camera['predicted'] = predictions.get(camera.get('name'))
+
+        return RuntimePredictor.longest_first(cameras, predictions)
+
+    def log_schedule(self, cameras, duration):
+        """ Logs the predicted versus actual runtimes. """
+
+        predicted = [camera.get('predicted') for camera in cameras]
+
+        for camera in cameras:
+            logger.debug('Camera {}: predicted {}, took {}.'.format(
+                camera.get('name'),
+                timedelta(seconds=round(camera.get('predicted')))
+                if camera.get('predicted') is not None else 'unknown',
+                camera.get('duration')
+            ))
+
+        if None in predicted:
+            return
+
+        logger.info('Cameras (longest first): predicted {}, took {}.'.format(
+            timedelta(seconds=round(makespan(predicted, max_workers))),
+            timedelta(seconds=round(duration.total_seconds()))
+        ))
+
+    async def supervise_jobs(self, cameras):
+        """ Runs the cameras as subprocesses of a single event loop,
+        at most PIPELINE_MAX_WORKERS at a time.
+
+        Arguments:
+            cameras {list} -- cameras to be processed
+
+        Returns:
+            list -- cameras with execution results
+        """
+
+        loop = asyncio.get_event_loop()
+        slots = asyncio.Semaphore(max_workers or len(cameras) or 1)
+
+        async def run_camera(camera):
+            async with slots:
+                # the job runtime starts when the camera gets a worker
+                camera['start'] = datetime.now().replace(microsecond=0)
+                await loop.run_in_executor(
+                    db_executor, self.update_job_start, camera
+                )
+                camera = await self.start_parallel_job(self.data, camera)
+
+            # the QA of the camera is ingested while the others run
+            self.ingested[camera.get('name')] = self.ingestion.submit(
+                self.data, camera
+            )
+
+            return camera
+
+        tasks = [
+            asyncio.ensure_future(run_camera(camera)) for camera in cameras
+        ]
+
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            # a failed camera leaves the others running, they are stopped
+            # before the loop is closed
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def update_job_start(self, camera):
+        """ Records the start of a camera, runs on db_executor. """
+
+        reset_connection()
+        self.models.update_job_start(
+            camera.get('job_id'), camera.get('start')
+        )
+
+    async def start_parallel_job(self, data, camera):
         """ Execute QL Pipeline by camera """
 
         cmd = [
@@ -158,29 +276,73 @@ class QLFProcess(object):
             '--specprod_dir', desi_spectro_redux,
         ]
 
+        cwd = os.path.join(
+            desi_spectro_redux,
+            data.get('output_dir')
+        )
+
         logname = io.open(os.path.join(
                 desi_spectro_redux,
                 camera.get('logname')
         ), 'wb')
 
-        cwd = os.path.join(
-            desi_spectro_redux,
-            data.get('output_dir')
-        )
+        kill = None
 
-        with subprocess.Popen(cmd, stdout=subprocess.PIPE,
-                              stderr=subprocess.STDOUT, cwd=cwd) as process:
-            while process.poll() is None:
-                line = process.stdout.readline()
-                if not line:
+        try:
+            if self.warm_pool:
+                stdout, wait, kill = await self.warm_pool.start(
+                    cmd[1:], cwd
+                )
+            else:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.STDOUT, cwd=cwd
+                )
+                stdout, wait, kill = \
+                    process.stdout, process.wait, process.kill
+
+            pending = b''
+            last_flush = time.monotonic()
+
+            while True:
+                chunk = await stdout.read(READ_CHUNK_SIZE)
+                if not chunk:
                     break
-                self.resume_log(line, camera.get('name'), lock)
-                logname.write(line)
-                logname.flush()
 
-            retcode = process.wait()
+                logname.write(chunk)
+
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+
+                for line in lines:
+                    self.resume_log(line, camera.get('name'))
+
+                self.publish_log(camera, lines)
 
-        logname.close()
+                # the log file is a write-behind copy when the buffer is on
+                if not self.log_buffer or \
+                        time.monotonic() - last_flush > LOG_FLUSH_INTERVAL:
+                    logname.flush()
+                    last_flush = time.monotonic()
+
+            if pending:
+                self.resume_log(pending, camera.get('name'))
+                self.publish_log(camera, [pending])
+
+            retcode = await wait()
+            kill = None
+        finally:
+            logname.close()
+
+            # cancelled or failed while the camera was running
+            if kill is not None:
+                try:
+                    kill()
+                except ProcessLookupError:
+                    pass
+                # the pipe is read to its end so its transport is closed
+                await stdout.read()
+                await wait()
 
         camera['end'] = datetime.now().replace(microsecond=0)
         camera['status'] = 0
@@ -191,10 +353,11 @@ class QLFProcess(object):
         if retcode < 0:
             camera['status'] = 1
 
-        return_cameras.append(camera)
+        return camera
 
     def finish_process(self):
-        """ Finish pipeline. """
+        """ Finish pipeline. The QA ingestion is scheduled by the caller
+        (see ingest_parallel_qas). """
 
         self.data['end'] = datetime.now().replace(microsecond=0)
 
@@ -205,36 +368,18 @@ class QLFProcess(object):
            str(self.data.get('duration'))
         ))
 
-        proc = Thread(target=self.ingest_parallel_qas)
-        proc.start()
-
     def ingest_parallel_qas(self):
         logger.info('Ingesting QAs...')
         start_ingestion = datetime.now().replace(microsecond=0)
 
-        proc_qas = list()
-
+        # cameras not handed to the ingestion workers when they finished
         for camera in self.data.get('cameras'):
-            output_path = os.path.join(
-                desi_spectro_redux,
-                self.data.get('output_dir')
-            )
-
-            args = (
-                camera.get('job_id'),
-                self.data.get('exposure_id'),
-                camera.get('name'),
-                camera.get('end'),
-                camera.get('status'),
-                output_path
-            )
-
-            proc = Process(target=self.models.update_job, args=args)
-            proc.start()
-            proc_qas.append(proc)
+            if camera.get('name') not in self.ingested:
+                self.ingested[camera.get('name')] = self.ingestion.submit(
+                    self.data, camera
+                )
 
-        for proc in proc_qas:
-            proc.join()
+        futures.wait(list(self.ingested.values()))
 
         qa_tests = self.generate_qa_tests()
 
@@ -260,6 +405,14 @@ class QLFProcess(object):
             self.data.get('exposure_id')
         ))
 
+        # out of the ingestion slots, the next exposure does not wait
+        prerenderer = get_prerenderer()
+        if prerenderer:
+            prerenderer.submit(
+                self.data.get('process_id'),
+                [camera.get('name') for camera in self.data.get('cameras')]
+            )
+
     def generate_qa_tests(self):
         qa_tests = list()
 
@@ -281,80 +434,47 @@ class QLFProcess(object):
                 logger.error('qa_tests error camera %s' % camera.get('name'))
         return qa_tests
 
-    def resume_log(self, line, camera, lock):
-        """ Monitors log per line in camera execution
-        and writes to the QL pipeline log.
+    def publish_log(self, camera, lines):
+        """ Publishes camera output to the in-memory log buffer.
 
         Arguments:
-            line {str} -- QL execution log file line
-            camera {str} -- camera
-            lock {object} -- write lock in QL pipeline log
+            camera {dict} -- camera being processed
+            lines {list} -- QL execution log file lines (bytes)
         """
 
-        lock.acquire()
+        if not self.log_buffer or not lines:
+            return
 
         try:
-            line = line.decode("utf-8").replace('\n', '')
-            line_str = line.split(':')[-1]
-
-            if line.find('ERROR') > -1 or line.find('CRITICAL') > -1:
-                logger.error("ERROR: Camera {}: {}".format(camera, line_str))
-                self.num_cameras = self.num_cameras - 1
-            if line.find('File does not exist') > -1:
-                logger.error("ERROR: Camera {}: {}".format(camera, line))
-                self.num_cameras = self.num_cameras - 1
-            else:
-                self.stage_control(line)
+            self.log_buffer.publish(camera.get('logname'), [
+                line.decode('utf-8', 'replace') + '\n' for line in lines
+            ])
         except Exception as err:
-            logger.error(err)
-        finally:
-            lock.release()
+            logger.error('Camera log buffer disabled: {}'.format(err))
+            self.log_buffer = None
 
-    def stage_control(self, line):
-        """ Monitors the begin and end of the execution stages of QL per camera.
+    def resume_log(self, line, camera):
+        """ Monitors log per line in camera execution
+        and writes to the QL pipeline log.
 
         Arguments:
-            line {str} -- QL execution log file line
+            line {bytes} -- QL execution log file line
+            camera {str} -- camera
         """
 
-        for stage in self.stages:
-            stage_start = stage.get('start')
-            stage_end = stage.get('end')
-
-            if line.find(stage_end.get('regex')) > -1:
-                stage_end['count'] += 1
-
-                if stage_end.get('count') == self.num_cameras:
-                    end_time = datetime.now().replace(microsecond=0)
-                    stage_end['time'] = end_time
-                    logger.info('{} ended ({}).'.format(
-                        stage.get('display_name'),
-                        stage_end.get('time') - stage_start.get('time')
-                    ))
-
-            if line.find(stage_start.get('regex')) > -1:
-                stage_start['count'] += 1
-
-                if 'time' not in stage_start:
-                    start_time = datetime.now().replace(microsecond=0)
-                    stage_start['time'] = start_time
-                    logger.info('{} started.'.format(
-                        stage.get('display_name')
-                    ))
+        try:
+            line = line.decode("utf-8").replace('\n', '')
+            self.stage_events.feed(camera, line)
+        except Exception as err:
+            logger.error(err)
 
 
-def run_process(exposure, return_process_id=None):
-    """ Runs QL pipeline in parallel
+def reduce_exposure(exposure, return_process_id=None):
+    """ Runs the camera reductions of an exposure, leaving the QA
+    ingestion to the caller.
 
     Arguments:
-        exposure {dict} -- exposure info 
-        e.g. of keys expected: exposure_id, dateobs, night, zfill,
-        desi_spectro_data, desi_spectro_redux, telra, teldec, tile,
-        flavor, program, airmass, exptime, qlconfig, time
-
-        The util.extract_exposure_data function returns this dictionary
-        or can be created by database if the exposition has already been
-        processed.
+        exposure {dict} -- exposure info (see run_process)
 
     Keyword Arguments:
         return_process_id {object 'multiprocessing.sharedctypes.Value'} --
@@ -362,7 +482,7 @@ def run_process(exposure, return_process_id=None):
             (default: {None})
 
     Returns:
-        int -- process ID
+        QLFProcess -- reduced process, ready for ingest_parallel_qas
     """
 
     arms = os.environ.get('PIPELINE_ARMS').split(',')
@@ -389,7 +509,37 @@ def run_process(exposure, return_process_id=None):
     qlf_process.start_jobs()
     qlf_process.finish_process()
 
-    return process_id
+    return qlf_process
+
+
+def run_process(exposure, return_process_id=None):
+    """ Runs QL pipeline in parallel
+
+    Arguments:
+        exposure {dict} -- exposure info 
+        e.g. of keys expected: exposure_id, dateobs, night, zfill,
+        desi_spectro_data, desi_spectro_redux, telra, teldec, tile,
+        flavor, program, airmass, exptime, qlconfig, time
+
+        The util.extract_exposure_data function returns this dictionary
+        or can be created by database if the exposition has already been
+        processed.
+
+    Keyword Arguments:
+        return_process_id {object 'multiprocessing.sharedctypes.Value'} --
+            process ID object allocated from shared memory.
+            (default: {None})
+
+    Returns:
+        int -- process ID
+    """
+
+    qlf_process = reduce_exposure(exposure, return_process_id)
+
+    proc = Thread(target=qlf_process.ingest_parallel_qas)
+    proc.start()
+
+    return qlf_process.data.get('process_id')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,285 @@
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+qlf_root = os.environ.get('QLF_ROOT')
+
+# 'off' renders every bokeh request
+RENDER_CACHE = os.environ.get('RENDER_CACHE', 'on')
+
+# shared by the web server workers and the pipeline, which invalidates
+RENDER_CACHE_DIR = os.environ.get(
+    'RENDER_CACHE_DIR', os.path.join(qlf_root or '', 'render_cache')
+)
+
+# bytes kept in memory by each web server process
+RENDER_CACHE_MEMORY = int(
+    os.environ.get('RENDER_CACHE_MEMORY', 256 * 2**20)
+)
+
+# bytes kept on disk, the least recently used renders are removed first
+RENDER_CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE', 4 * 2**30))
+
+# renders of every process, e.g. the time series
+GLOBAL_SCOPE = 'global'
+
+GENERATION = 'generation'
+
+
+class MemoryTier(object):
+    """ LRU of renders bounded by their size in bytes. """
+
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            html = self.entries.get(key)
+            if html is not None:
+                self.entries.move_to_end(key)
+            return html
+
+    def put(self, key, html):
+        if len(html) > self.size:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.used -= len(previous)
+
+            self.entries[key] = html
+            self.used += len(html)
+
+            while self.used > self.size:
+                _, evicted = self.entries.popitem(last=False)
+                self.used -= len(evicted)
+
+
+class RenderCache(object):
+    """ Rendered bokeh documents, keyed by view, process, camera and
+    query parameters.
+
+    Renders are kept in memory and on disk. Each process (and the global
+    scope, for views over every process) has a generation, stored on
+    disk; writing a process to the database starts a new generation, so
+    its previous renders are never served again, in any web server
+    process. """
+
+    def __init__(self, cache_dir=RENDER_CACHE_DIR,
+                 memory_size=RENDER_CACHE_MEMORY, disk_size=RENDER_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.disk_size = disk_size
+        self.memory = MemoryTier(memory_size)
+        # pruned every tenth of the disk size written
+        self.written = 0
+
+    def scope_dir(self, process_id):
+        if process_id is None:
+            return os.path.join(self.cache_dir, GLOBAL_SCOPE)
+
+        return os.path.join(
+            self.cache_dir, str(process_id // 1000).zfill(6), str(process_id)
+        )
+
+    def generation(self, process_id):
+        try:
+            with open(os.path.join(
+                self.scope_dir(process_id), GENERATION
+            )) as generation_file:
+                return generation_file.read()
+        except FileNotFoundError:
+            return ''
+
+    def key(self, view, process_id=None, camera=None, params=None):
+        """ Cache key of a render.
+
+        Arguments:
+            view {str} -- view name, e.g. "load_qa"
+
+        Keyword Arguments:
+            process_id {int} -- process ID, None for views over every
+                process (default: {None})
+            camera {str} -- camera name (default: {None})
+            params {dict} -- query parameters (default: {None})
+
+        Returns:
+            str -- key
+        """
+
+        request = json.dumps(
+            [view, process_id, camera, sorted((params or {}).items())],
+            default=str
+        )
+
+        return hashlib.sha1(request.encode('utf-8')).hexdigest()
+
+    def entry_path(self, process_id, generation, key):
+        return os.path.join(
+            self.scope_dir(process_id), '{}-{}.html'.format(generation, key)
+        )
+
+    def get(self, process_id, generation, key):
+        path = self.entry_path(process_id, generation, key)
+        html = self.memory.get(path)
+
+        if html is not None:
+            return html
+
+        try:
+            with open(path) as entry_file:
+                html = entry_file.read()
+            # least recently used renders are pruned first
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        self.memory.put(path, html)
+
+        return html
+
+    def put(self, process_id, generation, key, html):
+        path = self.entry_path(process_id, generation, key)
+        self.memory.put(path, html)
+
+        tmp_path = None
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            # written aside and renamed, readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path), prefix='.tmp-'
+            )
+
+            with os.fdopen(fd, 'w') as entry_file:
+                entry_file.write(html)
+
+            os.rename(tmp_path, path)
+        except Exception as err:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            logger.error('Render cache: {}'.format(err))
+            return
+
+        self.written += len(html)
+
+        if self.written > self.disk_size / 10:
+            self.written = 0
+            self.prune()
+
+    def render(self, view, render, process_id=None, camera=None,
+               params=None):
+        """ Cached render of a view, rendered on a miss.
+
+        Arguments:
+            view {str} -- view name, e.g. "load_qa"
+            render {callable} -- renders the HTML document
+
+        Keyword Arguments:
+            process_id {int} -- process ID, None for views over every
+                process (default: {None})
+            camera {str} -- camera name (default: {None})
+            params {dict} -- query parameters (default: {None})
+
+        Returns:
+            str -- HTML document
+        """
+
+        # taken before rendering, a render of data written meanwhile is
+        # stored under the previous generation and never served
+        generation = self.generation(process_id)
+        key = self.key(view, process_id, camera, params)
+
+        html = self.get(process_id, generation, key)
+
+        if html is None:
+            html = render()
+            self.put(process_id, generation, key, html)
+
+        return html
+
+    def invalidate(self, process_id=None):
+        """ Starts a new generation of the renders of a process and of
+        the global scope.
+
+        Keyword Arguments:
+            process_id {int} -- process ID, only the global scope if None
+                (default: {None})
+        """
+
+        scopes = [None] if process_id is None else [process_id, None]
+
+        for scope in scopes:
+            scope_dir = self.scope_dir(scope)
+
+            try:
+                shutil.rmtree(scope_dir, ignore_errors=True)
+                os.makedirs(scope_dir, exist_ok=True)
+
+                fd, tmp_path = tempfile.mkstemp(dir=scope_dir, prefix='.tmp-')
+                with os.fdopen(fd, 'w') as generation_file:
+                    generation_file.write(uuid.uuid4().hex)
+
+                os.rename(tmp_path, os.path.join(scope_dir, GENERATION))
+            except Exception as err:
+                logger.error('Render cache of process {}: {}'.format(
+                    scope, err
+                ))
+
+    def prune(self):
+        """ Removes the least recently used renders until the disk tier
+        is under 90% of its size. """
+
+        entries = list()
+
+        for root, dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.html'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append(
+                    (stat.st_mtime, stat.st_size, os.path.join(root, name))
+                )
+
+        used = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if used <= self.disk_size * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            used -= size
+
+
+render_cache = None
+
+
+def get_render_cache():
+    """ Render cache of this process, None when disabled. """
+
+    global render_cache
+
+    if RENDER_CACHE != 'on':
+        return None
+
+    if render_cache is None:
+        render_cache = RenderCache()
+
+    return render_cache
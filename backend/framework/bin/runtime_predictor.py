@@ -0,0 +1,103 @@
+import os
+import heapq
+import logging
+from statistics import median
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+# processes of the same flavor and exptime bucket used for the prediction
+runtime_history = int(os.environ.get('PIPELINE_RUNTIME_HISTORY', 20))
+
+# upper edges (seconds) of the exptime buckets
+EXPTIME_BUCKETS = (30, 120, 300, 600, 1200)
+
+
+def exptime_bucket(exptime):
+    """ (lower, upper) exptime range of the bucket, upper is None for
+    the last bucket. """
+
+    lower = 0
+
+    for upper in EXPTIME_BUCKETS:
+        if exptime is None or exptime < upper:
+            return lower, upper
+        lower = upper
+
+    return lower, None
+
+
+def makespan(runtimes, workers):
+    """ Time to run the jobs in the given order on a number of workers,
+    each job going to the first worker available. """
+
+    if not runtimes:
+        return 0
+
+    finish = [0] * min(workers or len(runtimes), len(runtimes))
+
+    for runtime in runtimes:
+        heapq.heappush(finish, heapq.heappop(finish) + runtime)
+
+    return max(finish)
+
+
+class RuntimePredictor(object):
+    """ Predicts the runtime of each camera as the median duration of
+    its last jobs with the same flavor and exptime bucket. """
+
+    def __init__(self, models):
+        self.models = models
+
+    def predict(self, cameras, flavor, exptime):
+        """ Predicted runtime per camera.
+
+        Arguments:
+            cameras {list} -- camera names
+            flavor {str} -- exposure flavor
+            exptime {float} -- exposure time
+
+        Returns:
+            dict -- camera name: predicted seconds, None if unknown
+        """
+
+        durations = self.models.get_job_durations(
+            cameras, flavor, exptime_bucket(exptime), runtime_history
+        )
+
+        known = [
+            median(durations[camera])
+            for camera in durations if durations[camera]
+        ]
+
+        predictions = dict()
+
+        for camera in cameras:
+            if durations.get(camera):
+                predictions[camera] = median(durations[camera])
+                continue
+
+            # cameras without history take the median of the same arm
+            arm = [
+                median(values) for name, values in durations.items()
+                if name[0] == camera[0] and values
+            ]
+
+            if arm:
+                predictions[camera] = median(arm)
+            elif known:
+                predictions[camera] = median(known)
+            else:
+                predictions[camera] = None
+
+        return predictions
+
+    @staticmethod
+    def longest_first(cameras, predictions):
+        """ Sorts cameras by predicted runtime, longest first. Cameras
+        without prediction keep their order at the front. """
+
+        return sorted(
+            cameras,
+            key=lambda camera: -(predictions.get(camera.get('name'))
+                                 or float('inf'))
+        )
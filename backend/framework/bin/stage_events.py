@@ -0,0 +1,242 @@
+import re
+import logging
+from datetime import datetime
+from threading import Lock
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+# markers that flag a failed camera, in the order they are checked
+ERROR_MARKERS = ('ERROR', 'CRITICAL')
+MISSING_MARKER = 'File does not exist'
+
+# events of the same stage found in one line are handled end first,
+# just like the original per-stage loop did
+EVENT_ORDER = {'end': 0, 'start': 1}
+
+
+def overlaps(marker, other):
+    """ Whether the end of a marker is the start of another one, e.g.
+    "abc" and "bcd", the regular expression finds only one of them in
+    "abcd". """
+
+    return any(
+        other.startswith(marker[start:]) for start in range(1, len(marker))
+    )
+
+
+class StageMatcher(object):
+    """ Compiles every start/end marker of a flavor (plus the error markers)
+    into a single regular expression, so a log line is scanned only once. """
+
+    def __init__(self, step_list):
+        """
+        Arguments:
+            step_list {list} -- 'step_list' entry from the flavor JSON
+        """
+
+        self.events = dict()
+
+        for index, stage in enumerate(step_list):
+            for kind in ('start', 'end'):
+                marker = stage.get(kind)
+                if marker:
+                    self.events.setdefault(marker, list()).append(
+                        (index, kind)
+                    )
+
+        for marker in ERROR_MARKERS:
+            self.events.setdefault(marker, list()).append((None, 'error'))
+
+        self.events.setdefault(MISSING_MARKER, list()).append(
+            (None, 'missing')
+        )
+
+        # the longest alternative wins at a given position, so markers
+        # contained in a longer one are recorded as implied by it
+        markers = sorted(self.events, key=len, reverse=True)
+
+        self.implied = dict()
+
+        for marker in markers:
+            self.implied[marker] = [
+                other for other in markers
+                if other != marker and other in marker
+            ]
+
+        # finditer does not find a marker starting inside the match of
+        # another one, markers partially overlapping another one are
+        # also searched one by one
+        self.overlapping = [
+            marker for marker in markers
+            if any(
+                other not in marker and marker not in other and
+                (overlaps(marker, other) or overlaps(other, marker))
+                for other in markers
+            )
+        ]
+
+        if self.overlapping:
+            logger.debug('Overlapping stage markers: {}'.format(
+                ', '.join(self.overlapping)
+            ))
+
+        self.pattern = re.compile(
+            '|'.join(re.escape(marker) for marker in markers)
+        )
+
+    def match(self, line):
+        """ Finds all markers in a log line.
+
+        Arguments:
+            line {str} -- QL execution log file line
+
+        Returns:
+            set -- markers found in the line
+        """
+
+        found = set()
+
+        for match in self.pattern.finditer(line):
+            marker = match.group(0)
+            found.add(marker)
+            found.update(self.implied[marker])
+
+        for marker in self.overlapping:
+            if marker not in found and marker in line:
+                found.add(marker)
+                found.update(self.implied[marker])
+
+        return found
+
+    def stage_events(self, found):
+        """ Sorted stage events of the markers returned by match.
+
+        Arguments:
+            found {set} -- markers found in a line
+
+        Returns:
+            list -- (stage index, 'start' or 'end') tuples
+        """
+
+        events = set()
+
+        for marker in found:
+            for index, kind in self.events[marker]:
+                if index is not None:
+                    events.add((index, kind))
+
+        return sorted(events, key=lambda ev: (ev[0], EVENT_ORDER[ev[1]]))
+
+
+class StageEvents(object):
+    """ Keeps the stage state of every camera of an exposure and logs
+    the begin and end of each QL stage. """
+
+    def __init__(self, step_list, num_cameras):
+        """
+        Arguments:
+            step_list {list} -- 'step_list' entry from the flavor JSON
+            num_cameras {int} -- number of cameras being processed
+        """
+
+        self.stages = step_list
+        self.matcher = StageMatcher(step_list)
+        self.num_cameras = num_cameras
+
+        self.cameras = dict()
+        self.failed = set()
+        self.start_time = dict()
+        self.end_time = dict()
+        self.end_count = [0] * len(step_list)
+
+        # only taken when a line carries an event, never per line
+        self.lock = Lock()
+
+    def camera_state(self, camera):
+        """ Per-camera state, created on the first line of the camera. """
+
+        state = self.cameras.get(camera)
+
+        if state is None:
+            state = {'started': set(), 'ended': set()}
+            self.cameras[camera] = state
+
+        return state
+
+    def feed(self, camera, line):
+        """ Monitors log per line in camera execution.
+
+        Arguments:
+            camera {str} -- camera
+            line {str} -- QL execution log file line (decoded)
+        """
+
+        found = self.matcher.match(line)
+
+        if not found:
+            return
+
+        if any(marker in found for marker in ERROR_MARKERS):
+            logger.error("ERROR: Camera {}: {}".format(
+                camera, line.split(':')[-1]
+            ))
+            self.camera_failed(camera)
+
+        if MISSING_MARKER in found:
+            logger.error("ERROR: Camera {}: {}".format(camera, line))
+            self.camera_failed(camera)
+            return
+
+        state = self.camera_state(camera)
+
+        for index, kind in self.matcher.stage_events(found):
+            if kind == 'end':
+                self.stage_ended(state, index)
+            else:
+                self.stage_started(state, index)
+
+    def camera_failed(self, camera):
+        """ A camera that failed is no longer expected to end any stage. """
+
+        with self.lock:
+            self.failed.add(camera)
+
+    def expected_cameras(self):
+        return self.num_cameras - len(self.failed)
+
+    def stage_started(self, state, index):
+        if index in state['started']:
+            return
+
+        state['started'].add(index)
+
+        with self.lock:
+            if index in self.start_time:
+                return
+
+            self.start_time[index] = datetime.now().replace(microsecond=0)
+
+        logger.info('{} started.'.format(
+            self.stages[index].get('display_name')
+        ))
+
+    def stage_ended(self, state, index):
+        if index in state['ended']:
+            return
+
+        state['ended'].add(index)
+
+        with self.lock:
+            self.end_count[index] += 1
+
+            if self.end_count[index] != self.expected_cameras():
+                return
+
+            end_time = datetime.now().replace(microsecond=0)
+            self.end_time[index] = end_time
+            start_time = self.start_time.get(index, end_time)
+
+        logger.info('{} ended ({}).'.format(
+            self.stages[index].get('display_name'),
+            end_time - start_time
+        ))
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import traceback
+
+from calibration_cache import get_calibration_cache
+
+logger = logging.getLogger(name='qlf.pipeline')
+
+# 'subprocess' starts a desi_quicklook per camera, 'warm' forks each
+# camera from a server that already imported the Quick Look pipeline
+PIPELINE_EXECUTION = os.environ.get('PIPELINE_EXECUTION', 'subprocess')
+
+# modules imported once by the fork server, '__main__' keeps workers
+# from importing the daemon module again
+QL_PRELOAD = [
+    '__main__',
+    'numpy',
+    'scipy',
+    'astropy.io.fits',
+    'astropy.table',
+    'desispec.io',
+    'desispec.quicklook.quicklook',
+    'desispec.scripts.quicklook',
+]
+
+
+def run_quicklook(writer, argv, cwd):
+    """ Runs the Quick Look entry point of desi_quicklook in a worker,
+    with stdout and stderr sent to the parent through writer.
+
+    Arguments:
+        writer {multiprocessing.connection.Connection} -- pipe write end
+        argv {list} -- desi_quicklook arguments
+        cwd {str} -- working directory
+    """
+
+    # streams and log handlers created by the fork server write to
+    # these descriptors too
+    os.dup2(writer.fileno(), 1)
+    os.dup2(writer.fileno(), 2)
+    writer.close()
+
+    os.chdir(cwd)
+    sys.argv = ['desi_quicklook'] + argv
+
+    calibration_cache = get_calibration_cache()
+    if calibration_cache:
+        calibration_cache.install()
+
+    code = 0
+
+    try:
+        # parses sys.argv, as desi_quicklook does
+        from desispec.scripts import quicklook
+        quicklook.ql_main(quicklook.parse())
+    except SystemExit as err:
+        code = err.code if isinstance(err.code, int) else int(bool(err.code))
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    sys.exit(code)
+
+
+class WarmPool(object):
+    """ Long-lived fork server with the Quick Look pipeline imported.
+
+    Each camera runs in a process forked from the server, so it skips
+    the interpreter startup and the imports, and still gets a fresh
+    pipeline state. """
+
+    def __init__(self, preload=QL_PRELOAD):
+        # modules that fail to import are skipped by the fork server
+        self.context = multiprocessing.get_context('forkserver')
+        self.context.set_forkserver_preload(preload)
+
+    def warm_up(self):
+        """ Starts the fork server now instead of on the first camera. """
+
+        from multiprocessing import forkserver
+        forkserver.ensure_running()
+
+    async def start(self, argv, cwd):
+        """ Starts a camera in a warm worker.
+
+        Arguments:
+            argv {list} -- desi_quicklook arguments
+            cwd {str} -- working directory
+
+        Returns:
+            tuple -- (stdout stream reader, coroutine function returning
+                the exit code, function killing the worker)
+        """
+
+        loop = asyncio.get_event_loop()
+
+        reader, writer = self.context.Pipe(duplex=False)
+
+        process = self.context.Process(
+            target=run_quicklook, args=(writer, argv, cwd)
+        )
+        process.start()
+        writer.close()
+
+        stream = asyncio.StreamReader()
+        pipe = os.fdopen(reader.fileno(), 'rb', 0, closefd=False)
+
+        transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(stream), pipe
+        )
+
+        async def wait():
+            # the sentinel becomes readable when the worker exits
+            exited = loop.create_future()
+            loop.add_reader(process.sentinel, exited.set_result, None)
+
+            try:
+                await exited
+            finally:
+                loop.remove_reader(process.sentinel)
+
+            process.join()
+            transport.close()
+            reader.close()
+
+            return process.exitcode
+
+        def kill():
+            # Process.kill is only available from Python 3.7
+            os.kill(process.pid, signal.SIGKILL)
+
+        return stream, wait, kill
+
+
+warm_pool = None
+
+
+def get_warm_pool():
+    """ Warm pool of this process, None when running desi_quicklook
+    as a subprocess. """
+
+    global warm_pool
+
+    if PIPELINE_EXECUTION != 'warm':
+        return None
+
+    if warm_pool is None:
+        warm_pool = WarmPool()
+
+    return warm_pool
@@ -1,7 +1,15 @@
 from django.contrib import admin
-from .models import Job, Exposure, Camera, ProcessComment
+from .models import (
+    Job, Exposure, Camera, ProcessComment, ExposureQueue,
+    ProductMigration, FiberMetric, Metric, NightlyMetric
+)
 
 admin.site.register(Job)
 admin.site.register(Exposure)
 admin.site.register(Camera)
 admin.site.register(ProcessComment)
+admin.site.register(ExposureQueue)
+admin.site.register(ProductMigration)
+admin.site.register(FiberMetric)
+admin.site.register(Metric)
+admin.site.register(NightlyMetric)
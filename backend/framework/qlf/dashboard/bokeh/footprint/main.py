@@ -4,8 +4,7 @@ from astropy import units as u
 from astropy.coordinates import SkyCoord
 
 from bokeh.plotting import figure
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 import os
 
 from dashboard.models import Exposure
@@ -36,7 +35,7 @@ class Footprint():
 
         return plot
 
-    def render(self, exposures_radec):
+    def render(self, exposures_radec, output='html'):
         qlf_root = os.environ.get('QLF_ROOT', '/app')
         pointings_file = os.path.join(
             qlf_root, 'framework/qlf/dashboard/bokeh/footprint/noconstraints.dat')
@@ -47,7 +46,7 @@ class Footprint():
                           dec=pointings['DEC']*u.deg, frame='icrs')
         if len(exposures_radec) == 0:
             empty = SkyCoord(ra=[]*u.hour, dec=[]*u.deg, frame='icrs')
-            return file_html(self.footprint(coords, empty), CDN, "DESI Footprint")
+            return embed_document(self.footprint(coords, empty), "DESI Footprint", output)
         ra_list = []
         dec_list = []
         for radec in exposures_radec:
@@ -56,4 +55,4 @@ class Footprint():
         visibles = SkyCoord(ra=ra_list*u.hour,
                             dec=dec_list*u.deg, frame='icrs')
 
-        return file_html(self.footprint(coords, visibles), CDN, "DESI Footprint")
+        return embed_document(self.footprint(coords, visibles), "DESI Footprint", output)
@@ -14,8 +14,12 @@ class ObjectStatistics:
         # Load fibermap
         process_id = self.selected_process_id
         process = Process.objects.get(pk=process_id)
-        joblist = [entry.camera.camera for entry in
-                   Job.objects.filter(process_id=process_id)]
+        joblist = list(Job.objects.filter(
+            process_id=process_id).values_list('camera', flat=True))
+        outputs = QLFModels().get_outputs(process_id, None, [
+            'TASKS->CHECK_SPECTRA->METRICS->PEAKCOUNT_STATUS',
+            'TASKS->CHECK_FIBERS->METRICS->GOOD_FIBERS'
+        ])
         exposure = process.exposure
         fmap = Fibermap.objects.filter(exposure=exposure)[0]
 
@@ -53,9 +57,8 @@ class ObjectStatistics:
             col_ntgt.append(objects[arm*500: (arm+1)*500].count('TGT'))
             col_nstar.append(objects[arm*500: (arm+1)*500].count('STAR'))
 
-            if cam in joblist:
-                mergedqa = QLFModels().get_output(
-                    self.selected_process_id, cam)
+            if cam in outputs:
+                mergedqa = outputs[cam]
                 status = mergedqa['TASKS']['CHECK_SPECTRA']['METRICS']['PEAKCOUNT_STATUS']
                 col_stat.append(status)
             else:
@@ -108,9 +111,8 @@ class ObjectStatistics:
             arm_col = []
             for spec in list(range(10)):
                 cam = arm+str(spec)
-                if cam in joblist:
-                    mergedqa = QLFModels().get_output(
-                        self.selected_process_id, cam)
+                if cam in outputs:
+                    mergedqa = outputs[cam]
                     fiberstatus = mergedqa['TASKS']['CHECK_FIBERS']['METRICS']['GOOD_FIBERS']
                     arm_col = arm_col+fiberstatus
                 else:
@@ -144,9 +146,8 @@ class ObjectStatistics:
                 arm_col = []
                 for spec in list(range(10)):
                     cam = arm+str(spec)
-                    if cam in joblist:
-                        mergedqa = QLFModels().get_output(
-                            self.selected_process_id, cam)
+                    if cam in outputs:
+                        mergedqa = outputs[cam]
                         fiberstatus = mergedqa['TASKS']['CHECK_FIBERS']['METRICS']['GOOD_FIBERS']
                         arm_col = arm_col+fiberstatus
                     else:
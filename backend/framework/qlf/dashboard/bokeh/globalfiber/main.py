@@ -7,11 +7,10 @@ from qlf_models import QLFModels
 
 import numpy as np
 import logging
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 import os
-from dashboard.models import Job, Process, Fibermap
+from dashboard.models import Process, Fibermap
 
 spectro_data = os.environ.get('DESI_SPECTRO_DATA')
 
@@ -37,8 +36,11 @@ class GlobalFiber:
         }
 
         process_id = self.selected_process_id
-        joblist = [entry.camera.camera for entry in Job.objects.filter(
-            process_id=process_id)]
+        outputs = QLFModels().get_outputs(
+            process_id,
+            [self.selected_arm+str(spec) for spec in list(range(10))],
+            ['TASKS->CHECK_FIBERS->METRICS->GOOD_FIBERS']
+        )
 
         ra_tile = fmap.fiber_ra
         dec_tile = fmap.fiber_dec
@@ -50,9 +52,8 @@ class GlobalFiber:
         cam_inst = []
         for spec in list(range(10)):
             cam = self.selected_arm+str(spec)
-            if cam in joblist:
-                mergedqa = QLFModels().get_output(
-                    self.selected_process_id, cam)
+            if cam in outputs:
+                mergedqa = outputs[cam]
                 countbins = mergedqa['TASKS']['CHECK_FIBERS']['METRICS']['GOOD_FIBERS']
                 y = y + countbins
                 color = color + ['green' if idx ==
@@ -138,7 +139,7 @@ class GlobalFiber:
 
         return p
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         process_id = self.selected_process_id
         process = Process.objects.get(pk=process_id)
         exposure = process.exposure
@@ -149,7 +150,7 @@ class GlobalFiber:
         p = self.wedge_plot(self.selected_arm, fmap, common_source=src)
         layout = row(p, sizing_mode='scale_width')
 
-        return file_html(layout, CDN, "Global Fiber")
+        return embed_document(layout, "Global Fiber", output)
 
 
 if __name__ == '__main__':
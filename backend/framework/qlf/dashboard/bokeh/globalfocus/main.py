@@ -9,11 +9,10 @@ from dashboard.bokeh.helper import get_palette
 
 import numpy as np
 import logging
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 import os
-from dashboard.models import Job, Process, Fibermap
+from dashboard.models import Process, Fibermap
 
 spectro_data = os.environ.get('DESI_SPECTRO_DATA')
 
@@ -38,8 +37,11 @@ class GlobalFocus:
         }
 
         process_id = self.selected_process_id
-        joblist = [entry.camera.camera for entry in Job.objects.filter(
-            process_id=process_id)]
+        outputs = QLFModels().get_outputs(
+            process_id,
+            [self.selected_arm+str(spec) for spec in list(range(10))],
+            ['TASKS->CHECK_CCDs->METRICS->XWSIGMA_FIB']
+        )
         ra_tile = fmap.fiber_ra
         dec_tile = fmap.fiber_dec
         otype_tile = fmap.objtype
@@ -49,9 +51,8 @@ class GlobalFocus:
         cam_inst = []
         for spec in list(range(10)):
             cam = self.selected_arm+str(spec)
-            if cam in joblist:
-                mergedqa = QLFModels().get_output(
-                    self.selected_process_id, cam)
+            if cam in outputs:
+                mergedqa = outputs[cam]
                 xwsig = mergedqa['TASKS']['CHECK_CCDs']['METRICS']['XWSIGMA_FIB']
                 y = y + xwsig[0]
                 w = w + xwsig[1]
@@ -110,12 +111,12 @@ class GlobalFocus:
         source = common_source
 
         process_id = self.selected_process_id
-        joblist = [entry.camera.camera for entry in Job.objects.filter(
-            process_id=process_id)]
-        if len(joblist) > 0:
-            cam = joblist[0]
-            mergedqa = QLFModels().get_output(
-                self.selected_process_id, cam)
+        outputs = QLFModels().get_outputs(process_id, None, [
+            'TASKS->CHECK_CCDs->PARAMS->XWSIGMA_WARN_RANGE',
+            'TASKS->CHECK_CCDs->PARAMS->XWSIGMA_REF'
+        ])
+        if len(outputs) > 0:
+            mergedqa = list(outputs.values())[0]
             warn_range = mergedqa['TASKS']['CHECK_CCDs']['PARAMS']['XWSIGMA_WARN_RANGE']
             arg_kind = {'x': 0, 'w': 1}
             refvalue = mergedqa['TASKS']['CHECK_CCDs']['PARAMS']['XWSIGMA_REF'][arg_kind[sigma_kind]]
@@ -177,7 +178,7 @@ class GlobalFocus:
 
         return p_list
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         process_id = self.selected_process_id
         process = Process.objects.get(pk=process_id)
         exposure = process.exposure
@@ -193,7 +194,7 @@ class GlobalFocus:
                              common_source=src, sigma_kind='w')
         layout = row(column(row(p), row(pw)),)
 
-        return file_html(layout, CDN, "Global Focus")
+        return embed_document(layout, "Global Focus", output)
 
 
 if __name__ == '__main__':
@@ -9,11 +9,10 @@ from dashboard.bokeh.helper import get_palette
 
 import numpy as np
 import logging
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 import os
-from dashboard.models import Job, Process, Fibermap
+from dashboard.models import Process, Fibermap
 
 spectro_data = os.environ.get('DESI_SPECTRO_DATA')
 
@@ -39,8 +38,6 @@ class GlobalSnr:
 
         process_id = self.selected_process_id
         process = Process.objects.get(pk=process_id)
-        joblist = [entry.camera.camera for entry in Job.objects.filter(
-            process_id=process_id)]
 
         ra_tile = fmap.fiber_ra
         dec_tile = fmap.fiber_dec
@@ -50,6 +47,17 @@ class GlobalSnr:
         if 'SKY' in objlist:
             objlist.remove('SKY')
 
+        outputs = QLFModels().get_outputs(
+            process_id,
+            [arm+str(spect) for spect in list(range(10))],
+            ['TASKS->CHECK_SPECTRA->METRICS->MEDIAN_SNR',
+             'TASKS->CHECK_SPECTRA->METRICS->SNR_RESID',
+             'GENERAL_INFO->STD_FIBERID',
+             'GENERAL_INFO->STAR_FIBERID',
+             'GENERAL_INFO->RA',
+             'GENERAL_INFO->DEC']
+        )
+
         ra_snr = []
         dec_snr = []
         resids_snr = []
@@ -64,9 +72,8 @@ class GlobalSnr:
             resids_petal = []
             ot_petal = []
             cam_petal = []
-            if cam in joblist:
-                mergedqa = QLFModels().get_output(
-                    self.selected_process_id, cam)
+            if cam in outputs:
+                mergedqa = outputs[cam]
 
                 med_snr = np.array(
                     mergedqa['TASKS']['CHECK_SPECTRA']['METRICS']["MEDIAN_SNR"])
@@ -140,8 +147,6 @@ class GlobalSnr:
         }
 
         process_id = self.selected_process_id
-        joblist = [entry.camera.camera for entry in Job.objects.filter(
-            process_id=process_id)]
 
         ra_tile = fmap.fiber_ra
         dec_tile = fmap.fiber_dec
@@ -151,6 +156,17 @@ class GlobalSnr:
         if 'SKY' in objlist:
             objlist.remove('SKY')
 
+        outputs = QLFModels().get_outputs(
+            process_id,
+            [self.selected_arm+str(spect) for spect in list(range(1))],
+            ['TASKS->CHECK_SPECTRA->METRICS->MEDIAN_SNR',
+             'TASKS->CHECK_SPECTRA->METRICS->SNR_RESID',
+             'GENERAL_INFO->STAR_FIBERID',
+             'GENERAL_INFO->RA',
+             'GENERAL_INFO->DEC'] +
+            ['GENERAL_INFO->%s_FIBERID' % otype for otype in objlist]
+        )
+
         fibaux = []
 
         y = []
@@ -160,9 +176,8 @@ class GlobalSnr:
 
         for spect in list(range(1)):
             cam = self.selected_arm+str(spect)
-            if cam in joblist:
-                mergedqa = QLFModels().get_output(
-                    self.selected_process_id, cam)
+            if cam in outputs:
+                mergedqa = outputs[cam]
 
                 # Assign available objects
                 objtype = otype_tile[500*spect: 500*(spect + 1)]
@@ -310,7 +325,7 @@ class GlobalSnr:
 
         return p_list
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         process_id = self.selected_process_id
         process = Process.objects.get(pk=process_id)
         exposure = process.exposure
@@ -322,4 +337,4 @@ class GlobalSnr:
         p = self.wedge_plot(self.selected_arm, fmap, common_source=src_arm)
         layout = row(column(row(p)))
 
-        return file_html(layout, CDN, "Global SNR")
+        return embed_document(layout, "Global SNR", output)
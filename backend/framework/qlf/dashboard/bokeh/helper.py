@@ -11,17 +11,144 @@ def get_palette(name_of_mpl_palette):
     return bokehpalette
 
 
+OBJ_TYPES = ['LRG', 'ELG', 'QSO', 'STAR', 'SKY']
+
+# QA columns read by sort_obj
+OBJ_FIBERID_COLUMNS = ['GENERAL_INFO->{}_FIBERID'.format(key)
+                       for key in OBJ_TYPES]
+
+
 def sort_obj(gen_info):
     """ Hover info of objects type in fibers (wedge) plots.
             input: gen_info= mergedqa['GENERAL_INFO']
             returns: list(500)
     """
     obj_type = ['']*500
-    for key in ['LRG', 'ELG', 'QSO', 'STAR', 'SKY']:
-        if gen_info.get(key+'_FIBERID', None):
-            print(key+'_FIBERID', len(gen_info[key+'_FIBERID']))
-            for i in gen_info[key+'_FIBERID']:
+    for key in OBJ_TYPES:
+        fiberid = gen_info.get(key+'_FIBERID', None)
+        if fiberid is not None and len(fiberid):
+            for i in fiberid:
                 obj_type[i%500] = key
         else:
             pass
     return obj_type
+
+
+def embed_document(layout, title, output='html'):
+    """ Document of a view.
+
+    Arguments:
+        layout -- bokeh layout or plot
+        title {str} -- page title, only for 'html'
+
+    Keyword Arguments:
+        output {str} -- 'html' for a standalone page with its own BokehJS,
+            'json' for the document JSON (json_item, bokeh >= 1.0),
+            shown with Bokeh.embed.embed_item, or 'components' for the
+            script and div of the plot (default: {'html'})
+
+    Returns:
+        str -- HTML page or JSON payload
+    """
+    import json
+    from bokeh.embed import components, file_html
+    from bokeh.resources import CDN
+
+    if output == 'json':
+        from bokeh.embed import json_item
+        return json.dumps(json_item(layout))
+
+    if output == 'components':
+        script, div = components(layout)
+        return json.dumps(dict(script=script, div=div))
+
+    return file_html(layout, CDN, title)
+
+
+def decimate(x, y, points, method='lttb'):
+    """ Indices of the points kept to draw a series with about the given
+    number of points.
+
+    Arguments:
+        x {array} -- x values, sorted
+        y {array} -- y values, NaN for missing values
+        points {int} -- target number of points
+
+    Keyword Arguments:
+        method {str} -- 'lttb' (largest triangle three buckets), which
+            keeps the shape of the series, or 'minmax', which keeps the
+            extremes of each bucket (default: {'lttb'})
+
+    Returns:
+        array -- indices into x and y, sorted
+    """
+    import numpy as np
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # missing values are not drawn
+    finite = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+
+    if len(finite) <= max(points, 2):
+        return finite
+
+    if method == 'minmax':
+        kept = minmax_indices(y[finite], points)
+    else:
+        kept = lttb_indices(x[finite], y[finite], points)
+
+    return finite[kept]
+
+
+def lttb_indices(x, y, points):
+    """ Largest triangle three buckets: the first and last points, and in
+    each bucket between them the point of the largest triangle with the
+    point kept in the previous bucket and the mean of the next one.
+    """
+    import numpy as np
+
+    points = max(points, 3)
+    edges = np.linspace(1, len(x) - 1, points - 1).astype(int)
+
+    # mean of each bucket, and of the last point as the last bucket
+    counts = np.diff(edges)
+    x_means = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    y_means = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    kept = np.zeros(points, dtype=int)
+    kept[-1] = len(x) - 1
+
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        previous = kept[bucket]
+
+        # twice the area of the triangles, vectorized over the bucket
+        area = np.abs(
+            (x[previous] - x_means[bucket + 1]) *
+            (y[start:end] - y[previous]) -
+            (x[previous] - x[start:end]) *
+            (y_means[bucket + 1] - y[previous])
+        )
+
+        kept[bucket + 1] = start + np.argmax(area)
+
+    return kept
+
+
+def minmax_indices(y, points):
+    """ Minimum and maximum of each of points / 2 buckets. """
+    import numpy as np
+
+    edges = np.linspace(0, len(y), max(points // 2, 1) + 1).astype(int)
+    edges = np.unique(edges[:-1])
+
+    # bucket of each point, and the position of its min and max
+    buckets = np.repeat(
+        np.arange(len(edges)), np.diff(np.append(edges, len(y)))
+    )
+    order = np.lexsort((y, buckets))
+    firsts = np.searchsorted(buckets[order], np.arange(len(edges)))
+    lasts = np.append(firsts[1:], len(y)) - 1
+
+    return np.unique(np.concatenate([order[firsts], order[lasts]]))
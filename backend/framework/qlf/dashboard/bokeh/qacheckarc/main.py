@@ -9,8 +9,7 @@ from qlf_models import QLFModels
 from dashboard.bokeh.helper import get_palette
 
 import logging
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 logger = logging.getLogger(__name__)
 
 
@@ -21,10 +20,11 @@ class Arc:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[])
 
         check_arc = mergedqa['TASKS']['CHECK_ARC']
 
@@ -46,4 +46,4 @@ class Arc:
                         metric, alert,
                         css_classes=["display-grid"])
 
-        return file_html(layout, CDN, "ARC")
+        return embed_document(layout, "ARC", output)
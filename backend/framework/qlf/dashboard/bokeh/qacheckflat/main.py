@@ -11,8 +11,7 @@ from qlf_models import QLFModels
 from dashboard.bokeh.helper import get_palette
 
 import logging
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 logger = logging.getLogger(__name__)
 
 
@@ -23,10 +22,11 @@ class Flat:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[])
         check_flat = mergedqa['TASKS']['CHECK_FIBERFLAT']
         flat = check_flat['METRICS']
 
@@ -46,4 +46,4 @@ class Flat:
                         metric, alert,
                         css_classes=["display-grid"])
 
-        return file_html(layout, CDN, "FIBERFLAT")
+        return embed_document(layout, "FIBERFLAT", output)
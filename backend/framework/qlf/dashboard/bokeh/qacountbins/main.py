@@ -7,11 +7,10 @@ from qlf_models import QLFModels
 from dashboard.bokeh.plots.descriptors.table import Table
 from dashboard.bokeh.plots.descriptors.title import Title
 from dashboard.bokeh.plots.plot2d.main import Plot2d
-from dashboard.bokeh.helper import sort_obj
+from dashboard.bokeh.helper import sort_obj, OBJ_FIBERID_COLUMNS
 
 import numpy as np
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 from bokeh.models.widgets import Div
 
 
@@ -21,10 +20,15 @@ class Countbins:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[
+                'GENERAL_INFO->RA',
+                'GENERAL_INFO->DEC',
+                'TASKS->CHECK_FIBERS->METRICS->GOOD_FIBERS'
+            ] + OBJ_FIBERID_COLUMNS)
         check_fibers = mergedqa['TASKS']['CHECK_FIBERS']
         gen_info = mergedqa['GENERAL_INFO']
         flavor=mergedqa["FLAVOR"]
@@ -167,4 +171,4 @@ class Countbins:
                         column(p2, sizing_mode='scale_both'),
                         css_classes=["display-grid"])
 
-        return file_html(layout, CDN, "COUNTBINS")
+        return embed_document(layout, "COUNTBINS", output)
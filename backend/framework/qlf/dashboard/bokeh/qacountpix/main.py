@@ -8,8 +8,7 @@ from dashboard.bokeh.plots.patch.main import Patch
 
 from qlf_models import QLFModels
 
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 
 class Countpix:
@@ -18,10 +17,11 @@ class Countpix:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[])
         gen_info = mergedqa['GENERAL_INFO']
         flavor = mergedqa["FLAVOR"]
         check_ccds = mergedqa['TASKS']['CHECK_CCDs']
@@ -67,4 +67,4 @@ class Countpix:
                                css_classes=["main-one"]),
                         css_classes=["display-grid"])
 
-        return file_html(layout, CDN, "Countpix")
+        return embed_document(layout, "Countpix", output)
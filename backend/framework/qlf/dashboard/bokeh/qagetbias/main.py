@@ -8,8 +8,7 @@ from dashboard.bokeh.plots.descriptors.table import Table
 from dashboard.bokeh.plots.descriptors.title import Title
 from dashboard.bokeh.plots.patch.main import Patch
 
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 
 class Bias:
@@ -18,10 +17,11 @@ class Bias:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[])
         check_ccds = mergedqa['TASKS']['CHECK_CCDs']
         getbias = check_ccds['METRICS']
 
@@ -67,4 +67,4 @@ class Bias:
                         css_classes=["display-grid"])
 
 
-        return file_html(layout, CDN, "GETBIAS")
+        return embed_document(layout, "GETBIAS", output)
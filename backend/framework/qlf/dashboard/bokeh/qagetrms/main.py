@@ -8,8 +8,7 @@ from dashboard.bokeh.plots.patch.main import Patch
 
 from qlf_models import QLFModels
 
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 
 class RMS:
@@ -18,10 +17,11 @@ class RMS:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[])
         check_ccds = mergedqa['TASKS']['CHECK_CCDs']
         getrms = check_ccds['METRICS']
 
@@ -76,4 +76,4 @@ class RMS:
                         column(p2, sizing_mode='scale_both'),
                         css_classes=["display-grid"])
 
-        return file_html(layout, CDN, "GETRMS")
+        return embed_document(layout, "GETRMS", output)
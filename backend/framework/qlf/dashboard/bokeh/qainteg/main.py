@@ -12,8 +12,7 @@ import numpy as np
 from qlf_models import QLFModels
 from dashboard.models import Job, Process, Fibermap
 
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 
 class Integ:
@@ -22,11 +21,14 @@ class Integ:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
         mergedqa = QLFModels().get_output(
-            self.selected_process_id, cam)
+            self.selected_process_id, cam, columns=[
+                'GENERAL_INFO->STAR_FIBERID',
+                'GENERAL_INFO->FIBER_MAGS'
+            ])
 
         gen_info = mergedqa['GENERAL_INFO']
 
@@ -112,4 +114,4 @@ class Integ:
                         column(fiber_hist, sizing_mode='scale_both', css_classes=["main-one"]),
                         css_classes=["display-grid"])
 
-        return file_html(layout, CDN, "INTEG")
+        return embed_document(layout, "INTEG", output)
@@ -8,8 +8,7 @@ from dashboard.bokeh.plots.descriptors.title import Title
 from qlf_models import QLFModels
 
 import logging
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 logger = logging.getLogger(__name__)
 
 
@@ -20,10 +19,11 @@ class SkyR:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[])
         gen_info = mergedqa['GENERAL_INFO']
 
         check_spectra = mergedqa['TASKS']['CHECK_SPECTRA']
@@ -46,4 +46,4 @@ class SkyR:
                         metric, alert,
                         css_classes=["display-grid"])
 
-        return file_html(layout, CDN, "SKYR")
+        return embed_document(layout, "SKYR", output)
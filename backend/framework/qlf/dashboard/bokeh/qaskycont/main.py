@@ -11,8 +11,7 @@ from dashboard.bokeh.plots.descriptors.title import Title
 from dashboard.bokeh.plots.plot2d.main import Plot2d
 
 import numpy as np
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 
 class Skycont:
@@ -21,10 +20,16 @@ class Skycont:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[
+                'GENERAL_INFO->RA',
+                'GENERAL_INFO->DEC',
+                'GENERAL_INFO->SKY_FIBERID',
+                'TASKS->CHECK_SPECTRA->METRICS->SKYCONT_FIBER'
+            ])
         gen_info = mergedqa['GENERAL_INFO']
         ra = gen_info['RA']
         dec = gen_info['DEC']
@@ -145,4 +150,4 @@ class Skycont:
                         css_classes=["display-grid"])
 
         # End of Bokeh Block
-        return file_html(layout, CDN, "SKYCONT")
+        return embed_document(layout, "SKYCONT", output)
@@ -5,7 +5,7 @@ from bokeh.models import LinearColorMapper
 from bokeh.models import TapTool, OpenURL, Range1d
 from bokeh.models.widgets import Div
 from qlf_models import QLFModels
-from dashboard.bokeh.helper import sort_obj
+from dashboard.bokeh.helper import sort_obj, OBJ_FIBERID_COLUMNS
 from dashboard.bokeh.plots.descriptors.table import Table
 from dashboard.bokeh.plots.descriptors.title import Title
 from dashboard.bokeh.plots.plot2d.main import Plot2d
@@ -13,8 +13,7 @@ from dashboard.bokeh.plots.plot2d.main import Plot2d
 from dashboard.bokeh.helper import get_palette
 
 import numpy as np
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 
 class Skypeak:
@@ -23,9 +22,13 @@ class Skypeak:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[
+                'GENERAL_INFO->RA', 'GENERAL_INFO->DEC',
+                'TASKS->CHECK_SPECTRA->METRICS->PEAKCOUNT_FIB'
+            ] + OBJ_FIBERID_COLUMNS)
         check_spectra = mergedqa['TASKS']['CHECK_SPECTRA']
 
         gen_info = mergedqa['GENERAL_INFO']
@@ -176,4 +179,4 @@ class Skypeak:
                         column(p_hist, sizing_mode='scale_both'),
                         css_classes=["display-grid"])
 
-        return file_html(layout, CDN, "SKYPEAK")
+        return embed_document(layout, "SKYPEAK", output)
@@ -8,9 +8,8 @@ from dashboard.bokeh.plots.descriptors.table import Table
 from dashboard.bokeh.plots.descriptors.title import Title
 from dashboard.bokeh.plots.plot2d.main import Plot2d
 from qlf_models import QLFModels
-from dashboard.bokeh.helper import sort_obj
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import sort_obj, OBJ_FIBERID_COLUMNS
+from dashboard.bokeh.helper import embed_document
 import numpy as np
 from dashboard.models import Job, Process, Fibermap
 
@@ -21,10 +20,17 @@ class SNR:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[
+                'GENERAL_INFO->RA',
+                'GENERAL_INFO->DEC',
+                'TASKS->CHECK_SPECTRA->METRICS->SNR_MAG_TGT',
+                'TASKS->CHECK_SPECTRA->METRICS->MEDIAN_SNR',
+                'TASKS->CHECK_SPECTRA->METRICS->SNR_RESID'
+            ] + OBJ_FIBERID_COLUMNS)
 
         # list of available object in petal
         objlist = mergedqa["TASKS"]["CHECK_SPECTRA"]["METRICS"]["OBJLIST"]
@@ -359,7 +365,7 @@ class SNR:
 
         fibersnr_tgt = []
         for i in avobj:
-            fibersnr_tgt.append(gen_info[i+'_FIBERID'])
+            fibersnr_tgt.append(list(gen_info[i+'_FIBERID']))
 
         fibersnr = []
         for i in list(range(len(fibersnr_tgt))):
@@ -516,4 +522,4 @@ class SNR:
                         column(mediam_plot, sizing_mode='scale_both'),
                         column(wedge_plot, sizing_mode='scale_both'),
                         css_classes=["display-grid"])
-        return file_html(layout, CDN, "MEDIAN SNR")
+        return embed_document(layout, "MEDIAN SNR", output)
@@ -7,10 +7,10 @@ from bokeh.models import LinearColorMapper, ColorBar
 from qlf_models import QLFModels
 from bokeh.models import TapTool, OpenURL
 from bokeh.models.widgets import Div
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 import numpy as np
-from dashboard.bokeh.helper import get_palette, sort_obj
+from dashboard.bokeh.helper import get_palette, sort_obj, \
+    OBJ_FIBERID_COLUMNS
 from bokeh.models import PrintfTickFormatter
 from dashboard.bokeh.plots.descriptors.table import Table
 from dashboard.bokeh.plots.patch.main import Patch
@@ -24,11 +24,15 @@ class Xwsigma:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
 
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[
+                'GENERAL_INFO->RA', 'GENERAL_INFO->DEC',
+                'TASKS->CHECK_CCDs->METRICS->XWSIGMA_FIB'
+            ] + OBJ_FIBERID_COLUMNS)
 
         gen_info = mergedqa['GENERAL_INFO']
         flavor= mergedqa['FLAVOR']
@@ -507,4 +511,4 @@ class Xwsigma:
                 column(wamp, sizing_mode='scale_both'),
                 css_classes=["display-grid"], sizing_mode='scale_width')
            
-        return file_html(layout, CDN, "XWSIGMA")
+        return embed_document(layout, "XWSIGMA", output)
@@ -7,8 +7,7 @@ from dashboard.bokeh.plots.descriptors.title import Title
 
 from qlf_models import QLFModels
 
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 
 
 class Xyshifts:
@@ -17,10 +16,11 @@ class Xyshifts:
         self.selected_arm = arm
         self.selected_spectrograph = spectrograph
 
-    def load_qa(self):
+    def load_qa(self, output='html'):
         cam = self.selected_arm+str(self.selected_spectrograph)
 
-        mergedqa = QLFModels().get_output(self.selected_process_id, cam)
+        mergedqa = QLFModels().get_output(
+            self.selected_process_id, cam, columns=[])
 
         check_fibers = mergedqa['TASKS']['CHECK_FIBERS']
         gen_info = mergedqa['GENERAL_INFO']
@@ -47,4 +47,4 @@ class Xyshifts:
                         metric, alert,
                         css_classes=["display-grid"])
 
-        return file_html(layout, CDN, "XYSHIFTS")
+        return embed_document(layout, "XYSHIFTS", output)
@@ -5,8 +5,7 @@ from bokeh.models import HoverTool, Legend, Spacer
 from bokeh.layouts import gridplot
 
 from bokeh.models.widgets import Div, Select, RangeSlider
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 import json
 from bokeh.models import DatetimeTickFormatter
 from log import get_logger
@@ -92,7 +91,7 @@ class Regression():
 
         self.layout = plot
 
-    def render(self):
+    def render(self, output='html'):
         outputs_y = self.models.get_product_metrics_by_camera(
             self.yaxis, self.camera, begin_date=self.start, end_date=self.end)
         outputs_x = self.models.get_product_metrics_by_camera(
@@ -100,4 +99,4 @@ class Regression():
 
         self.render_plot(outputs_x, outputs_y)
 
-        return file_html(self.layout, CDN, "Regression")
+        return embed_document(self.layout, "Regression", output)
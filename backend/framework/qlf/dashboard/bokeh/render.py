@@ -0,0 +1,140 @@
+import importlib
+from functools import partial
+
+from render_cache import get_render_cache
+
+# per camera QA views, module: class
+QA_VIEWS = dict(
+    qacountpix='Countpix',
+    qagetbias='Bias',
+    qagetrms='RMS',
+    qaxwsigma='Xwsigma',
+    qaxyshifts='Xyshifts',
+    qacountbins='Countbins',
+    qainteg='Integ',
+    qaskycont='Skycont',
+    qaskypeak='Skypeak',
+    qaskyR='SkyR',
+    qasnr='SNR',
+    qacheckflat='Flat',
+    qacheckarc='Arc',
+)
+
+# focal plane views of an arm, module: class
+GLOBAL_VIEWS = dict(
+    globalfiber='GlobalFiber',
+    globalfocus='GlobalFocus',
+    globalsnr='GlobalSnr',
+)
+
+ARMS = ('b', 'r', 'z')
+
+
+def view_class(module, name):
+    return getattr(
+        importlib.import_module('dashboard.bokeh.{}.main'.format(module)),
+        name
+    )
+
+
+def load_qa(process_id, qa, arm, spectrograph=None, output='html'):
+    """ Renders a QA view (load_qa endpoint).
+
+    Arguments:
+        process_id {int} -- process ID
+        qa {str} -- view, e.g. "qaxwsigma" or "globalfocus"
+        arm {str} -- arm
+
+    Keyword Arguments:
+        spectrograph {str} -- spectrograph, only for the per camera
+            views (default: {None})
+        output {str} -- 'html', 'json' or 'components', see
+            embed_document (default: {'html'})
+
+    Returns:
+        str -- HTML document or JSON payload
+    """
+
+    if qa in GLOBAL_VIEWS:
+        return view_class(qa, GLOBAL_VIEWS[qa])(
+            process_id, arm
+        ).load_qa(output)
+
+    return view_class(qa, QA_VIEWS[qa])(
+        process_id, arm, spectrograph
+    ).load_qa(output)
+
+
+def load_spectra(process_id, arm, output='html'):
+    """ Renders the spectra overview of an arm (load_spectra endpoint). """
+
+    from dashboard.bokeh.spectra.main import Spectra
+
+    return Spectra(process_id, arm).load_spectra(output)
+
+
+def cached_qa(process_id, qa, arm, spectrograph=None, output='html'):
+    """ QA view from the render cache, rendered on a miss. """
+
+    camera = None
+    if qa not in GLOBAL_VIEWS:
+        camera = arm + str(spectrograph)
+
+    render = partial(load_qa, process_id, qa, arm, spectrograph, output)
+    render_cache = get_render_cache()
+
+    if not render_cache:
+        return render()
+
+    return render_cache.render(
+        'load_qa', render, process_id, camera,
+        dict(qa=qa, arm=arm, output=output)
+    )
+
+
+def cached_spectra(process_id, arm, output='html'):
+    """ Spectra overview from the render cache, rendered on a miss. """
+
+    render = partial(load_spectra, process_id, arm, output)
+    render_cache = get_render_cache()
+
+    if not render_cache:
+        return render()
+
+    return render_cache.render(
+        'load_spectra', render, process_id,
+        params=dict(arm=arm, output=output)
+    )
+
+
+def process_views(cameras, outputs=('html',)):
+    """ Views opened for a process, as (function, arguments after the
+    process ID), the focal plane views first.
+
+    Arguments:
+        cameras {list} -- camera names of the process
+
+    Keyword Arguments:
+        outputs {tuple} -- output modes rendered (default: {('html',)})
+    """
+
+    arms = [arm for arm in ARMS if any(
+        camera.startswith(arm) for camera in cameras
+    )]
+
+    views = list()
+
+    for output in outputs:
+        for arm in arms:
+            for qa in sorted(GLOBAL_VIEWS):
+                views.append((cached_qa, (qa, arm, None, output)))
+            views.append((cached_spectra, (arm, output)))
+
+    for output in outputs:
+        for camera in sorted(cameras):
+            for qa in sorted(QA_VIEWS):
+                views.append(
+                    (cached_qa, (qa, camera[0], camera[1:], output))
+                )
+
+    return views
@@ -6,8 +6,7 @@ from dashboard.models import Process, Fibermap, Job
 from qlf_models import QLFModels
 from bokeh.layouts import widgetbox
 from bokeh.models.widgets import Button
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document
 import os
 
 from astropy.io import fits
@@ -149,7 +148,7 @@ class Spectra():
 
         return p
 
-    def load_spectra(self):
+    def load_spectra(self, output='html'):
         fmap = Fibermap.objects.filter(exposure=self.exposure)[0]
 
         src = self.data_source(fmap)
@@ -157,7 +156,7 @@ class Spectra():
         p = self.wedge_plot(self.selected_arm, fmap, common_source=src)
         layout = row(p, sizing_mode='scale_width')
 
-        return file_html(layout, CDN, "Spectra")
+        return embed_document(layout, "Spectra", output)
 
     def load_frame(self, fiber_id, arm):
         try:
@@ -184,7 +183,7 @@ class Spectra():
             fid=fiber_id,
             brick=fmap['BRICKNAME'][fiber_id],)
 
-    def render_spectra(self, fiber, spectrograph):
+    def render_spectra(self, fiber, spectrograph, output='html'):
         fiber = int(fiber)
         self.spectrograph = spectrograph
         # -----------------------
@@ -262,4 +261,4 @@ class Spectra():
         button = Button(label="Back", button_type="warning", callback=callback)
 
         layout = column(p_spec, widgetbox(button), sizing_mode='scale_width')
-        return file_html(layout, CDN, "Spectra")
+        return embed_document(layout, "Spectra", output)
@@ -1,12 +1,12 @@
 import numpy as np
 import pandas as pd
 from bokeh.plotting import ColumnDataSource, figure
-from bokeh.models import HoverTool, Legend
-from bokeh.layouts import column
+from bokeh.models import HoverTool, Legend, Range1d, CustomJS, Band
+from bokeh.models import CDSView, GroupFilter
+from bokeh.layouts import column, gridplot
 
 from bokeh.models.widgets import Div, Select, RangeSlider
-from bokeh.resources import CDN
-from bokeh.embed import file_html
+from dashboard.bokeh.helper import embed_document, decimate
 import json
 from bokeh.models import DatetimeTickFormatter
 from log import get_logger
@@ -17,6 +17,23 @@ from astropy.time import Time
 
 qlf_root = os.environ.get('QLF_ROOT')
 
+# points drawn per series, longer series are decimated, 0 draws them all
+TIMESERIES_POINTS = int(os.environ.get('TIMESERIES_POINTS', 2000))
+
+# a zoom into a decimated plot reloads it with the visible window, at
+# full resolution if the window has less points than the target
+ZOOM_RELOAD = """
+    if (x_range.start == x_range.reset_start &&
+            x_range.end == x_range.reset_end)
+        return;
+    clearTimeout(window.zoom_reload);
+    window.zoom_reload = setTimeout(function() {
+        var params = new URLSearchParams(window.location.search);
+        params.set('window', x_range.start + ',' + x_range.end);
+        window.location.search = params.toString();
+    }, 1000);
+"""
+
 logger = get_logger(
     "qlf.bokeh",
     os.path.join(qlf_root, "logs", "bokeh.log")
@@ -24,13 +41,61 @@ logger = get_logger(
 
 
 class TimeSeries():
-    def __init__(self, yaxis, start, end, camera, amp=None):
+    def __init__(self, yaxis, start, end, camera, amp=None, points=None,
+                 window=None, decimation='lttb', nightly=False):
+        """ Time series of a metric of a camera.
+
+        Arguments:
+            yaxis {str} -- metric key
+            start {str} -- first night, YYYYMMDD
+            end {str} -- last night, YYYYMMDD
+            camera {str} -- camera name, or camera names separated by
+                commas for a grid of plots, one per camera
+
+        Keyword Arguments:
+            amp {str} -- amplifiers, comma separated, e.g. "1,2"
+                (default: {None})
+            points {int} -- points drawn per series
+                (default: {TIMESERIES_POINTS})
+            window {str} -- "mjd_start,mjd_end" visible window of a
+                zoom, drawn at full resolution if it has less points
+                (default: {None})
+            decimation {str} -- 'lttb' or 'minmax', see decimate
+                (default: {'lttb'})
+            nightly {bool} -- draws the nightly median and 5th to 95th
+                percentiles (NightlyMetric) instead of every exposure
+                (default: {False})
+        """
+
         self.yaxis = yaxis
         self.start = datetime.strptime(start, '%Y%m%d').strftime('%Y-%m-%d')
         self.end = datetime.strptime(end, '%Y%m%d').strftime('%Y-%m-%d')
         self.camera = camera
+        self.cameras = camera.split(',')
         self.models = QLFModels()
         self.amp = amp
+        self.points = TIMESERIES_POINTS if points is None else int(points)
+        self.window = None
+        if window:
+            self.window = [float(mjd) for mjd in window.split(',')]
+        self.decimation = decimation
+        self.decimated = False
+        self.nightly = nightly
+
+    def sample(self, df, idx):
+        """ Rows of a series drawn, decimated to self.points. """
+
+        rows = df.assign(y=df['value'].apply(lambda x: x[idx]).astype(float))
+
+        if not self.points or len(rows) <= self.points:
+            return rows
+
+        self.decimated = True
+        kept = decimate(
+            rows['mjd'].values, rows['y'].values, self.points, self.decimation
+        )
+
+        return rows.iloc[kept]
 
     def make_plot(self, outputs, objtype=None):
         colors = [
@@ -41,15 +106,18 @@ class TimeSeries():
         ]
         legends=list()
         df = pd.DataFrame(list(outputs))
+        df['datef'] = df['dateobs'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        self.extent = (df['mjd'].min(), df['mjd'].max())
         if self.amp != None:
             for amp in self.amp.split(','):
                 idx = int(amp)-1
+                rows = self.sample(df, idx)
                 source = ColumnDataSource(data=dict(
-                    x=df['mjd'],
-                    y=df['value'].apply(lambda x: x[idx]),
-                    exposure=df['exposure_id'],
-                    camera=df['camera'],
-                    dateobs=df['datef']
+                    x=rows['mjd'],
+                    y=rows['y'],
+                    exposure=rows['exposure_id'],
+                    camera=rows['camera'],
+                    dateobs=rows['datef']
                 ))
                 line=self.p.line('x', 'y', source=source, line_color=colors[idx])
                 circle=self.p.circle('x', 'y', source=source, size=6, line_color=None, fill_color=colors[idx])
@@ -57,18 +125,202 @@ class TimeSeries():
             legend = Legend(items=legends, location=(0, 0))
             self.p.add_layout(legend, 'below')
         else:
+            rows = self.sample(df, 0)
             source = ColumnDataSource(data=dict(
-                x=df['mjd'],
-                y=df['value'].apply(lambda x: x[0]),
-                exposure=df['exposure_id'],
-                camera=df['camera'],
-                dateobs=df['datef']
+                x=rows['mjd'],
+                y=rows['y'],
+                exposure=rows['exposure_id'],
+                camera=rows['camera'],
+                dateobs=rows['datef']
             ))
         
             self.p.line('x', 'y', source=source)
             self.p.circle('x', 'y', source=source, size=5)
 
-    def render(self):
+    def make_nightly_plot(self, outputs):
+        colors = [
+            'red',
+            'blue',
+            'green',
+            'orange'
+        ]
+        legends = list()
+        df = pd.DataFrame(list(outputs))
+
+        amps = [int(amp) for amp in self.amp.split(',')] if self.amp else [1]
+
+        for amp in amps:
+            idx = amp - 1
+            color = colors[idx] if self.amp else 'dodgerblue'
+            source = ColumnDataSource(data=dict(
+                x=df['mjd'],
+                y=df['median'].apply(lambda x: x[idx]),
+                lower=df['p5'].apply(lambda x: x[idx]),
+                upper=df['p95'].apply(lambda x: x[idx]),
+                count=df['count'],
+                camera=df['camera'],
+                night=df['night']
+            ))
+            self.p.add_layout(Band(
+                base='x', lower='lower', upper='upper', source=source,
+                level='underlay', fill_color=color, fill_alpha=0.2,
+                line_width=0
+            ))
+            line = self.p.line('x', 'y', source=source, line_color=color)
+            circle = self.p.circle('x', 'y', source=source, size=5,
+                                   line_color=None, fill_color=color)
+            legends.append(('AMP {}'.format(amp), [line, circle]))
+
+        if self.amp:
+            legend = Legend(items=legends, location=(0, 0))
+            self.p.add_layout(legend, 'below')
+
+    def render_cameras(self, axis_data, output='html'):
+        """ Grid of plots of several cameras, a row per arm and a column
+        per spectrograph, from a single query. The plots of an arm share
+        one ColumnDataSource, each one shows its camera through a view.
+        Every exposure is drawn, decimated per camera, nightly is not
+        used.
+        """
+        colors = [
+            'red',
+            'blue',
+            'green',
+            'orange'
+        ]
+        amps = [int(amp) for amp in self.amp.split(',')] if self.amp else [1]
+
+        outputs = self.models.get_product_metrics_by_cameras(
+            self.yaxis, self.cameras, begin_date=self.start,
+            end_date=self.end)
+
+        if self.window:
+            outputs = outputs.filter(
+                mjd__gte=self.window[0], mjd__lte=self.window[1]
+            )
+
+        df = pd.DataFrame(
+            list(outputs),
+            columns=['camera', 'exposure_id', 'dateobs', 'value', 'mjd']
+        )
+        df['datef'] = pd.to_datetime(df['dateobs']).dt.strftime(
+            '%Y-%m-%d %H:%M:%S')
+
+        # each camera decimated on its own, the rows kept for any amp
+        groups = list()
+        for camera, rows in df.groupby('camera', sort=False):
+            rows = rows.reset_index(drop=True)
+            kept = set()
+            for amp in amps:
+                kept.update(self.sample(rows, amp - 1).index)
+                rows['y{}'.format(amp)] = rows['value'].apply(
+                    lambda x: x[amp - 1]).astype(float)
+            groups.append(rows.loc[sorted(kept)])
+
+        if groups:
+            df = pd.concat(groups)
+
+        TOOLTIPS = """
+            <div>
+                <div>
+                    <span style="font-size: 1vw; font-weight: bold; color: #303030;">{}: </span>
+                    <span style="font-size: 1vw; color: #515151;">@$name</span>
+                </div>
+                <div>
+                    <span style="font-size: 1vw; font-weight: bold; color: #303030;">Camera: </span>
+                    <span style="font-size: 1vw; color: #515151;">@camera</span>
+                </div>
+                <div>
+                    <span style="font-size: 1vw; font-weight: bold; color: #303030;">Exposure: </span>
+                    <span style="font-size: 1vw; color: #515151;">@exposure</span>
+                </div>
+                <div>
+                    <span style="font-size: 1vw; font-weight: bold; color: #303030;">Date: </span>
+                    <span style="font-size: 1vw; color: #515151;">@dateobs</span>
+                </div>
+            </div>
+        """.format(axis_data['display'])
+
+        x_range = None
+        grid = list()
+
+        for arm in ['b', 'r', 'z']:
+            cameras = sorted(
+                [camera for camera in self.cameras if camera[0] == arm],
+                key=lambda camera: int(camera[1:])
+            )
+            if not cameras:
+                continue
+
+            rows = df[df['camera'].str.startswith(arm)]
+            data = dict(
+                x=rows['mjd'],
+                exposure=rows['exposure_id'],
+                camera=rows['camera'],
+                dateobs=rows['datef']
+            )
+            for amp in amps:
+                data['y{}'.format(amp)] = rows['y{}'.format(amp)] \
+                    if len(rows) else []
+            source = ColumnDataSource(data=data)
+
+            y_range = None
+            plots = [None] * 10
+
+            for camera in cameras:
+                plot = figure(
+                    title=camera,
+                    toolbar_location=None,
+                    x_axis_label='Date (mjd)',
+                    y_axis_label=axis_data['display'],
+                    plot_width=250, plot_height=180,
+                    active_drag="box_zoom",
+                    tools=[HoverTool(tooltips=TOOLTIPS),
+                           'box_zoom,wheel_zoom,pan,reset']
+                )
+
+                # the x axis is shared by every camera, the y axis by
+                # the cameras of an arm
+                x_range = x_range or plot.x_range
+                y_range = y_range or plot.y_range
+                plot.x_range = x_range
+                plot.y_range = y_range
+
+                # lines would need every point of the source
+                view = CDSView(source=source, filters=[
+                    GroupFilter(column_name='camera', group=camera)
+                ])
+
+                for amp in amps:
+                    plot.circle(
+                        'x', 'y{}'.format(amp), source=source, view=view,
+                        size=4, line_color=None,
+                        fill_color=colors[amp - 1] if self.amp else
+                        'dodgerblue',
+                        name='y{}'.format(amp)
+                    )
+
+                plots[int(camera[1:])] = plot
+
+            grid.append(plots)
+
+        # spectrographs without any camera are not drawn
+        spectrographs = [
+            spectrograph for spectrograph in range(10)
+            if any(plots[spectrograph] for plots in grid)
+        ]
+        grid = [
+            [plots[spectrograph] for spectrograph in spectrographs]
+            for plots in grid
+        ]
+
+        layout = gridplot(
+            grid, toolbar_location='above', sizing_mode='scale_width'
+        )
+
+        return embed_document(layout, "Time Series", output)
+
+    def render(self, output='html'):
         metrics_path = os.path.join(
             qlf_root, "framework", "ql_mapping",
             "metrics.json")
@@ -76,8 +328,23 @@ class TimeSeries():
         with open(metrics_path) as f:
             metrics = json.load(f)
         axis_data = metrics[self.yaxis]
-        outputs = self.models.get_product_metrics_by_camera(
-            self.yaxis, self.camera, begin_date=self.start, end_date=self.end)
+
+        if len(self.cameras) > 1:
+            return self.render_cameras(axis_data, output)
+
+        if self.nightly:
+            outputs = self.models.get_nightly_metrics_by_camera(
+                self.yaxis, self.camera, begin_date=self.start,
+                end_date=self.end)
+        else:
+            outputs = self.models.get_product_metrics_by_camera(
+                self.yaxis, self.camera, begin_date=self.start,
+                end_date=self.end)
+
+        if self.window:
+            outputs = outputs.filter(
+                mjd__gte=self.window[0], mjd__lte=self.window[1]
+            )
 
         TOOLTIPS = """
             <div>
@@ -96,6 +363,24 @@ class TimeSeries():
             </div>
         """.format(axis_data['display'])
 
+        if self.nightly:
+            TOOLTIPS = """
+                <div>
+                    <div>
+                        <span style="font-size: 1vw; font-weight: bold; color: #303030;">{} (median): </span>
+                        <span style="font-size: 1vw; color: #515151;">@y</span>
+                    </div>
+                    <div>
+                        <span style="font-size: 1vw; font-weight: bold; color: #303030;">5% - 95%: </span>
+                        <span style="font-size: 1vw; color: #515151;">@lower - @upper</span>
+                    </div>
+                    <div>
+                        <span style="font-size: 1vw; font-weight: bold; color: #303030;">Night: </span>
+                        <span style="font-size: 1vw; color: #515151;">@night (@count exposures)</span>
+                    </div>
+                </div>
+            """.format(axis_data['display'])
+
         hover = HoverTool(tooltips=TOOLTIPS)
 
         self.p = figure(
@@ -118,5 +403,16 @@ class TimeSeries():
         self.p.legend.label_text_font_size = font_size
         self.p.title.text_font_size = font_size
 
-        self.make_plot(outputs)
-        return file_html(self.p, CDN, "Time Series")
+        if self.nightly:
+            self.make_nightly_plot(outputs)
+        else:
+            self.make_plot(outputs)
+
+        # a fixed range, only zooms change it
+        if self.decimated and output == 'html':
+            self.p.x_range = Range1d(*(self.window or self.extent))
+            self.p.x_range.js_on_change('end', CustomJS(
+                args=dict(x_range=self.p.x_range), code=ZOOM_RELOAD
+            ))
+
+        return embed_document(self.p, "Time Series", output)
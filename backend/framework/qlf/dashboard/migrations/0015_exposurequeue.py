@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0014_product'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExposureQueue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exposure_id', models.IntegerField(help_text='Exposure number', unique=True)),
+                ('night', models.CharField(help_text='Night ID', max_length=45)),
+                ('flavor', models.CharField(help_text='Type of observation', max_length=45)),
+                ('priority', models.SmallIntegerField(default=0, help_text='Lower values are processed first')),
+                ('status', models.SmallIntegerField(default=0, help_text='0=Queued, 1=Running, 2=Done, 3=Failed')),
+                ('queued', models.DateTimeField(auto_now_add=True, help_text='Datetime when the exposure was queued')),
+                ('started', models.DateTimeField(blank=True, help_text='Datetime when the processing was started', null=True)),
+                ('finished', models.DateTimeField(blank=True, help_text='Datetime when the processing was finished', null=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='exposurequeue',
+            index_together=set([('status', 'priority', 'exposure_id')]),
+        ),
+    ]
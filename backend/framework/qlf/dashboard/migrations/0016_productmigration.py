@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 13:00
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_exposurequeue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductMigration',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run', models.CharField(help_text='Migration run, derived from metrics.json and the mode', max_length=40)),
+                ('keys', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=30), help_text='Metric keys migrated by the run', size=None)),
+                ('first_job', models.IntegerField(help_text='First job id of the range')),
+                ('last_job', models.IntegerField(help_text='Last job id of the range')),
+                ('next_job', models.IntegerField(help_text='Next job id to be migrated')),
+                ('started', models.DateTimeField(auto_now_add=True, help_text='Datetime when the range was planned')),
+                ('finished', models.DateTimeField(blank=True, help_text='Datetime when the range was migrated', null=True)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='productmigration',
+            unique_together=set([('run', 'first_job')]),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 15:20
+from __future__ import unicode_literals
+
+import dashboard.models
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0016_productmigration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FiberMetric',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Metric key, e.g. SNR_RESID', max_length=30)),
+                ('dateobs', models.DateTimeField(help_text='Date of observation of the exposure')),
+                ('value', django.contrib.postgres.fields.ArrayField(base_field=dashboard.models.RealField(), help_text='Value of each fiber, [row][fiber] for 2D metrics', size=None)),
+                ('camera', models.ForeignKey(help_text='Camera of the job', on_delete=django.db.models.deletion.CASCADE, related_name='camera_fiber_metrics', to='dashboard.Camera')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fiber_metrics', to='dashboard.Job')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='fibermetric',
+            unique_together=set([('job', 'key')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='fibermetric',
+            index_together=set([('camera', 'key', 'dateobs')]),
+        ),
+    ]
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 19:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+# products stored before the mjd was filled at ingestion
+FILL_MJD = """
+    UPDATE dashboard_product AS product
+    SET mjd = extract(epoch FROM exposure.dateobs) / 86400 + 40587
+    FROM dashboard_job AS job
+    JOIN dashboard_process AS process ON process.id = job.process_id
+    JOIN dashboard_exposure AS exposure
+        ON exposure.exposure_id = process.exposure_id
+    WHERE job.id = product.job_id AND product.mjd IS NULL;
+"""
+
+# one partition per month with products (dashboard_product_YYYYMM), by
+# mjd, the next ones are created by QLFModels.create_products
+PARTITION = """
+    ALTER TABLE dashboard_product RENAME TO dashboard_product_unpartitioned;
+    ALTER TABLE dashboard_product_unpartitioned
+        RENAME CONSTRAINT dashboard_product_pkey
+        TO dashboard_product_unpartitioned_pkey;
+    ALTER TABLE dashboard_product_unpartitioned
+        RENAME CONSTRAINT dashboard_product_job_id_93aea39b_fk_dashboard_job_id
+        TO dashboard_product_unpartitioned_job_id_fk;
+    ALTER INDEX dashboard_product_job_id_93aea39b
+        RENAME TO dashboard_product_unpartitioned_job_id;
+
+    CREATE TABLE dashboard_product (
+        id integer NOT NULL DEFAULT nextval('dashboard_product_id_seq'),
+        value double precision[] NOT NULL,
+        key varchar(30) NOT NULL,
+        mjd double precision NOT NULL,
+        job_id integer NOT NULL,
+        CONSTRAINT dashboard_product_pkey PRIMARY KEY (id, mjd),
+        CONSTRAINT dashboard_product_job_id_93aea39b_fk_dashboard_job_id
+            FOREIGN KEY (job_id) REFERENCES dashboard_job (id)
+            DEFERRABLE INITIALLY DEFERRED
+    ) PARTITION BY RANGE (mjd);
+    CREATE INDEX dashboard_product_job_id_93aea39b
+        ON dashboard_product (job_id);
+    ALTER SEQUENCE dashboard_product_id_seq OWNED BY dashboard_product.id;
+
+    DO $$
+    DECLARE
+        month timestamp;
+    BEGIN
+        FOR month IN
+            SELECT DISTINCT date_trunc('month', date)
+            FROM (
+                SELECT timestamp '1858-11-17' + mjd * interval '1 day' AS date
+                FROM dashboard_product_unpartitioned
+            ) AS dates
+        LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF dashboard_product '
+                'FOR VALUES FROM (%s) TO (%s)',
+                'dashboard_product_' || to_char(month, 'YYYYMM'),
+                extract(epoch FROM month - timestamp '1858-11-17') / 86400,
+                extract(epoch FROM month + interval '1 month'
+                    - timestamp '1858-11-17') / 86400
+            );
+        END LOOP;
+    END $$;
+
+    CREATE TABLE dashboard_product_default
+        PARTITION OF dashboard_product DEFAULT;
+
+    INSERT INTO dashboard_product (id, value, key, mjd, job_id)
+    SELECT id, value, key, mjd, job_id FROM dashboard_product_unpartitioned;
+
+    -- checked now, the index is created next in this transaction
+    SET CONSTRAINTS ALL IMMEDIATE;
+
+    DROP TABLE dashboard_product_unpartitioned;
+"""
+
+UNPARTITION = """
+    CREATE TABLE dashboard_product_unpartitioned (
+        id integer NOT NULL DEFAULT nextval('dashboard_product_id_seq'),
+        value double precision[] NOT NULL,
+        key varchar(30) NOT NULL,
+        mjd double precision NOT NULL,
+        job_id integer NOT NULL
+    );
+
+    INSERT INTO dashboard_product_unpartitioned (id, value, key, mjd, job_id)
+    SELECT id, value, key, mjd, job_id FROM dashboard_product;
+
+    ALTER SEQUENCE dashboard_product_id_seq
+        OWNED BY dashboard_product_unpartitioned.id;
+    DROP TABLE dashboard_product;
+
+    ALTER TABLE dashboard_product_unpartitioned RENAME TO dashboard_product;
+    ALTER TABLE dashboard_product
+        ADD CONSTRAINT dashboard_product_pkey PRIMARY KEY (id);
+    ALTER TABLE dashboard_product
+        ADD CONSTRAINT dashboard_product_job_id_93aea39b_fk_dashboard_job_id
+        FOREIGN KEY (job_id) REFERENCES dashboard_job (id)
+        DEFERRABLE INITIALLY DEFERRED;
+    CREATE INDEX dashboard_product_job_id_93aea39b
+        ON dashboard_product (job_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0017_fibermetric'),
+    ]
+
+    operations = [
+        migrations.RunSQL(FILL_MJD, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='mjd',
+            field=models.FloatField(help_text='MJD of the exposure, the partition key'),
+        ),
+        migrations.RunSQL(PARTITION, UNPARTITION),
+        migrations.AlterIndexTogether(
+            name='product',
+            index_together=set([('key', 'mjd', 'job')]),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 20:05
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+# the products stored so far, before the index is built, the next ones
+# are written by QLFModels.create_products
+FILL_METRICS = """
+    INSERT INTO dashboard_metric (job_id, camera_id, arm, spectrograph,
+        exposure_id, night, dateobs, mjd, flavor, program, key, value)
+    SELECT job.id, camera.camera, camera.arm, camera.spectrograph,
+        exposure.exposure_id, exposure.night, exposure.dateobs,
+        product.mjd, exposure.flavor, exposure.program, product.key,
+        product.value
+    FROM dashboard_product AS product
+    JOIN dashboard_job AS job ON job.id = product.job_id
+    JOIN dashboard_camera AS camera ON camera.camera = job.camera_id
+    JOIN dashboard_process AS process ON process.id = job.process_id
+    JOIN dashboard_exposure AS exposure
+        ON exposure.exposure_id = process.exposure_id;
+    SET CONSTRAINTS ALL IMMEDIATE;
+    ANALYZE dashboard_metric;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0018_product_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Metric',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('arm', models.CharField(help_text='Arm ID', max_length=1)),
+                ('spectrograph', models.CharField(help_text='Spectrograph ID', max_length=1)),
+                ('exposure_id', models.IntegerField(help_text='Exposure number')),
+                ('night', models.CharField(help_text='Night ID', max_length=45)),
+                ('dateobs', models.DateTimeField(help_text='Date of observation of the exposure')),
+                ('mjd', models.FloatField(help_text='MJD of the exposure')),
+                ('flavor', models.CharField(help_text='Type of observation', max_length=45)),
+                ('program', models.CharField(blank=True, help_text='Program', max_length=45, null=True)),
+                ('key', models.CharField(help_text='Metric Key', max_length=30)),
+                ('value', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=None)),
+                ('camera', models.ForeignKey(help_text='Camera of the job', on_delete=django.db.models.deletion.CASCADE, related_name='camera_metrics', to='dashboard.Camera')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metrics', to='dashboard.Job')),
+            ],
+        ),
+        migrations.RunSQL(FILL_METRICS, migrations.RunSQL.noop),
+        migrations.AlterIndexTogether(
+            name='metric',
+            index_together=set([('camera', 'key', 'mjd')]),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11 on 2026-10-18 21:15
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+# the nights stored so far, the next ones are updated by
+# QLFModels.update_nightly_metrics. -9999 is the INVALID_VALUE put in
+# place of NaN, left out of the statistics
+FILL_NIGHTLY_METRICS = """
+    INSERT INTO dashboard_nightlymetric (camera_id, key, night, mjd, count,
+        min, max, mean, median, p5, p95)
+    SELECT camera_id, key, night,
+        to_date(night, 'YYYYMMDD') - date '1858-11-17',
+        max(count),
+        array_agg(min ORDER BY position),
+        array_agg(max ORDER BY position),
+        array_agg(mean ORDER BY position),
+        array_agg(percentiles[2] ORDER BY position),
+        array_agg(percentiles[1] ORDER BY position),
+        array_agg(percentiles[3] ORDER BY position)
+    FROM (
+        SELECT camera_id, key, night, position,
+            count(*) FILTER (WHERE valid) AS count,
+            min(element) FILTER (WHERE valid),
+            max(element) FILTER (WHERE valid),
+            avg(element) FILTER (WHERE valid) AS mean,
+            percentile_cont(ARRAY[0.05, 0.5, 0.95])
+                WITHIN GROUP (ORDER BY element)
+                FILTER (WHERE valid) AS percentiles
+        FROM dashboard_metric
+        CROSS JOIN LATERAL unnest(value)
+            WITH ORDINALITY AS elements(element, position)
+        CROSS JOIN LATERAL (SELECT element <> -9999 AS valid) AS validity
+        GROUP BY camera_id, key, night, position
+    ) AS elements
+    GROUP BY camera_id, key, night;
+    SET CONSTRAINTS ALL IMMEDIATE;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0019_metric'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='metric',
+            name='night',
+            field=models.CharField(db_index=True, help_text='Night ID', max_length=45),
+        ),
+        migrations.CreateModel(
+            name='NightlyMetric',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Metric Key', max_length=30)),
+                ('night', models.CharField(help_text='Night ID', max_length=45)),
+                ('mjd', models.FloatField(help_text='MJD of the start of the night')),
+                ('count', models.IntegerField(help_text='Number of exposures')),
+                ('min', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), help_text='Minimum of each element', size=None)),
+                ('max', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), help_text='Maximum of each element', size=None)),
+                ('mean', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), help_text='Mean of each element', size=None)),
+                ('median', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), help_text='Median of each element', size=None)),
+                ('p5', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), help_text='5th percentile of each element', size=None)),
+                ('p95', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(null=True), help_text='95th percentile of each element', size=None)),
+                ('camera', models.ForeignKey(help_text='Camera of the jobs', on_delete=django.db.models.deletion.CASCADE, related_name='camera_nightly_metrics', to='dashboard.Camera')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='nightlymetric',
+            unique_together=set([('camera', 'key', 'night')]),
+        ),
+        migrations.RunSQL(FILL_NIGHTLY_METRICS, migrations.RunSQL.noop),
+    ]
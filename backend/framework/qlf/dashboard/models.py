@@ -53,6 +53,51 @@ class Exposure(models.Model):
     )
 
 
+class ExposureQueue(models.Model):
+    """Exposures waiting to be processed by the pipeline"""
+
+    STATUS_QUEUED = 0
+    STATUS_RUNNING = 1
+    STATUS_DONE = 2
+    STATUS_FAILED = 3
+
+    exposure_id = models.IntegerField(
+        unique=True,
+        help_text='Exposure number'
+    )
+    night = models.CharField(
+        max_length=45,
+        help_text='Night ID'
+    )
+    flavor = models.CharField(
+        max_length=45,
+        help_text='Type of observation'
+    )
+    priority = models.SmallIntegerField(
+        default=0,
+        help_text='Lower values are processed first'
+    )
+    status = models.SmallIntegerField(
+        default=STATUS_QUEUED,
+        help_text='0=Queued, 1=Running, 2=Done, 3=Failed'
+    )
+    queued = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Datetime when the exposure was queued'
+    )
+    started = models.DateTimeField(
+        blank=True, null=True,
+        help_text='Datetime when the processing was started'
+    )
+    finished = models.DateTimeField(
+        blank=True, null=True,
+        help_text='Datetime when the processing was finished'
+    )
+
+    class Meta:
+        index_together = [['status', 'priority', 'exposure_id']]
+
+
 class Configuration(models.Model):
     """Configuration information"""
 
@@ -183,6 +228,8 @@ class Job(models.Model):
         return str(self.name)
 
 class Product(models.Model):
+    """Metric of a job, in monthly partitions by mjd"""
+
     job = models.ForeignKey(Job, related_name='product_job')
     value = ArrayField(models.FloatField())
     key = models.CharField(
@@ -190,9 +237,183 @@ class Product(models.Model):
         help_text='Metric Key'
     )
     mjd = models.FloatField(
-        help_text='MJD',
-        null=True
+        help_text='MJD of the exposure, the partition key'
+    )
+
+    class Meta:
+        index_together = [['key', 'mjd', 'job']]
+
+
+class RealField(models.FloatField):
+    """Single precision float, real in PostgreSQL"""
+
+    def db_type(self, connection):
+        return 'real'
+
+
+class FiberMetric(models.Model):
+    """Per fiber values of a job metric"""
+
+    job = models.ForeignKey(
+        Job, related_name='fiber_metrics',
+        on_delete=models.CASCADE
+    )
+    camera = models.ForeignKey(
+        Camera, related_name='camera_fiber_metrics',
+        help_text='Camera of the job'
+    )
+    key = models.CharField(
+        max_length=30,
+        help_text='Metric key, e.g. SNR_RESID'
+    )
+    dateobs = models.DateTimeField(
+        help_text='Date of observation of the exposure'
+    )
+    value = ArrayField(
+        RealField(),
+        help_text='Value of each fiber, [row][fiber] for 2D metrics'
+    )
+
+    class Meta:
+        unique_together = [['job', 'key']]
+        index_together = [['camera', 'key', 'dateobs']]
+
+
+class Metric(models.Model):
+    """Product with its camera and exposure, for the trend queries"""
+
+    job = models.ForeignKey(
+        Job, related_name='metrics',
+        on_delete=models.CASCADE
+    )
+    camera = models.ForeignKey(
+        Camera, related_name='camera_metrics',
+        help_text='Camera of the job'
+    )
+    arm = models.CharField(
+        max_length=1,
+        help_text='Arm ID'
+    )
+    spectrograph = models.CharField(
+        max_length=1,
+        help_text='Spectrograph ID'
+    )
+    exposure_id = models.IntegerField(
+        help_text='Exposure number'
     )
+    night = models.CharField(
+        max_length=45,
+        help_text='Night ID',
+        db_index=True
+    )
+    dateobs = models.DateTimeField(
+        help_text='Date of observation of the exposure'
+    )
+    mjd = models.FloatField(
+        help_text='MJD of the exposure'
+    )
+    flavor = models.CharField(
+        max_length=45,
+        help_text='Type of observation'
+    )
+    program = models.CharField(
+        max_length=45,
+        blank=True, null=True,
+        help_text='Program'
+    )
+    key = models.CharField(
+        max_length=30,
+        help_text='Metric Key'
+    )
+    value = ArrayField(models.FloatField())
+
+    class Meta:
+        index_together = [['camera', 'key', 'mjd']]
+
+
+class NightlyMetric(models.Model):
+    """Statistics of a metric of a camera over a night, per element of
+    the metric value"""
+
+    camera = models.ForeignKey(
+        Camera, related_name='camera_nightly_metrics',
+        help_text='Camera of the jobs'
+    )
+    key = models.CharField(
+        max_length=30,
+        help_text='Metric Key'
+    )
+    night = models.CharField(
+        max_length=45,
+        help_text='Night ID'
+    )
+    mjd = models.FloatField(
+        help_text='MJD of the start of the night'
+    )
+    count = models.IntegerField(
+        help_text='Number of exposures'
+    )
+    min = ArrayField(
+        models.FloatField(null=True),
+        help_text='Minimum of each element'
+    )
+    max = ArrayField(
+        models.FloatField(null=True),
+        help_text='Maximum of each element'
+    )
+    mean = ArrayField(
+        models.FloatField(null=True),
+        help_text='Mean of each element'
+    )
+    median = ArrayField(
+        models.FloatField(null=True),
+        help_text='Median of each element'
+    )
+    p5 = ArrayField(
+        models.FloatField(null=True),
+        help_text='5th percentile of each element'
+    )
+    p95 = ArrayField(
+        models.FloatField(null=True),
+        help_text='95th percentile of each element'
+    )
+
+    class Meta:
+        unique_together = [['camera', 'key', 'night']]
+
+
+class ProductMigration(models.Model):
+    """Checkpoint of a job range in a migration of the products"""
+
+    run = models.CharField(
+        max_length=40,
+        help_text='Migration run, derived from metrics.json and the mode'
+    )
+    keys = ArrayField(
+        models.CharField(max_length=30),
+        help_text='Metric keys migrated by the run'
+    )
+    first_job = models.IntegerField(
+        help_text='First job id of the range'
+    )
+    last_job = models.IntegerField(
+        help_text='Last job id of the range'
+    )
+    next_job = models.IntegerField(
+        help_text='Next job id to be migrated'
+    )
+    started = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Datetime when the range was planned'
+    )
+    finished = models.DateTimeField(
+        blank=True, null=True,
+        help_text='Datetime when the range was migrated'
+    )
+
+    class Meta:
+        unique_together = [['run', 'first_job']]
+
 
 class Fibermap(models.Model):
     """Fibermap information"""
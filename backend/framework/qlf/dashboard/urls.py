@@ -44,6 +44,8 @@ urlpatterns = [
         views.disk_thresholds, name='disk_thresholds'),
     url(r'^dashboard/api/check_view_files',
         views.check_view_files, name='check_view_files'),
+    url(r'^dashboard/api/nightly_metrics',
+        views.nightly_metrics, name='nightly_metrics'),
     url(r'^dashboard/admin', include(admin.site.urls)),
     url(r'^dashboard/api/', include(api_router.urls)),
     url(r'^dashboard/get_footprint',
@@ -8,7 +8,7 @@ from rest_framework.pagination import LimitOffsetPagination
 
 from django.db.models import Max, Min
 
-from .models import Job, Exposure, Camera, Process, Configuration, ProcessComment, Fibermap, Product
+from .models import Job, Exposure, Camera, Process, Configuration, ProcessComment, Fibermap, Metric
 from .serializers import (
     JobSerializer, ExposureSerializer, CameraSerializer,
     ProcessSerializer, ConfigurationSerializer,
@@ -16,7 +16,7 @@ from .serializers import (
     ObservingHistorySerializer, ExposuresDateRangeSerializer,
     ExposureFlavorSerializer, ProcessCommentSerializer,
     ExposureNightSerializer, FibermapSerializer,
-    ProductSerializer
+    MetricSerializer
 )
 
 from datetime import datetime, timedelta
@@ -29,6 +29,7 @@ from django.core.mail import send_mail
 import os
 
 from clients import get_exposure_monitoring
+from qlf_models import QLFModels
 
 import logging
 
@@ -227,11 +228,14 @@ class JobViewSet(DynamicFieldsMixin, DefaultsMixin, viewsets.ModelViewSet):
 
 
 class ProductViewSet(DynamicFieldsMixin, DefaultsMixin, viewsets.ModelViewSet):
-    """API endpoint for listing Products"""
+    """API endpoint for listing Products, with the camera and exposure
+    of each one, from the Metric table"""
 
-    queryset = Product.objects.order_by('pk')
-    serializer_class = ProductSerializer
-    filter_fields = ('key', 'mjd',)
+    queryset = Metric.objects.order_by('pk')
+    serializer_class = MetricSerializer
+    filter_fields = (
+        'key', 'mjd', 'camera', 'exposure_id', 'night', 'flavor', 'program'
+    )
 
 
 class ProcessViewSet(DynamicFieldsMixin, DefaultsMixin, viewsets.ModelViewSet):
@@ -345,7 +349,13 @@ class AddExposureViewSet(viewsets.ReadOnlyModelViewSet):
             request, args, kwargs)
         exposure_id = request.GET.get('exposure_id')
         if exposure_id is not None:
-            qlf.add_exposures([exposure_id])
+            exposure = Exposure.objects.filter(exposure_id=exposure_id).first()
+            if exposure is None:
+                response.data = {'Error': 'Exposure not found'}
+                return response
+            QLFModels().enqueue_exposure(
+                exposure.exposure_id, exposure.night, exposure.flavor,
+                reprocess=True)
             response.data = {'status': 'Exposure added to queue'}
             return response
         else:
@@ -479,3 +489,30 @@ def get_camera_log(request):
     return JsonResponse({
         'lines': log
     })
+
+
+def nightly_metrics(request):
+    """ Nightly statistics of a metric of a camera, one entry per night.
+
+    Query parameters: key, camera, and optionally start and end nights
+    (YYYYMMDD).
+    """
+    key = request.GET.get('key')
+    camera = request.GET.get('camera')
+    start = request.GET.get('start')
+    end = request.GET.get('end')
+    if not key or not camera:
+        return JsonResponse({'Error': 'missing key or camera'})
+    try:
+        if start:
+            start = datetime.strptime(start, '%Y%m%d').strftime('%Y-%m-%d')
+        if end:
+            end = datetime.strptime(end, '%Y%m%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return JsonResponse({'Error': 'wrong date format'})
+
+    nights = QLFModels().get_nightly_metrics_by_camera(
+        key, camera, begin_date=start, end_date=end
+    )
+
+    return JsonResponse({'results': list(nights)})
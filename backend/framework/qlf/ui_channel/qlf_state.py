@@ -1,6 +1,7 @@
 from ui_channel.camera_status import CameraStatus
 from dashboard.models import Process, Job
 from clients import get_exposure_monitoring
+from camera_log_buffer import get_camera_log_buffer
 from astropy.time import Time
 import io
 import os
@@ -23,6 +24,7 @@ class QLFState:
     def __init__(self):
         self.load_flavors()
         self.camera_status_generator = CameraStatus(self)
+        self.log_buffer = get_camera_log_buffer()
         self.reset_state()
         self.update_pipeline_status()
         if self.pipeline_running is 0:
@@ -72,6 +74,7 @@ class QLFState:
         self.available_cameras = list()
         self.diff_alerts = dict()
         self.camera_logs = dict()
+        self.camera_log_seq = dict()
         self.camera_status_generator.reset_camera_status()
         self.end_date = None
 
@@ -232,9 +235,57 @@ class QLFState:
         except Exception:
             return ["File not found"]
 
+    def read_camera_log_buffer(self, camera, logname):
+        """ Appends the camera lines not seen yet from the in-memory
+        log buffer. Returns False when the log must be read from disk. """
+
+        seen = self.camera_log_seq.get(logname, 0)
+        if camera not in self.camera_logs:
+            seen = 0
+
+        try:
+            lines, first_seq, last_seq = self.log_buffer.read(
+                logname, since=seen)
+        except Exception as err:
+            logger.error(err)
+            return False
+
+        if not last_seq:
+            return False
+
+        # lines were dropped from the ring before being read, the copy on
+        # disk is written behind, so only its complete lines are taken
+        # and the next read resumes after them
+        if first_seq > seen + 1:
+            try:
+                with open(os.path.join(desi_spectro_redux, logname)) as arq:
+                    lines = arq.readlines()
+            except Exception as err:
+                logger.error(err)
+                return False
+
+            if lines and not lines[-1].endswith('\n'):
+                lines.pop()
+
+            self.camera_logs[camera] = lines
+            self.camera_log_seq[logname] = len(lines)
+            return True
+
+        self.camera_log_seq[logname] = last_seq
+
+        if seen:
+            self.camera_logs[camera].extend(lines)
+        else:
+            self.camera_logs[camera] = lines
+
+        return True
+
     def update_camera_logs(self):
         for job in Job.objects.filter(process=self.current_process.id):
             camera = job.camera
+            if self.log_buffer and self.read_camera_log_buffer(
+                    camera.camera, job.logname):
+                continue
             camera_log_path = os.path.join(
                 desi_spectro_redux,
                 job.logname